@@ -1,5 +1,16 @@
+import json
+import os
+import re
+import shutil
+import xml.etree.ElementTree as ET
 import pytest
 
+# Per-run directories of the cocotb tests
+# Keep in sync with snax_util.SIM_OUT_PATH and SIM_RUN_PATH
+SIM_BUILD_PATH = os.path.join(os.path.dirname(__file__), "tests", "cocotb", "sim_build")
+SIM_OUT_PATH = os.getenv("SNAX_SIM_OUT_PATH", SIM_BUILD_PATH)
+SIM_RUN_PATH = os.path.join(SIM_OUT_PATH, "runs")
+
 
 def pytest_addoption(parser):
     parser.addoption(
@@ -15,6 +26,142 @@ def pytest_addoption(parser):
         help="enabling wave generation. verilator \
             generates .fst; modelsim generats .wlf ",
     )
+    parser.addoption(
+        "--benchmark",
+        action="store_true",
+        default=False,
+        help="run the performance benchmarks against the stored baseline",
+    )
+    parser.addoption(
+        "--update-baseline",
+        action="store_true",
+        default=False,
+        help="store the benchmark results as the new baseline",
+    )
+    parser.addoption(
+        "--baseline-file",
+        dest="baseline_file",
+        default=os.path.join(
+            os.path.dirname(__file__), "tests", "cocotb", "benchmark_baseline.json"
+        ),
+        help="baseline file the benchmarks compare against",
+    )
+    parser.addoption(
+        "--fast-setup",
+        action="store_true",
+        default=False,
+        help="preload the TCDM through the backdoor and skip the CSR readback",
+    )
+    parser.addoption(
+        "--perf",
+        action="store_true",
+        default=False,
+        help="record the throughput of the valid/ready interfaces",
+    )
+    parser.addoption(
+        "--wave-window",
+        dest="wave_window",
+        type=int,
+        default=0,
+        help="trace the last N to 2N cycles of the tests that attach a wave \
+            window and dump them around triggers and mismatches",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "benchmark: performance benchmark, only runs with --benchmark"
+    )
+
+    # The simulations read it through snax_util.FAST_SETUP
+    if config.getoption("--fast-setup"):
+        os.environ["SNAX_FAST_SETUP"] = "1"
+
+    # The simulations read it through snax_util.PERF_ENABLED
+    if config.getoption("--perf"):
+        os.environ["SNAX_PERF"] = "1"
+
+    # The simulations read it through snax_util.WAVE_WINDOW_DEPTH
+    if config.getoption("--wave-window"):
+        os.environ["SNAX_WAVE_WINDOW"] = str(config.getoption("--wave-window"))
+
+
+# The benchmarks take long and measure the host,
+# so they only run when asked for
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--benchmark"):
+        return
+
+    skip_benchmark = pytest.mark.skip(reason="needs --benchmark to run")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip_benchmark)
+
+
+# Only the controlling process manages the run directories
+# When running with pytest-xdist (-n) the workers skip this
+def _is_controller(config) -> bool:
+    return not hasattr(config, "workerinput")
+
+
+def pytest_sessionstart(session):
+    if _is_controller(session.config):
+        shutil.rmtree(SIM_RUN_PATH, ignore_errors=True)
+
+
+# Merge the results, logs, performance summaries and waveforms of all runs
+# into SIM_OUT_PATH once every test has finished
+def pytest_sessionfinish(session, exitstatus):
+    if not _is_controller(session.config) or not os.path.isdir(SIM_RUN_PATH):
+        return
+
+    merged_results = ET.Element("testsuites")
+    merged_perf = {}
+    waves_path = os.path.join(SIM_OUT_PATH, "waves")
+
+    with open(os.path.join(SIM_OUT_PATH, "sim.log"), "w") as merged_log:
+        for run_name in sorted(os.listdir(SIM_RUN_PATH)):
+            run_dir = os.path.join(SIM_RUN_PATH, run_name)
+
+            results_file = os.path.join(run_dir, "results.xml")
+            if os.path.isfile(results_file):
+                merged_results.extend(ET.parse(results_file).getroot())
+
+            log_file = os.path.join(run_dir, "sim.log")
+            if os.path.isfile(log_file):
+                merged_log.write(f"# ---------- {run_name} ----------\n")
+                with open(log_file, "r") as f:
+                    shutil.copyfileobj(f, merged_log)
+
+            for run_file in sorted(os.listdir(run_dir)):
+                if run_file.endswith(".perf.json"):
+                    with open(os.path.join(run_dir, run_file), "r") as f:
+                        merged_perf.setdefault(run_name, []).append(json.load(f))
+
+            for wave_file in os.listdir(run_dir):
+                wave_name, wave_ext = os.path.splitext(wave_file)
+                if wave_file.endswith(".window.vcd"):
+                    os.makedirs(waves_path, exist_ok=True)
+                    os.replace(
+                        os.path.join(run_dir, wave_file),
+                        os.path.join(waves_path, f"{run_name}.{wave_file}"),
+                    )
+                elif wave_name in ["dump", "vsim"] and wave_ext in [
+                    ".fst",
+                    ".vcd",
+                    ".wlf",
+                ]:
+                    os.makedirs(waves_path, exist_ok=True)
+                    os.replace(
+                        os.path.join(run_dir, wave_file),
+                        os.path.join(waves_path, run_name + wave_ext),
+                    )
+
+    ET.ElementTree(merged_results).write(os.path.join(SIM_OUT_PATH, "results.xml"))
+
+    if merged_perf:
+        with open(os.path.join(SIM_OUT_PATH, "perf.json"), "w") as f:
+            json.dump(merged_perf, f, indent=2)
 
 
 @pytest.fixture
@@ -25,3 +172,9 @@ def simulator(request):
 @pytest.fixture
 def waves(request):
     return request.config.getoption("--waves")
+
+
+# Isolated directory for a single simulation run
+@pytest.fixture
+def sim_run_dir(request):
+    return os.path.join(SIM_RUN_PATH, re.sub(r"[^\w.-]+", "_", request.node.name))
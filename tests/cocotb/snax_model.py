@@ -0,0 +1,292 @@
+# ---------------------------------
+# Copyright 2024 KULeuven
+# Solderpad Hardware License, Version 0.51, see LICENSE for details.
+# SPDX-License-Identifier: SHL-0.51
+#
+# Description:
+# Golden models of the SNAX streamer and the
+# accelerators used in the tests.
+# The models work on NumPy arrays so that long
+# streams are evaluated in bulk instead of per beat.
+# ---------------------------------
+
+from typing import Dict, Iterator, List, Optional
+import numpy as np
+import snax_util
+
+
+# Reference model of the streamer address generation unit
+# Each data mover produces one address per TCDM port for each
+# temporal iteration. The innermost temporal loop (index 0) and
+# the innermost spatial loop (index 0) run the fastest:
+#   addr = base_ptr
+#        + sum(temporal_idx[d] * temporal_stride[d])
+#        + sum(spatial_idx[k] * spatial_stride[k])
+# Movers with stationarity set skip the innermost temporal loop.
+# The configuration is given with the same register names as the
+# CSR map, e.g., {"LOOP_COUNT_0": 20, "BASE_PTR_1": 64, ...}.
+# Registers that are not given keep their reset value of 0.
+class StreamerAguModel:
+    def __init__(self, cfg: Optional[Dict] = None) -> None:
+        if cfg is None:
+            cfg = snax_util.load_streamer_cfg()
+
+        self.num_loop_dim = cfg["temporalAddrGenUnitParams"]["loopDim"]
+        self.tcdm_ports = list(cfg["dataReaderParams"]["tcdmPortsNum"]) + list(
+            cfg["dataWriterParams"]["tcdmPortsNum"]
+        )
+        self.spatial_bounds = list(cfg["dataReaderParams"]["spatialBounds"]) + list(
+            cfg["dataWriterParams"]["spatialBounds"]
+        )
+        self.spatial_dim = list(cfg["dataReaderParams"]["spatialDim"]) + list(
+            cfg["dataWriterParams"]["spatialDim"]
+        )
+        self.stationarity = list(cfg["stationarity"])
+        self.num_data_mover = len(self.tcdm_ports)
+
+        # Addresses wrap around the TCDM address width
+        tcdm_size = cfg["numBanks"] * cfg["tcdmDepth"] * cfg["tcdmDataWidth"] // 8
+        self.addr_mask = (1 << int(np.ceil(np.log2(tcdm_size)))) - 1
+
+        for mover in range(self.num_data_mover):
+            num_ports = int(np.prod(self.spatial_bounds[mover]))
+            if num_ports != self.tcdm_ports[mover]:
+                raise Exception(
+                    f"Data mover {mover} unrolls {num_ports} addresses "
+                    f"over {self.tcdm_ports[mover]} TCDM ports."
+                )
+
+    # Temporal loop bounds seen by one data mover
+    def loop_bounds(self, values: Dict[str, int], mover: int) -> List[int]:
+        bounds = [values.get(f"LOOP_COUNT_{d}", 0) for d in range(self.num_loop_dim)]
+        if self.stationarity[mover]:
+            bounds[0] = 1
+        return bounds
+
+    def num_iters(self, values: Dict[str, int], mover: int) -> int:
+        return int(np.prod(self.loop_bounds(values, mover)))
+
+    # Spatial address offset of each TCDM port of a data mover
+    def port_offsets(self, values: Dict[str, int], mover: int) -> np.ndarray:
+        spatial_base = sum(self.spatial_dim[:mover])
+        bounds = self.spatial_bounds[mover]
+        strides = [
+            values.get(f"SPATIAL_STRIDE_{spatial_base + k}", 0)
+            for k in range(len(bounds))
+        ]
+        return self._loop_offsets(
+            np.arange(self.tcdm_ports[mover], dtype=np.int64), bounds, strides
+        )
+
+    # Addresses of one data mover for the temporal iterations [start, stop)
+    # Returns an array of shape (iterations, TCDM ports)
+    def mover_addresses(
+        self,
+        values: Dict[str, int],
+        mover: int,
+        start: int = 0,
+        stop: Optional[int] = None,
+    ) -> np.ndarray:
+        num_iters = self.num_iters(values, mover)
+        stop = num_iters if stop is None else min(stop, num_iters)
+        strides = [
+            values.get(f"TEMPORAL_STRIDE_{mover * self.num_loop_dim + d}", 0)
+            for d in range(self.num_loop_dim)
+        ]
+        temporal_offsets = self._loop_offsets(
+            np.arange(start, stop, dtype=np.int64),
+            self.loop_bounds(values, mover),
+            strides,
+        )
+        addresses = (
+            values.get(f"BASE_PTR_{mover}", 0)
+            + temporal_offsets[:, None]
+            + self.port_offsets(values, mover)[None, :]
+        )
+        return addresses & self.addr_mask
+
+    # Lazily yields the addresses of one data mover in chunks
+    # of at most chunk_size temporal iterations
+    def iter_mover_addresses(
+        self, values: Dict[str, int], mover: int, chunk_size: int = 4096
+    ) -> Iterator[np.ndarray]:
+        num_iters = self.num_iters(values, mover)
+        for start in range(0, num_iters, chunk_size):
+            yield self.mover_addresses(values, mover, start, start + chunk_size)
+
+    # Lazily yields, per temporal iteration, the addresses of all
+    # TCDM ports in port order, i.e., readers first then writers
+    def iter_port_addresses(
+        self, values: Dict[str, int], chunk_size: int = 4096
+    ) -> Iterator[List[int]]:
+        num_iters = {self.num_iters(values, m) for m in range(self.num_data_mover)}
+        if len(num_iters) != 1:
+            raise Exception("Data movers run a different number of iterations.")
+
+        for start in range(0, num_iters.pop(), chunk_size):
+            chunk = np.concatenate(
+                [
+                    self.mover_addresses(values, m, start, start + chunk_size)
+                    for m in range(self.num_data_mover)
+                ],
+                axis=1,
+            )
+            yield from chunk.tolist()
+
+    # Offsets of nested loops for the flat indices
+    # Loop 0 is the innermost and the fastest changing
+    @staticmethod
+    def _loop_offsets(
+        flat_idx: np.ndarray, bounds: List[int], strides: List[int]
+    ) -> np.ndarray:
+        offsets = np.zeros(len(flat_idx), dtype=np.int64)
+        for bound, stride in zip(bounds, strides):
+            if bound == 0:
+                break
+            offsets += (flat_idx % bound) * stride
+            flat_idx = flat_idx // bound
+        return offsets
+
+
+# Analytic bank-conflict model of the tcdm_subsys address mapping
+# Narrow word w = addr / (NarrowDataWidth/8) lives in bank w % NrBanks.
+# A wide request takes a whole superbank of WideDataWidth/NarrowDataWidth
+# consecutive banks and has priority over the narrow requests.
+# Each bank serves one request per cycle, so a step where all
+# ports present their request at once takes as many cycles as the
+# most loaded bank. The traces have one row per step and one column
+# per port, negative addresses mark ports without a request.
+class TcdmBankModel:
+    def __init__(self, cfg: Optional[Dict] = None) -> None:
+        if cfg is None:
+            cfg = snax_util.load_streamer_cfg()
+
+        self.nr_banks = cfg["numBanks"]
+        self.narrow_bytes = cfg["tcdmDataWidth"] // 8
+        self.banks_per_superbank = cfg["tcdmDmaDataWidth"] // cfg["tcdmDataWidth"]
+        self.nr_superbanks = self.nr_banks // self.banks_per_superbank
+
+    def bank_of(self, addrs: np.ndarray) -> np.ndarray:
+        return (np.asarray(addrs) // self.narrow_bytes) % self.nr_banks
+
+    def superbank_of(self, wide_addrs: np.ndarray) -> np.ndarray:
+        wide_bytes = self.narrow_bytes * self.banks_per_superbank
+        return (np.asarray(wide_addrs) // wide_bytes) % self.nr_superbanks
+
+    # Number of narrow requests per bank for each step
+    # Returns an array of shape (steps, NrBanks)
+    def bank_loads(self, addrs: np.ndarray) -> np.ndarray:
+        addrs = np.atleast_2d(np.asarray(addrs, dtype=np.int64))
+        num_steps = addrs.shape[0]
+        step_idx = np.broadcast_to(np.arange(num_steps)[:, None], addrs.shape)
+        valid = addrs >= 0
+        flat_idx = step_idx[valid] * self.nr_banks + self.bank_of(addrs[valid])
+        loads = np.bincount(flat_idx, minlength=num_steps * self.nr_banks)
+        return loads.reshape(num_steps, self.nr_banks)
+
+    # Banks blocked by the wide request of each step
+    def wide_blocks(self, wide_addrs: np.ndarray, num_steps: int) -> np.ndarray:
+        wide_addrs = np.asarray(wide_addrs, dtype=np.int64).reshape(num_steps)
+        blocks = np.zeros((num_steps, self.nr_superbanks), dtype=np.int64)
+        valid = wide_addrs >= 0
+        blocks[np.nonzero(valid)[0], self.superbank_of(wide_addrs[valid])] = 1
+        return np.repeat(blocks, self.banks_per_superbank, axis=1)
+
+    # Cycles each step takes and the cycles its requests stall.
+    # A bank with L requests serves them one after the other,
+    # so they wait 0 + 1 + ... + (L-1) cycles, plus one cycle
+    # each when a wide request takes the bank first.
+    def step_stats(
+        self, addrs: np.ndarray, wide_addrs: Optional[np.ndarray] = None
+    ) -> Dict[str, np.ndarray]:
+        loads = self.bank_loads(addrs)
+        blocks = np.zeros_like(loads)
+        if wide_addrs is not None:
+            blocks = self.wide_blocks(wide_addrs, loads.shape[0]) * (loads > 0)
+        busy = loads + blocks
+        return {
+            "requests": loads.sum(axis=1),
+            "cycles": np.maximum(busy.max(axis=1), 1),
+            "stalls": (loads * (loads - 1) // 2 + blocks * loads).sum(axis=1),
+            "conflict_banks": ((loads > 1) | (blocks > 0)).sum(axis=1),
+        }
+
+    # Totals over a whole trace, comparable with the counters
+    # of snax_util.TcdmConflictMonitor
+    def summary(
+        self, addrs: np.ndarray, wide_addrs: Optional[np.ndarray] = None
+    ) -> Dict[str, float]:
+        addrs = np.atleast_2d(np.asarray(addrs, dtype=np.int64))
+        stats = self.step_stats(addrs, wide_addrs)
+        requests = int(stats["requests"].sum())
+        cycles = int(stats["cycles"].sum())
+        return {
+            "requests": requests,
+            "cycles": cycles,
+            "stalls": int(stats["stalls"].sum()),
+            "conflict_steps": int(np.count_nonzero(stats["conflict_banks"])),
+            "bandwidth": requests / (cycles * addrs.shape[1]) if cycles else 0.0,
+        }
+
+
+# Operations of the simple_alu case statement in the order
+# the RTL checks them. CsrAddrXor is 0 in simple_alu.sv, so
+# ALU_CONFIG 0 selects XOR and ALU_CONFIG 3 falls through to
+# the default addition.
+SIMPLE_ALU_OPS = {1: "sub", 2: "mul", 0: "xor"}
+SIMPLE_ALU_DEFAULT_OP = "add"
+
+
+# Bit-exact model of simple_alu_wrapper
+# The wrapper runs SpatPar simple_alu instances side by side:
+#   a = stream2acc_data_0, b = stream2acc_data_1
+#   result = acc2stream_data_0
+# Element i of a beat lives in bits [i*DataWidth +: DataWidth].
+# Beats are given as lists of integers or as word arrays with
+# one row of little-endian bytes per beat (see snax_util).
+# Results keep the low DataWidth bits like result_o does, which
+# the unsigned NumPy types of the element width do natively.
+class SimpleAluModel:
+    def __init__(self, data_width: int = 64, spat_par: int = 4) -> None:
+        if data_width not in [8, 16, 32, 64]:
+            raise Exception(f"Unsupported simple_alu DataWidth {data_width}.")
+
+        self.data_width = data_width
+        self.spat_par = spat_par
+        self.dtype = np.dtype(f"<u{data_width // 8}")
+
+    @staticmethod
+    def op_of(alu_config: int) -> str:
+        return SIMPLE_ALU_OPS.get(alu_config & 0x3, SIMPLE_ALU_DEFAULT_OP)
+
+    # Elements of a stream, shape (beats, SpatPar)
+    def unpack(self, words) -> np.ndarray:
+        if not isinstance(words, np.ndarray):
+            words = snax_util.int_list_to_words(
+                list(words), self.spat_par * self.data_width
+            )
+        return np.ascontiguousarray(words, dtype=np.uint8).view(self.dtype)
+
+    # Word array of a stream from its elements
+    def pack(self, elems: np.ndarray) -> np.ndarray:
+        elems = np.ascontiguousarray(elems, dtype=self.dtype)
+        return elems.reshape(-1, self.spat_par).view(np.uint8)
+
+    # Element-wise results of one ALU configuration
+    def compute(self, alu_config: int, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        a = np.asarray(a, dtype=self.dtype)
+        b = np.asarray(b, dtype=self.dtype)
+        op = self.op_of(alu_config)
+
+        if op == "sub":
+            return a - b
+        if op == "mul":
+            return a * b
+        if op == "xor":
+            return a ^ b
+        return a + b
+
+    # acc2stream beats for the two reader streams
+    def run(self, alu_config: int, a_words, b_words) -> List[int]:
+        result = self.compute(alu_config, self.unpack(a_words), self.unpack(b_words))
+        return snax_util.words_to_int_list(self.pack(result))
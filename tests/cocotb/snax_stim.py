@@ -0,0 +1,254 @@
+# ---------------------------------
+# Copyright 2024 KULeuven
+# Solderpad Hardware License, Version 0.51, see LICENSE for details.
+# SPDX-License-Identifier: SHL-0.51
+#
+# Description:
+# Constrained-random stimulus of the SNAX streamer.
+# The generator draws legal CSR configurations and the
+# data sets that go with them. All constraints come from
+# the streamer configuration file:
+# - loop bounds fit in loopBoundWidth bits
+# - every address stays inside the TCDM
+# - base pointers and strides are aligned to elementWidth
+# - each data mover reads or writes its own region, so
+#   reader and writer regions never overlap
+# Each stimulus is drawn from its own seeded generator,
+# so stimulus i of a seed can be reproduced on its own.
+# ---------------------------------
+
+from typing import Dict, List, Optional
+import numpy as np
+import snax_model
+import snax_util
+
+
+# One random streamer run
+# values are the CSR values by register name.
+# The TCDM is preloaded with mem_words at the narrow word
+# addresses mem_addrs and holds golden_mem_words after the run.
+# reader_data has the expected beats of each reader and
+# writer_data the beats each writer has to be fed.
+class StreamerStimulus:
+    def __init__(
+        self,
+        index: int,
+        values: Dict[str, int],
+        mem_addrs: List[int],
+        mem_words: List[int],
+        golden_mem_words: List[int],
+        reader_data: List[List[int]],
+        writer_data: List[List[int]],
+    ) -> None:
+        self.index = index
+        self.values = values
+        self.mem_addrs = mem_addrs
+        self.mem_words = mem_words
+        self.golden_mem_words = golden_mem_words
+        self.reader_data = reader_data
+        self.writer_data = writer_data
+
+    def num_beats(self) -> int:
+        return max(len(data) for data in self.reader_data + self.writer_data)
+
+
+# Seeded generator of legal streamer configurations and data
+# max_iters caps the temporal iterations of a run so hundreds
+# of configurations fit in one simulation.
+class StreamerStimGen:
+    def __init__(
+        self,
+        cfg: Optional[Dict] = None,
+        seed: int = 0,
+        max_iters: int = 64,
+        max_retries: int = 100,
+    ) -> None:
+        if cfg is None:
+            cfg = snax_util.load_streamer_cfg()
+
+        self.seed = seed
+        self.max_iters = max_iters
+        self.max_retries = max_retries
+        self.agu_model = snax_model.StreamerAguModel(cfg)
+
+        self.num_loop_dim = self.agu_model.num_loop_dim
+        self.max_loop_bound = (
+            2 ** cfg["temporalAddrGenUnitParams"]["loopBoundWidth"] - 1
+        )
+        self.num_reader = len(cfg["dataReaderParams"]["tcdmPortsNum"])
+        self.num_data_mover = self.agu_model.num_data_mover
+        self.elem_bytes = [
+            width // 8
+            for width in list(cfg["dataReaderParams"]["elementWidth"])
+            + list(cfg["dataWriterParams"]["elementWidth"])
+        ]
+        self.word_bytes = cfg["tcdmDataWidth"] // 8
+        self.tcdm_size = cfg["numBanks"] * cfg["tcdmDepth"] * self.word_bytes
+
+        # Every data mover gets an equal slice of the TCDM
+        # aligned to its elements and to the bank words
+        align = int(np.lcm.reduce(self.elem_bytes + [self.word_bytes]))
+        self.region_size = self.tcdm_size // self.num_data_mover // align * align
+
+        for mover in range(self.num_data_mover):
+            min_size = self.agu_model.tcdm_ports[mover] * self.elem_bytes[mover]
+            if self.region_size < min_size:
+                raise Exception(
+                    f"Data mover {mover} does not fit in a TCDM region "
+                    f"of {self.region_size} bytes."
+                )
+
+    # Temporal loop bounds with at most max_iters iterations
+    def _gen_loop_bounds(self, rng: np.random.Generator) -> List[int]:
+        bounds = [1] * self.num_loop_dim
+        budget = self.max_iters
+        for d in rng.permutation(self.num_loop_dim):
+            bounds[d] = int(rng.integers(1, min(self.max_loop_bound, budget) + 1))
+            budget //= bounds[d]
+        return bounds
+
+    # Stride multiple in [lo, hi]
+    # Half of the draws stay below small_mult so contiguous and
+    # bank-conflicting patterns show up as often as sparse ones
+    @staticmethod
+    def _draw_mult(rng: np.random.Generator, lo: int, hi: int, small_mult: int) -> int:
+        if rng.random() < 0.5:
+            hi = min(hi, lo + small_mult)
+        return int(rng.integers(lo, hi + 1))
+
+    # Strides and base pointer of one data mover
+    # The strides are drawn so that the address span of the
+    # mover fits in its region, then the base pointer is
+    # placed at a random aligned offset of that region.
+    def _gen_mover_values(
+        self,
+        rng: np.random.Generator,
+        values: Dict[str, int],
+        mover: int,
+        region: int,
+    ) -> None:
+        elem_bytes = self.elem_bytes[mover]
+        budget = self.region_size - elem_bytes
+
+        spatial_base = sum(self.agu_model.spatial_dim[:mover])
+        for k, bound in enumerate(self.agu_model.spatial_bounds[mover]):
+            max_mult = max(1, budget // 2 // (max(1, bound - 1) * elem_bytes))
+            stride = elem_bytes * self._draw_mult(rng, 1, max_mult, 4)
+            values[f"SPATIAL_STRIDE_{spatial_base + k}"] = stride
+            budget -= (bound - 1) * stride
+
+        bounds = self.agu_model.loop_bounds(values, mover)
+        for d in rng.permutation(self.num_loop_dim):
+            max_mult = max(0, budget) // (max(1, bounds[d] - 1) * elem_bytes)
+            stride = elem_bytes * self._draw_mult(
+                rng, 0, max_mult, self.agu_model.tcdm_ports[mover]
+            )
+            values[f"TEMPORAL_STRIDE_{mover * self.num_loop_dim + d}"] = stride
+            budget -= (bounds[d] - 1) * stride
+
+        offset = elem_bytes * int(rng.integers(0, max(0, budget) // elem_bytes + 1))
+        values[f"BASE_PTR_{mover}"] = region * self.region_size + offset
+        return
+
+    # The regions above only guide the draws, the constraints
+    # are checked on the addresses themselves:
+    # - every element lies inside the TCDM
+    # - no writer region overlaps a reader region
+    # - writers never write the same element twice, otherwise
+    #   the memory content depends on the TCDM arbitration
+    def is_legal(self, values: Dict[str, int]) -> bool:
+        spans = []
+        for mover in range(self.num_data_mover):
+            # Strides are never negative so the span runs from the base
+            # pointer to the last element, before any address wrapping
+            bounds = self.agu_model.loop_bounds(values, mover)
+            lo = values.get(f"BASE_PTR_{mover}", 0)
+            hi = lo + int(self.agu_model.port_offsets(values, mover).max())
+            hi += self.elem_bytes[mover]
+            for d, bound in enumerate(bounds):
+                stride = values.get(
+                    f"TEMPORAL_STRIDE_{mover * self.num_loop_dim + d}", 0
+                )
+                hi += (bound - 1) * stride
+            if hi > self.tcdm_size:
+                return False
+            spans.append((lo, hi))
+
+            addrs = self.agu_model.mover_addresses(values, mover)
+            if mover >= self.num_reader and np.unique(addrs).size != addrs.size:
+                return False
+
+        for writer in range(self.num_reader, self.num_data_mover):
+            for reader in range(self.num_reader):
+                if (
+                    spans[writer][0] < spans[reader][1]
+                    and spans[reader][0] < spans[writer][1]
+                ):
+                    return False
+        return True
+
+    # Random CSR values of one stimulus
+    def gen_values(self, rng: np.random.Generator) -> Dict[str, int]:
+        for _ in range(self.max_retries):
+            values = {
+                f"LOOP_COUNT_{d}": bound
+                for d, bound in enumerate(self._gen_loop_bounds(rng))
+            }
+            regions = rng.permutation(self.num_data_mover)
+            for mover in range(self.num_data_mover):
+                self._gen_mover_values(rng, values, mover, int(regions[mover]))
+            if self.is_legal(values):
+                return values
+
+        raise Exception(
+            f"No legal streamer configuration in {self.max_retries} tries "
+            f"for seed {self.seed}."
+        )
+
+    # Byte indices of every element of a data mover
+    # Returns an array of shape (iterations, TCDM ports * element bytes)
+    def _byte_idx(self, values: Dict[str, int], mover: int) -> np.ndarray:
+        addrs = self.agu_model.mover_addresses(values, mover)
+        byte_idx = addrs[:, :, None] + np.arange(self.elem_bytes[mover])
+        return byte_idx.reshape(addrs.shape[0], -1)
+
+    # Stimulus number index of the seed
+    def gen(self, index: int) -> StreamerStimulus:
+        rng = np.random.default_rng([self.seed, index])
+        return self.gen_data(self.gen_values(rng), rng, index)
+
+    # Random data sets of given CSR values, e.g., of a fixed workload
+    def gen_data(
+        self, values: Dict[str, int], rng: np.random.Generator, index: int = 0
+    ) -> StreamerStimulus:
+        # Random memory image, only the touched words go to the TCDM
+        image = rng.integers(0, 256, self.tcdm_size, dtype=np.uint8)
+        golden_image = image.copy()
+
+        reader_data = []
+        writer_data = []
+        touched = []
+        for mover in range(self.num_data_mover):
+            byte_idx = self._byte_idx(values, mover)
+            touched.append(np.unique(byte_idx // self.word_bytes))
+
+            # Port 0 holds the least significant element of a beat
+            if mover < self.num_reader:
+                reader_data.append(snax_util.words_to_int_list(image[byte_idx]))
+            else:
+                beats = rng.integers(0, 256, byte_idx.shape, dtype=np.uint8)
+                golden_image[byte_idx] = beats
+                writer_data.append(snax_util.words_to_int_list(beats))
+
+        word_idx = np.unique(np.concatenate(touched))
+        mem_byte_idx = word_idx[:, None] * self.word_bytes + np.arange(self.word_bytes)
+
+        return StreamerStimulus(
+            index,
+            values,
+            (word_idx * self.word_bytes).tolist(),
+            snax_util.words_to_int_list(image[mem_byte_idx]),
+            snax_util.words_to_int_list(golden_image[mem_byte_idx]),
+            reader_data,
+            writer_data,
+        )
@@ -1,18 +1,137 @@
 # Import packages
 import subprocess
 import os
+import contextlib
+import ctypes
+import fcntl
+import functools
+import hashlib
+import json
+import logging
+import shutil
+import time
 import random
-from typing import List, Tuple, Optional
+import hjson
+import importlib.util
+from types import ModuleType
+from typing import Awaitable, Callable, Dict, Iterable, List, Tuple, Optional
+import numpy as np
 import cocotb
-from cocotb.triggers import RisingEdge, Timer
+from cocotb.handle import NonHierarchyIndexableObject
+from cocotb.queue import Queue
+from cocotb.utils import get_sim_time
+from cocotb.triggers import (
+    Edge,
+    Event,
+    FallingEdge,
+    First,
+    RisingEdge,
+    ReadOnly,
+    Timer,
+    with_timeout,
+)
+from cocotb_test.simulator import Verilator, run
+from mako.template import Template
 from decimal import Decimal
 
 
+# Repository root (snax-dev directory)
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Directory for results that are expensive to recompute
+# and can be reused across pytest sessions
+CACHE_PATH = os.path.join(REPO_PATH, ".snax_cache")
+
+# Generated RTL and testbenches
+# Point SNAX_GEN_PATH to another directory to keep the generated
+# files of several streamer configurations apart, e.g., in sweeps
+GEN_PATH = os.getenv("SNAX_GEN_PATH")
+GEN_RTL_PATH = os.path.join(GEN_PATH, "rtl") if GEN_PATH else f"{REPO_PATH}/rtl"
+GEN_TB_PATH = os.path.join(GEN_PATH, "tb") if GEN_PATH else f"{REPO_PATH}/tests/tb"
+
+# Bender outputs only change when these files change
+BENDER_CACHE_FILE = os.path.join(CACHE_PATH, "bender.json")
+BENDER_FILES = ["Bender.yml", "Bender.lock", "Bender.local"]
+
+
+# This hashes the bender manifest, lock and local overrides
+def _bender_hash() -> str:
+    sha = hashlib.sha256()
+
+    for file_name in BENDER_FILES:
+        file_path = os.path.join(REPO_PATH, file_name)
+        sha.update(file_name.encode("utf-8"))
+        if os.path.exists(file_path):
+            with open(file_path, "rb") as f:
+                sha.update(hashlib.sha256(f.read()).digest())
+        else:
+            sha.update(b"missing")
+
+    return sha.hexdigest()
+
+
+# This loads the bender cache
+# It is reset whenever one of the bender files changed
+def _load_bender_cache() -> dict:
+    key = _bender_hash()
+
+    try:
+        with open(BENDER_CACHE_FILE, "r") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+
+    if cache.get("key") != key:
+        cache = {"key": key}
+
+    return cache
+
+
+# This stores the bender cache atomically
+# Rehash since bender can create Bender.lock on its first run
+def _store_bender_cache(cache: dict) -> None:
+    cache["key"] = _bender_hash()
+
+    os.makedirs(CACHE_PATH, exist_ok=True)
+    tmp_file = "{}.{}.tmp".format(BENDER_CACHE_FILE, os.getpid())
+    with open(tmp_file, "w") as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp_file, BENDER_CACHE_FILE)
+
+    return
+
+
 # This extracts all benderized files
+# The parsed list is cached so bender only runs
+# when Bender.yml, Bender.lock or Bender.local change
 def extract_bender_filelist() -> Tuple[List[str], List[str], List[str]]:
+    cache = _load_bender_cache()
+
+    if "filelist" not in cache:
+        includes, defines, verilog_sources = _run_bender_filelist()
+        cache["filelist"] = {
+            "includes": includes,
+            "defines": defines,
+            "verilog_sources": verilog_sources,
+        }
+        _store_bender_cache(cache)
+
+    filelist = cache["filelist"]
+
+    return (
+        list(filelist["includes"]),
+        list(filelist["defines"]),
+        list(filelist["verilog_sources"]),
+    )
+
+
+# This runs bender to extract all benderized files
+def _run_bender_filelist() -> Tuple[List[str], List[str], List[str]]:
     # Use verilator script because it has the complete and ordered filelist
     # bender script flist has incomplete include directories
-    filelist = subprocess.run(["bender", "script", "verilator"], stdout=subprocess.PIPE)
+    filelist = subprocess.run(
+        ["bender", "script", "verilator"], stdout=subprocess.PIPE, cwd=REPO_PATH
+    )
 
     filelist = filelist.stdout.decode("utf-8").strip().split("\n")
 
@@ -59,19 +178,86 @@ def extract_bender_filepath(target_module: str, given_list: List[str]) -> Option
 
 
 # This extracts the bender file path to
-# a specified package
+# a specified package. Paths are cached like the filelist
 def extract_src_path(target_src: str) -> str:
-    src_path = subprocess.run(["bender", "path", target_src], stdout=subprocess.PIPE)
-    src_path = src_path.stdout.decode("utf-8").strip().split("\n")[0]
+    cache = _load_bender_cache()
+    src_paths = cache.setdefault("src_paths", {})
+
+    if target_src not in src_paths:
+        src_path = subprocess.run(
+            ["bender", "path", target_src], stdout=subprocess.PIPE, cwd=REPO_PATH
+        )
+        src_paths[target_src] = src_path.stdout.decode("utf-8").strip().split("\n")[0]
+        _store_bender_cache(cache)
+
+    return src_paths[target_src]
+
+
+# Dependency manifest written by util/scripts/template_gen.py
+# Keep in sync with template_gen.DEP_FILE
+GEN_DEP_FILE = os.path.join(CACHE_PATH, "gen_deps.json")
+
+
+# This checks if the configuration or template of a generated
+# file changed since it was generated, or if the file itself changed.
+# Files without an entry in the manifest are never stale
+def gen_is_stale(target_file: str) -> bool:
+    try:
+        with open(GEN_DEP_FILE, "r") as f:
+            entry = json.load(f).get(os.path.abspath(target_file))
+    except (OSError, ValueError):
+        return False
+
+    if entry is None:
+        return False
+
+    dep_files = [
+        *entry["inputs"].items(),
+        (os.path.abspath(target_file), entry["output"]),
+    ]
+    for dep_file, dep_hash in dep_files:
+        if not os.path.exists(dep_file) or _file_hash(dep_file) != dep_hash:
+            return True
+
+    return False
+
+
+# This generates a file through its Makefile target if it does not exist
+# or if it is stale. Generation is serialized across processes since the targets
+# share intermediate files (e.g., StreamerTop.sv)
+def make_target(target_file: str) -> None:
+    os.makedirs(CACHE_PATH, exist_ok=True)
+
+    with open(os.path.join(CACHE_PATH, "make.lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if not os.path.exists(target_file) or gen_is_stale(target_file):
+                os.makedirs(GEN_RTL_PATH, exist_ok=True)
+                os.makedirs(GEN_TB_PATH, exist_ok=True)
+                make_vars = [
+                    f"CFG_PATH={os.path.dirname(STREAMER_CFG_FILE)}",
+                    f"STREAM_CFG_FILENAME={os.path.basename(STREAMER_CFG_FILE)}",
+                    f"RTL_PATH={GEN_RTL_PATH}",
+                    f"TB_PATH={GEN_TB_PATH}",
+                ]
+                subprocess.run(["make", target_file, *make_vars], cwd=REPO_PATH)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
 
-    return src_path
+    return
 
 
 # This lists all necessary files for the
-# TCDM subsystem
+# TCDM subsystem. The lists are built once per repo path
 def extract_tcdm_list() -> Tuple[List[str], List[str]]:
     # Get repo path (from snax-dev directory)
-    repo_path = os.getcwd()
+    include_list, verilog_list = _build_tcdm_list(REPO_PATH)
+
+    return list(include_list), list(verilog_list)
+
+
+@functools.lru_cache(maxsize=None)
+def _build_tcdm_list(repo_path: str) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
     pulp_submodule_path = repo_path + "/rtl/pulp-submodules"
 
     # Extract bender path names
@@ -142,18 +328,452 @@ def extract_tcdm_list() -> Tuple[List[str], List[str]]:
         + tcdm_subsys
     )
 
-    return include_list, verilog_list
+    return tuple(include_list), tuple(verilog_list)
+
+
+# Compiled simulation models are kept side by side
+# under sim_build, one directory per build key
+SIM_BUILD_PATH = os.path.join(REPO_PATH, "tests", "cocotb", "sim_build")
+SIM_BUILD_CACHE_SIZE = int(os.getenv("SNAX_SIM_BUILD_CACHE_SIZE", 8))
+SIM_BUILD_KEY_FILE = ".snax_build_key"
+SIM_BUILD_LOCK_FILE = ".snax_build_lock"
+
+# Verilator main with the trace control of the wave windows
+VERILATOR_TRACE_MAIN = os.path.join(
+    REPO_PATH, "tests", "cocotb", "verilator_trace_main.cpp"
+)
+
+# Every test run gets its own directory for results,
+# logs and waveforms. These are merged after the session
+# into SNAX_SIM_OUT_PATH, which is sim_build by default
+SIM_OUT_PATH = os.getenv("SNAX_SIM_OUT_PATH", SIM_BUILD_PATH)
+SIM_RUN_PATH = os.path.join(SIM_OUT_PATH, "runs")
+
+# Content hashes of files already seen in this process
+# Keyed on path, modification time and size
+_file_hash_cache: Dict[Tuple[str, int, int], str] = {}
+
+
+# This hashes the contents of a single file
+def _file_hash(file_path: str) -> str:
+    file_stat = os.stat(file_path)
+    stat_key = (file_path, file_stat.st_mtime_ns, file_stat.st_size)
+
+    if stat_key not in _file_hash_cache:
+        with open(file_path, "rb") as f:
+            _file_hash_cache[stat_key] = hashlib.sha256(f.read()).hexdigest()
+
+    return _file_hash_cache[stat_key]
+
+
+# This computes the build key of a simulation model
+# It covers the source and header contents, defines,
+# includes, parameters and every compile option
+def gen_sim_build_key(
+    simulator: str,
+    toplevel: str,
+    verilog_sources: List[str],
+    includes: List[str],
+    defines: List[str],
+    parameters: Optional[Dict[str, str]],
+    compile_args: Optional[List[str]],
+    waves,
+    timescale: Optional[str],
+) -> str:
+    sha = hashlib.sha256()
+
+    def add(item) -> None:
+        sha.update(json.dumps(item, sort_keys=True).encode("utf-8"))
+
+    add([simulator, toplevel, cocotb.__version__])
+    add([defines, includes, parameters or {}, compile_args or []])
+    add([bool(int(waves or 0)), timescale])
+
+    for src in verilog_sources:
+        add([os.path.abspath(src), _file_hash(src)])
+
+    # Headers can be pulled in from anywhere under the include directories
+    for inc in includes:
+        for root, dirs, files in os.walk(inc):
+            dirs.sort()
+            for file_name in sorted(files):
+                file_path = os.path.join(root, file_name)
+                add([file_path, _file_hash(file_path)])
+
+    return sha.hexdigest()
+
+
+# This removes the least recently used simulation models
+# Models that are being built or run right now are kept
+def _evict_sim_builds(max_builds: int) -> None:
+    build_dirs = []
+    for toplevel in os.listdir(SIM_BUILD_PATH):
+        toplevel_path = os.path.join(SIM_BUILD_PATH, toplevel)
+        if not os.path.isdir(toplevel_path):
+            continue
+        for build in os.listdir(toplevel_path):
+            key_file = os.path.join(toplevel_path, build, SIM_BUILD_KEY_FILE)
+            if os.path.isfile(key_file):
+                build_dirs.append((os.path.getmtime(key_file), toplevel_path, build))
+
+    build_dirs.sort(reverse=True)
+
+    for _, toplevel_path, build in build_dirs[max_builds:]:
+        build_dir = os.path.join(toplevel_path, build)
+        with open(os.path.join(build_dir, SIM_BUILD_LOCK_FILE), "a") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                continue
+            shutil.rmtree(build_dir, ignore_errors=True)
+
+    return
+
+
+# Verilator runner that can skip verilating and compiling
+# when a model with the same build key already exists
+class _CachedVerilator(Verilator):
+    def __init__(
+        self, *argv, reuse_build: bool = False, trace_ctrl: bool = False, **kwargs
+    ):
+        super().__init__(*argv, **kwargs)
+        self.reuse_build = reuse_build
+        self.trace_ctrl = trace_ctrl
+
+    def build_command(self):
+        cmds = super().build_command()
+
+        # Swap the cocotb main for the one with trace control
+        if self.trace_ctrl:
+            cmds[0] = [
+                VERILATOR_TRACE_MAIN if arg.endswith("verilator.cpp") else arg
+                for arg in cmds[0]
+            ]
+
+        if self.reuse_build:
+            sim_exec = os.path.join(self.sim_dir, self.toplevel_module)
+            cmds = [cmd for cmd in cmds if cmd[0] == sim_exec]
+
+        return cmds
+
+
+# This redirects the results file and simulator log
+# of a single run into its own run directory
+@contextlib.contextmanager
+def _sim_run_context(run_dir: Optional[str]):
+    if run_dir is None:
+        yield
+        return
+
+    results_file = os.path.join(run_dir, "results.xml")
+    if os.path.exists(results_file):
+        os.remove(results_file)
+
+    prev_results_file = os.environ.get("COCOTB_RESULTS_FILE")
+    os.environ["COCOTB_RESULTS_FILE"] = results_file
+
+    log_handler = logging.FileHandler(os.path.join(run_dir, "sim.log"), mode="w")
+    logging.getLogger("cocotb").addHandler(log_handler)
+
+    try:
+        yield
+    finally:
+        logging.getLogger("cocotb").removeHandler(log_handler)
+        log_handler.close()
+        if prev_results_file is None:
+            del os.environ["COCOTB_RESULTS_FILE"]
+        else:
+            os.environ["COCOTB_RESULTS_FILE"] = prev_results_file
+
+
+# This runs a cocotb test on a cached simulation model
+# Arguments are the same as cocotb_test.simulator.run
+# except for sim_build which is derived from the build key.
+# A matching Verilator model is reused as is, other
+# simulators build in the run directory of each run.
+# With run_dir set, the simulation runs in that directory
+# and writes its results, log and waveforms there so that
+# several runs can share a model in parallel.
+def run_sim(
+    simulator: str,
+    toplevel: str,
+    module: str,
+    verilog_sources: List[str],
+    includes: Optional[List[str]] = None,
+    defines: Optional[List[str]] = None,
+    parameters: Optional[Dict[str, str]] = None,
+    compile_args: Optional[List[str]] = None,
+    waves=None,
+    timescale: Optional[str] = None,
+    run_dir: Optional[str] = None,
+    **kwargs,
+) -> str:
+    includes = includes or []
+    defines = defines or []
+
+    # Wave windows need a Verilator model with tracing and the trace
+    # control main, a full --waves dump already holds every cycle
+    trace_ctrl = (
+        simulator == "verilator"
+        and not int(waves or 0)
+        and int(os.getenv("SNAX_WAVE_WINDOW", 0)) > 0
+    )
+    if trace_ctrl:
+        compile_args = (compile_args or []) + [
+            "--trace",
+            "--trace-structs",
+            "-LDFLAGS",
+            "-rdynamic",
+            "-CFLAGS",
+            f"-DSNAX_TRACE_MAIN={_file_hash(VERILATOR_TRACE_MAIN)[:16]}",
+        ]
+
+    build_key = gen_sim_build_key(
+        simulator,
+        toplevel,
+        verilog_sources,
+        includes,
+        defines,
+        parameters,
+        compile_args,
+        waves,
+        timescale,
+    )
+    sim_build = os.path.join(SIM_BUILD_PATH, toplevel, build_key[:16])
+    os.makedirs(sim_build, exist_ok=True)
+
+    sim_kwargs = dict(
+        toplevel=toplevel,
+        module=module,
+        verilog_sources=verilog_sources,
+        includes=includes,
+        defines=defines,
+        parameters=parameters,
+        compile_args=compile_args,
+        waves=waves,
+        timescale=timescale,
+        sim_build=sim_build,
+        **kwargs,
+    )
+
+    if run_dir is not None:
+        os.makedirs(run_dir, exist_ok=True)
+        sim_kwargs["work_dir"] = run_dir
+
+    lock_file = os.path.join(sim_build, SIM_BUILD_LOCK_FILE)
+    key_file = os.path.join(sim_build, SIM_BUILD_KEY_FILE)
+
+    # Other simulators compile into their build directory on every
+    # run, so parallel runs each build in their own run directory.
+    # Without a run directory they take turns on the shared one.
+    if simulator != "verilator":
+        with open(lock_file, "a") as lock, _sim_run_context(run_dir):
+            if run_dir is not None:
+                sim_kwargs["sim_build"] = os.path.join(run_dir, "sim_build")
+                return run(simulator=simulator, **sim_kwargs)
+
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                results_file = run(simulator=simulator, **sim_kwargs)
+                with open(key_file, "w") as f:
+                    f.write(build_key)
+                return results_file
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    # Runs share the model under a shared lock, which also keeps
+    # the model from being evicted. Only a missing model takes the
+    # exclusive lock, so concurrent runs with the same key compile
+    # it once and the runs of a built model never wait on each other.
+    with open(lock_file, "a") as lock, _sim_run_context(run_dir):
+        fcntl.flock(lock, fcntl.LOCK_SH)
+        try:
+            if not os.path.isfile(key_file):
+                fcntl.flock(lock, fcntl.LOCK_UN)
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                if not os.path.isfile(key_file):
+                    _CachedVerilator(
+                        compile_only=True, trace_ctrl=trace_ctrl, **sim_kwargs
+                    ).run()
+                    with open(key_file, "w") as f:
+                        f.write(build_key)
+                fcntl.flock(lock, fcntl.LOCK_SH)
+
+            os.utime(key_file)
+            results_file = _CachedVerilator(reuse_build=True, **sim_kwargs).run()
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+    _evict_sim_builds(SIM_BUILD_CACHE_SIZE)
+
+    return results_file
+
+
+# Number of 32-bit Mersenne Twister outputs
+# that a single random.getrandbits(k) call consumes
+def _mt_words_per_draw(k: int) -> int:
+    return (k - 1) // 32 + 1
+
+
+# This draws list_len values in [0, n) from a seeded
+# Mersenne Twister in bulk. The draws are bit-exact with
+# list_len consecutive random.randint calls (CPython's
+# getrandbits + rejection sampling) so golden values stay
+# the same. The python random state is advanced exactly
+# like the scalar loop would do. Output is an array of
+# shape (list_len, words) with little-endian 32-bit words.
+def _gen_rand_below_words(list_len: int, n: int) -> np.ndarray:
+    k = n.bit_length()
+    num_words = _mt_words_per_draw(k)
+    last_shift = 32 * num_words - k
+
+    # Split the exclusive upper bound into 32-bit words
+    bound = [(n >> (32 * i)) & 0xFFFFFFFF for i in range(num_words)]
+
+    # Mirror the python generator state into numpy
+    py_state = random.getstate()
+    bitgen = np.random.MT19937()
+    bitgen.state = {
+        "bit_generator": "MT19937",
+        "state": {
+            "key": np.array(py_state[1][:624], dtype=np.uint32),
+            "pos": py_state[1][624],
+        },
+    }
+    start_state = bitgen.state
+
+    accepted = []
+    num_accepted = 0
+    num_draws = 0
+
+    while num_accepted < list_len:
+        # Each draw is accepted with probability > 0.5
+        batch = 2 * (list_len - num_accepted) + 16
+        draws = bitgen.random_raw(batch * num_words).astype(np.uint32)
+        draws = draws.reshape(batch, num_words)
+        draws[:, -1] >>= np.uint32(last_shift)
+
+        # Vectorized multi-word r < n comparison
+        # starting from the most significant word
+        is_less = np.zeros(batch, dtype=bool)
+        is_equal = np.ones(batch, dtype=bool)
+        for i in range(num_words - 1, -1, -1):
+            is_less |= is_equal & (draws[:, i] < bound[i])
+            is_equal &= draws[:, i] == bound[i]
+
+        accept_idx = np.flatnonzero(is_less)[: list_len - num_accepted]
+        accepted.append(draws[accept_idx])
+        num_accepted += len(accept_idx)
+
+        if num_accepted < list_len:
+            num_draws += batch
+        else:
+            num_draws += int(accept_idx[-1]) + 1
+
+    # Advance the python generator by exactly the consumed draws
+    bitgen.state = start_state
+    bitgen.random_raw(num_draws * num_words, output=False)
+    end_state = bitgen.state["state"]
+    random.setstate(
+        (
+            py_state[0],
+            tuple(int(x) for x in end_state["key"]) + (int(end_state["pos"]),),
+            py_state[2],
+        )
+    )
+
+    if accepted:
+        return np.concatenate(accepted)
+    return np.zeros((0, num_words), dtype=np.uint32)
+
+
+# This converts an array of little-endian 32-bit
+# words into a word array of num_bytes bytes per row
+# Rows are truncated or zero-extended to fit
+def _words32_to_words(words32: np.ndarray, num_bytes: int) -> np.ndarray:
+    raw = words32.astype("<u4").view(np.uint8).reshape(-1, 4 * words32.shape[1])
+
+    if raw.shape[1] >= num_bytes:
+        return np.ascontiguousarray(raw[:, :num_bytes])
+
+    words = np.zeros((raw.shape[0], num_bytes), dtype=np.uint8)
+    words[:, : raw.shape[1]] = raw
+    return words
+
+
+# This converts a list of integers into a word array
+# Each row is one data_width-bit word in little-endian bytes
+# Values are masked to data_width like the hardware does
+def int_list_to_words(int_list: List[int], data_width: int) -> np.ndarray:
+    num_bytes = data_width // 8
+    mask = 2**data_width - 1
+    raw = b"".join([(val & mask).to_bytes(num_bytes, "little") for val in int_list])
+    return np.frombuffer(raw, dtype=np.uint8).reshape(len(int_list), num_bytes)
+
+
+# This converts a word array back into a list of integers
+def words_to_int_list(words: np.ndarray) -> List[int]:
+    num_bytes = words.shape[1]
+
+    # Words that fit in 64 bits convert natively
+    if num_bytes <= 8:
+        padded = np.zeros((words.shape[0], 8), dtype=np.uint8)
+        padded[:, :num_bytes] = words
+        return padded.view("<u8").ravel().tolist()
+
+    raw = np.ascontiguousarray(words, dtype=np.uint8).tobytes()
+    return [
+        int.from_bytes(raw[i : i + num_bytes], "little")
+        for i in range(0, len(raw), num_bytes)
+    ]
+
+
+# This packs every wide_narrow_ratio consecutive narrow
+# words into one wide word. Narrow word j lands in bits
+# [j*narrow_width +: narrow_width] so this is a reshape
+def pack_words(narrow_words: np.ndarray, wide_narrow_ratio: int) -> np.ndarray:
+    wide_len = narrow_words.shape[0] // wide_narrow_ratio
+    return narrow_words[: wide_len * wide_narrow_ratio].reshape(
+        wide_len, wide_narrow_ratio * narrow_words.shape[1]
+    )
+
+
+# This unpacks wide words into their narrow words
+def unpack_words(wide_words: np.ndarray, wide_narrow_ratio: int) -> np.ndarray:
+    return wide_words.reshape(-1, wide_words.shape[1] // wide_narrow_ratio)
+
+
+# This generates a random word array of data_width-bit words
+# It draws the same values as gen_rand_int_list
+def gen_rand_words(
+    list_len: int, min_val: int, max_val: int, data_width: int
+) -> np.ndarray:
+    if min_val != 0:
+        return int_list_to_words(
+            gen_rand_int_list(list_len, min_val, max_val), data_width
+        )
+
+    random.seed(0)
+
+    words32 = _gen_rand_below_words(list_len, max_val + 1)
+
+    return _words32_to_words(words32, data_width // 8)
 
 
 # This generates a random list of integers
 # Input is list length, the minimum value and max value
 def gen_rand_int_list(list_len: int, min_val: int, max_val: int) -> List[int]:
-    uint_list = []
+    # Only keep as many bytes as the largest value needs
+    val_range = max_val - min_val + 1
+    num_bytes = max(1, ((val_range - 1).bit_length() + 7) // 8)
 
     random.seed(0)
 
-    for i in range(list_len):
-        uint_list.append(random.randint(min_val, max_val))
+    words32 = _gen_rand_below_words(list_len, val_range)
+    uint_list = words_to_int_list(_words32_to_words(words32, num_bytes))
+
+    if min_val != 0:
+        uint_list = [val + min_val for val in uint_list]
 
     return uint_list
 
@@ -166,31 +786,205 @@ def gen_wide_list(
     # This one checks if the number of narrow elements
     # Is divisible by the ratio of wide and narrow widths
     # Otherwise you will not utilize the entire DMA
-    wide_list = []
     wide_narrow_ratio = int(wide_width / narrow_width)
     if len(narrow_list) % wide_narrow_ratio:
         print("WARNING! Number of elements and wide-narrow ratio are not divisible")
 
     wide_len = int(len(narrow_list) / wide_narrow_ratio)
 
+    # Byte-aligned widths are packed in bulk
+    if narrow_width % 8 == 0:
+        narrow_words = int_list_to_words(
+            narrow_list[: wide_len * wide_narrow_ratio], narrow_width
+        )
+        return words_to_int_list(pack_words(narrow_words, wide_narrow_ratio))
+
+    wide_list = []
+    narrow_mask = 2**narrow_width - 1
+
     for i in range(wide_len):
         wide_num = 0
         for j in range(wide_narrow_ratio - 1, -1, -1):
-            wide_num += (
-                narrow_list[i * wide_narrow_ratio + j] & (2**narrow_width - 1)
-            ) << (narrow_width * j)
+            wide_num += (narrow_list[i * wide_narrow_ratio + j] & narrow_mask) << (
+                narrow_width * j
+            )
         wide_list.append(wide_num)
 
     return wide_list
 
 
+# This is the inverse of gen_wide_list
+# It splits wide data back into the contigious narrow list
+def gen_narrow_list(
+    wide_list: List[int], narrow_width: int, wide_width: int
+) -> List[int]:
+    wide_narrow_ratio = int(wide_width / narrow_width)
+
+    if narrow_width % 8 == 0:
+        wide_words = int_list_to_words(wide_list, narrow_width * wide_narrow_ratio)
+        return words_to_int_list(unpack_words(wide_words, wide_narrow_ratio))
+
+    narrow_mask = 2**narrow_width - 1
+
+    return [
+        (wide_num >> (narrow_width * j)) & narrow_mask
+        for wide_num in wide_list
+        for j in range(wide_narrow_ratio)
+    ]
+
+
 # Compare and assert
+# The values are only formatted for a mismatch or when
+# the debug log level asks for every compared word
 def comp_and_assert(golden_data: int, actual_data: int) -> None:
-    cocotb.log.info(f"Golden data: {hex(golden_data)}; Actual data: {hex(actual_data)}")
-    assert golden_data == actual_data
+    if cocotb.log.isEnabledFor(logging.DEBUG):
+        cocotb.log.debug(
+            f"Golden data: {hex(golden_data)}; Actual data: {hex(actual_data)}"
+        )
+    assert golden_data == actual_data, (
+        f"Golden data: {hex(golden_data)}; Actual data: {hex(actual_data)}; "
+        f"Bit-diff: {hex(golden_data ^ actual_data)}"
+    )
     return
 
 
+# Readable description of one mismatching word
+# The bit-diff marks the bits that differ from the golden value
+def format_mismatch(
+    name: str,
+    index: int,
+    golden_data: int,
+    actual_data: int,
+    addr: Optional[int] = None,
+) -> str:
+    addr_str = "" if addr is None else f" @ {hex(addr)}"
+    if golden_data is None or actual_data is None:
+        golden_str = "missing" if golden_data is None else hex(golden_data)
+        actual_str = "missing" if actual_data is None else hex(actual_data)
+        return f"{name}[{index}]{addr_str}: Golden: {golden_str}; Actual: {actual_str}"
+
+    bit_diff = golden_data ^ actual_data
+    return (
+        f"{name}[{index}]{addr_str}: Golden: {hex(golden_data)}; "
+        f"Actual: {hex(actual_data)}; Bit-diff: {hex(bit_diff)} "
+        f"({bin(bit_diff).count('1')} bits)"
+    )
+
+
+# Result of a bulk comparison
+# Only the mismatches are kept as (index, golden, actual) and
+# the summary is only formatted when it is asked for.
+# Missing words of the shorter list are None
+class CompareResult:
+    def __init__(
+        self,
+        name: str,
+        num_compared: int,
+        mismatches: List[Tuple[int, Optional[int], Optional[int]]],
+        base_addr: Optional[int] = None,
+        addr_stride: int = 0,
+    ) -> None:
+        self.name = name
+        self.num_compared = num_compared
+        self.mismatches = mismatches
+        self.base_addr = base_addr
+        self.addr_stride = addr_stride
+
+    def __bool__(self) -> bool:
+        return not self.mismatches
+
+    def addr_of(self, index: int) -> Optional[int]:
+        if self.base_addr is None:
+            return None
+        return self.base_addr + index * self.addr_stride
+
+    # Lists at most max_lines mismatches
+    def summary(self, max_lines: int = 8) -> str:
+        lines = [
+            f"{self.name}: {len(self.mismatches)} of "
+            f"{self.num_compared} words mismatch"
+        ]
+        for index, golden_data, actual_data in self.mismatches[:max_lines]:
+            lines.append(
+                format_mismatch(
+                    self.name, index, golden_data, actual_data, self.addr_of(index)
+                )
+            )
+        if len(self.mismatches) > max_lines:
+            lines.append(f"... {len(self.mismatches) - max_lines} more")
+        return "\n".join(lines)
+
+
+# Compare whole lists, arrays or streams of words in one call
+# Equal lists are compared in a single C-level comparison and
+# only the mismatches are recorded. Give base_addr and addr_stride
+# to report the address of each mismatch. Every word is only logged
+# when the debug log level is enabled.
+def comp_list(
+    golden_list: Iterable[int],
+    actual_list: Iterable[int],
+    name: str = "data",
+    base_addr: Optional[int] = None,
+    addr_stride: int = 0,
+) -> CompareResult:
+    golden_list = (
+        golden_list.tolist()
+        if isinstance(golden_list, np.ndarray)
+        else list(golden_list)
+    )
+    actual_list = (
+        actual_list.tolist()
+        if isinstance(actual_list, np.ndarray)
+        else list(actual_list)
+    )
+    result = CompareResult(name, len(golden_list), [], base_addr, addr_stride)
+
+    if cocotb.log.isEnabledFor(logging.DEBUG):
+        for index, (golden_data, actual_data) in enumerate(
+            zip(golden_list, actual_list)
+        ):
+            cocotb.log.debug(
+                f"{name}[{index}]: Golden: {hex(golden_data)}; "
+                f"Actual: {hex(actual_data)}"
+            )
+
+    if golden_list == actual_list:
+        return result
+
+    result.mismatches = [
+        (index, golden_data, actual_data)
+        for index, (golden_data, actual_data) in enumerate(
+            zip(golden_list, actual_list)
+        )
+        if golden_data != actual_data
+    ]
+
+    # Missing or extra words of the shorter list
+    num_words = max(len(golden_list), len(actual_list))
+    for index in range(min(len(golden_list), len(actual_list)), num_words):
+        golden_data = golden_list[index] if index < len(golden_list) else None
+        actual_data = actual_list[index] if index < len(actual_list) else None
+        result.mismatches.append((index, golden_data, actual_data))
+    result.num_compared = num_words
+
+    return result
+
+
+# Bulk comparison that fails the test on any mismatch
+def comp_and_assert_list(
+    golden_list: Iterable[int],
+    actual_list: Iterable[int],
+    name: str = "data",
+    base_addr: Optional[int] = None,
+    addr_stride: int = 0,
+) -> CompareResult:
+    result = comp_list(golden_list, actual_list, name, base_addr, addr_stride)
+    if not result:
+        dump_wave_windows(f"{name} mismatch")
+    assert result, result.summary()
+    return result
+
+
 # Functions for register reading or writing
 # to controls status registers. This one
 # uses the direct connection for the
@@ -202,6 +996,150 @@ async def clock_and_wait(dut) -> None:
     return
 
 
+# Clock period the tests drive clk_i with
+CLK_PERIOD_NS = 10
+
+
+# Event-driven waits that end like clock_and_wait,
+# 1 ps after a rising edge, so drivers can change
+# their inputs right away. Idle cycles are skipped with edge
+# and timer triggers instead of waking Python every cycle.
+
+
+# Same as num_cycles calls of clock_and_wait
+# with two trigger waits regardless of num_cycles
+async def wait_cycles(
+    dut, num_cycles: int, clk_period_ns: float = CLK_PERIOD_NS
+) -> None:
+    if num_cycles <= 0:
+        return
+    await RisingEdge(dut.clk_i)
+    period_ps = Decimal(str(clk_period_ns)) * 1000
+    await Timer((num_cycles - 1) * period_ps + 1, units="ps")
+    return
+
+
+async def _wait_handshake(dut, valid, ready, bits) -> Optional[int]:
+    while True:
+        await ReadOnly()
+        pending = [signal for signal in (valid, ready) if signal.value != 1]
+        if not pending:
+            break
+        await First(*[Edge(signal) for signal in pending])
+
+    data = None if bits is None else int(bits.value)
+    await clock_and_wait(dut)
+    return data
+
+
+# Wait for the next handshake, i.e., a rising edge where
+# valid and ready are both high, and return the sampled bits
+# Raises cocotb.result.SimTimeoutError after timeout_ns
+async def wait_handshake(
+    dut, valid, ready, bits=None, timeout_ns: Optional[float] = None
+) -> Optional[int]:
+    if timeout_ns is None:
+        return await _wait_handshake(dut, valid, ready, bits)
+    return await with_timeout(
+        _wait_handshake(dut, valid, ready, bits), timeout_ns, "ns"
+    )
+
+
+# Wait for num_beats handshakes and return the sampled bits
+# The timeout covers all handshakes together
+async def wait_handshakes(
+    dut, valid, ready, num_beats: int, bits=None, timeout_ns: Optional[float] = None
+) -> List[Optional[int]]:
+    async def _wait_all() -> List[Optional[int]]:
+        return [
+            await _wait_handshake(dut, valid, ready, bits) for _ in range(num_beats)
+        ]
+
+    if timeout_ns is None:
+        return await _wait_all()
+    return await with_timeout(_wait_all(), timeout_ns, "ns")
+
+
+async def _wait_until_idle(dut, signals: List) -> None:
+    while True:
+        await ReadOnly()
+        pending = [signal for signal in signals if signal.value != 0]
+        if not pending:
+            break
+        await First(*[Edge(signal) for signal in pending])
+
+    await clock_and_wait(dut)
+    return
+
+
+# Wait until all signals are low, e.g., valid or busy flags
+# Raises cocotb.result.SimTimeoutError after timeout_ns
+async def wait_until_idle(
+    dut, signals: List, timeout_ns: Optional[float] = None
+) -> None:
+    if timeout_ns is None:
+        return await _wait_until_idle(dut, signals)
+    return await with_timeout(_wait_until_idle(dut, signals), timeout_ns, "ns")
+
+
+# Bits of the given ports of a port array or of a
+# packed vector with one bit per port, e.g., tcdm_req_q_valid
+def _port_bits(signal, ports: List[int]) -> List[int]:
+    if isinstance(signal, NonHierarchyIndexableObject):
+        return [int(signal[port].value) for port in ports]
+    value = int(signal.value)
+    return [(value >> port) & 1 for port in ports]
+
+
+async def _wait_tcdm_writes(
+    dut, valid, ready, write, ports: List[int], num_writes: int
+) -> None:
+    if isinstance(valid, NonHierarchyIndexableObject):
+        valid_signals = [valid[port] for port in ports]
+    else:
+        valid_signals = [valid]
+
+    num_granted = 0
+    while num_granted < num_writes:
+        await FallingEdge(dut.clk_i)
+        await ReadOnly()
+        valid_bits = _port_bits(valid, ports)
+        if not any(valid_bits):
+            await First(*[Edge(signal) for signal in valid_signals])
+            continue
+        num_granted += sum(
+            v & r & w
+            for v, r, w in zip(
+                valid_bits, _port_bits(ready, ports), _port_bits(write, ports)
+            )
+        )
+
+    await clock_and_wait(dut)
+    return
+
+
+# Wait until the TCDM ports got num_writes write requests granted,
+# e.g., until the writers of the streamer stored all their elements.
+# Start it before the writes begin, it only counts from then on.
+# Raises cocotb.result.SimTimeoutError after timeout_ns
+async def wait_tcdm_writes(
+    dut,
+    valid,
+    ready,
+    write,
+    ports: List[int],
+    num_writes: int,
+    timeout_ns: Optional[float] = None,
+) -> None:
+    if timeout_ns is None:
+        return await _wait_tcdm_writes(dut, valid, ready, write, ports, num_writes)
+    return await with_timeout(
+        _wait_tcdm_writes(dut, valid, ready, write, ports, num_writes),
+        timeout_ns,
+        "ns",
+    )
+
+
 # Functions for reading and writing to registers
 # For writing to registers
 async def reg_write(dut, addr: int, data: int) -> None:
@@ -209,11 +1147,8 @@ async def reg_write(dut, addr: int, data: int) -> None:
     dut.io_csr_req_bits_addr_i.value = addr
     dut.io_csr_req_bits_write_i.value = 1
     dut.io_csr_req_valid_i.value = 1
-    # Check if ready is high, wait if not
-    await Timer(Decimal(1), units="ps")
-    while dut.io_csr_req_ready_o.value != 1:
-        await clock_and_wait(dut)
-    await clock_and_wait(dut)
+    # Wait until ready is high
+    await wait_handshake(dut, dut.io_csr_req_valid_i, dut.io_csr_req_ready_o)
 
     return
 
@@ -241,6 +1176,234 @@ async def reg_clr(dut) -> None:
     return
 
 
+# Default streamer configuration that generates the RTL
+# Point SNAX_STREAMER_CFG to another file for sweeps
+STREAMER_CFG_FILE = os.getenv(
+    "SNAX_STREAMER_CFG",
+    os.path.join(REPO_PATH, "util", "cfg", "streamer_cfg.hjson"),
+)
+CSR_MAP_TPL_FILE = os.path.join(
+    REPO_PATH, "util", "templates", "streamer_csr_map.py.tpl"
+)
+CSR_MAP_CACHE_PATH = os.path.join(CACHE_PATH, "csr_maps")
+
+
+# Load a streamer configuration file
+def load_streamer_cfg(cfg_path: str = STREAMER_CFG_FILE) -> Dict:
+    with open(cfg_path, "r") as f:
+        cfg = hjson.load(f)
+    return cfg
+
+
+# Python module with the streamer CSR address map
+# It is rendered from streamer_csr_map.py.tpl with the same
+# formula as streamer_wrapper.sv.tpl and stored under a name
+# derived from the configuration and template contents.
+# Later sessions import the stored module and the same
+# configuration is only loaded once per session.
+@functools.lru_cache(maxsize=None)
+def load_streamer_csr_module(cfg_path: str = STREAMER_CFG_FILE) -> ModuleType:
+    sha = hashlib.sha256()
+    for file_path in [cfg_path, CSR_MAP_TPL_FILE]:
+        with open(file_path, "rb") as f:
+            sha.update(f.read())
+    module_name = "streamer_csr_map_" + sha.hexdigest()[:16]
+    module_file = os.path.join(CSR_MAP_CACHE_PATH, module_name + ".py")
+
+    if not os.path.exists(module_file):
+        tpl = Template(filename=CSR_MAP_TPL_FILE)
+        os.makedirs(CSR_MAP_CACHE_PATH, exist_ok=True)
+        tmp_file = f"{module_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w") as f:
+            f.write(tpl.render_unicode(cfg=load_streamer_cfg(cfg_path)))
+        os.replace(tmp_file, module_file)
+
+    spec = importlib.util.spec_from_file_location(module_name, module_file)
+    if spec is None or spec.loader is None:
+        raise Exception(f"Unable to load CSR map {module_file}.")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return module
+
+
+# Named CSR addresses of a design
+# Indexing with an unknown name raises an exception
+# instead of silently programming a wrong address.
+class CsrRegMap:
+    def __init__(self, regs: Dict[str, int]) -> None:
+        self.regs = dict(regs)
+
+    def __getitem__(self, name: str) -> int:
+        if name not in self.regs:
+            raise Exception(f"Unknown CSR register {name}.")
+        return self.regs[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.regs
+
+    def __len__(self) -> int:
+        return len(self.regs)
+
+    # Combine two maps, e.g., accelerator and streamer CSRs
+    def merge(self, other: "CsrRegMap") -> "CsrRegMap":
+        overlap = set(self.regs.values()) & set(other.regs.values())
+        if overlap:
+            raise Exception(f"CSR register maps overlap at {sorted(overlap)}.")
+        return CsrRegMap({**self.regs, **other.regs})
+
+    # (address, value) pairs ordered by address
+    def addr_data(self, values: Dict[str, int]) -> List[Tuple[int, int]]:
+        return sorted((self[name], value) for name, value in values.items())
+
+
+# Streamer CSR map from the generated address map
+# The offset is for wrappers that place other CSRs before the streamer.
+def gen_streamer_csr_map(
+    cfg_path: str = STREAMER_CFG_FILE, offset: int = 0
+) -> CsrRegMap:
+    csr_module = load_streamer_csr_module(cfg_path)
+    return CsrRegMap(
+        {name: offset + addr for name, addr in csr_module.CSR_REGS.items()}
+    )
+
+
+# Pipelined burst over the CSR request/response port
+# Requests stay valid back-to-back and only advance
+# once req_ready accepted the current one.
+# Like reg_read, the read data is sampled right after the
+# accepting clock edge, before the next address is driven.
+# This holds for both same-cycle and registered responses.
+async def _reg_burst(
+    dut, addr_list: List[int], data_list: Optional[List[int]] = None
+) -> List[int]:
+    is_write = data_list is not None
+    num_beats = len(addr_list)
+    rsp_list = []
+    beat = 0
+
+    dut.io_csr_req_bits_write_i.value = int(is_write)
+    if not is_write:
+        dut.io_csr_req_bits_data_i.value = 0
+    dut.io_csr_req_valid_i.value = int(num_beats > 0)
+
+    while beat < num_beats:
+        dut.io_csr_req_bits_addr_i.value = addr_list[beat]
+        if data_list is not None:
+            dut.io_csr_req_bits_data_i.value = data_list[beat]
+
+        # Sample the handshake after the inputs settle
+        await ReadOnly()
+        accepted = dut.io_csr_req_ready_o.value == 1
+
+        await clock_and_wait(dut)
+
+        if accepted:
+            beat += 1
+            if not is_write:
+                rsp_list.append(int(dut.io_csr_rsp_bits_data_o.value))
+
+    # Release the port without spending an extra cycle
+    await reg_clr(dut)
+
+    return rsp_list
+
+
+# Writing a list of (address, value) pairs as one burst
+async def reg_burst_write(dut, addr_data: List[Tuple[int, int]]) -> None:
+    addr_list = [addr for addr, _ in addr_data]
+    data_list = [data for _, data in addr_data]
+    await _reg_burst(dut, addr_list, data_list)
+
+    return
+
+
+# Reading a list of addresses as one burst
+async def reg_burst_read(dut, addr_list: List[int]) -> List[int]:
+    return await _reg_burst(dut, addr_list)
+
+
+# Program a whole configuration, given by register name, in one burst
+# and optionally verify it with a single readback burst
+async def csr_program(
+    dut, csr_map: CsrRegMap, values: Dict[str, int], verify: bool = True
+) -> None:
+    addr_data = csr_map.addr_data(values)
+    await reg_burst_write(dut, addr_data)
+
+    if verify:
+        reg_vals = await reg_burst_read(dut, [addr for addr, _ in addr_data])
+        comp_and_assert_list([val for _, val in addr_data], reg_vals, "csr")
+
+    return
+
+
+# Pipelined burst over a TCDM request/response port
+# The request stays valid back-to-back and only advances
+# to the next beat once q_ready accepted the current one.
+# Read responses are collected in order for every
+# accepted read, stray write responses are ignored.
+# Leave data_list as None for reads.
+async def _tcdm_burst(
+    dut,
+    req_addr,
+    req_data,
+    req_strb,
+    req_write,
+    req_q_valid,
+    rsp_q_ready,
+    rsp_p_valid,
+    rsp_data,
+    base_addr: int,
+    num_beats: int,
+    data_list: Optional[List[int]] = None,
+) -> List[int]:
+    is_write = data_list is not None
+    addr_inc = len(req_data) // 8
+    rsp_list = []
+    num_outstanding = 0
+    beat = 0
+
+    req_strb.value = 2 ** len(req_strb) - 1 if is_write else 0
+    req_write.value = int(is_write)
+    if not is_write:
+        req_data.value = 0
+    is_valid = num_beats > 0
+    req_q_valid.value = int(is_valid)
+
+    while beat < num_beats or num_outstanding > 0:
+        if beat < num_beats:
+            req_addr.value = base_addr + beat * addr_inc
+            if data_list is not None:
+                req_data.value = data_list[beat]
+        elif is_valid:
+            is_valid = False
+            req_q_valid.value = 0
+
+        # Sample handshake and response after the inputs settle
+        await ReadOnly()
+        accepted = beat < num_beats and rsp_q_ready.value == 1
+        if num_outstanding > 0 and rsp_p_valid.value == 1:
+            rsp_list.append(int(rsp_data.value))
+            num_outstanding -= 1
+
+        await clock_and_wait(dut)
+
+        if accepted:
+            beat += 1
+            if not is_write:
+                num_outstanding += 1
+
+    # Release the port without spending an extra cycle
+    req_addr.value = 0
+    req_data.value = 0
+    req_strb.value = 0
+    req_write.value = 0
+    req_q_valid.value = 0
+
+    return rsp_list
+
+
 # Functions for TCDM control
 # Writing to TCDM
 async def tcdm_write(dut, idx: int, addr: int, data: int) -> None:
@@ -280,6 +1443,43 @@ async def tcdm_clr(dut, idx: int) -> None:
     return
 
 
+# Burst writing to TCDM
+async def tcdm_burst_write(dut, idx: int, base_addr: int, data_list: List[int]) -> None:
+    await _tcdm_burst(
+        dut,
+        dut.tcdm_req_addr_i[idx],
+        dut.tcdm_req_data_i[idx],
+        dut.tcdm_req_strb_i[idx],
+        dut.tcdm_req_write_i[idx],
+        dut.tcdm_req_q_valid_i[idx],
+        dut.tcdm_rsp_q_ready_o[idx],
+        dut.tcdm_rsp_p_valid_o[idx],
+        dut.tcdm_rsp_data_o[idx],
+        base_addr,
+        len(data_list),
+        data_list,
+    )
+
+    return
+
+
+# Burst reading from TCDM
+async def tcdm_burst_read(dut, idx: int, base_addr: int, num_beats: int) -> List[int]:
+    return await _tcdm_burst(
+        dut,
+        dut.tcdm_req_addr_i[idx],
+        dut.tcdm_req_data_i[idx],
+        dut.tcdm_req_strb_i[idx],
+        dut.tcdm_req_write_i[idx],
+        dut.tcdm_req_q_valid_i[idx],
+        dut.tcdm_rsp_q_ready_o[idx],
+        dut.tcdm_rsp_p_valid_o[idx],
+        dut.tcdm_rsp_data_o[idx],
+        base_addr,
+        num_beats,
+    )
+
+
 # Functions for Wide TCDM control
 # Writing to Wide TCDM
 async def wide_tcdm_write(dut, addr: int, data: int) -> None:
@@ -319,9 +1519,1159 @@ async def wide_tcdm_clr(dut) -> None:
     return
 
 
+# Burst writing to Wide TCDM
+# Preloads a whole buffer at about one cycle per beat
+async def wide_tcdm_burst_write(dut, base_addr: int, data_list: List[int]) -> None:
+    await _tcdm_burst(
+        dut,
+        dut.tcdm_dma_req_addr_i,
+        dut.tcdm_dma_req_data_i,
+        dut.tcdm_dma_req_strb_i,
+        dut.tcdm_dma_req_write_i,
+        dut.tcdm_dma_req_q_valid_i,
+        dut.tcdm_dma_rsp_q_ready_o,
+        dut.tcdm_dma_rsp_p_valid_o,
+        dut.tcdm_dma_rsp_data_o,
+        base_addr,
+        len(data_list),
+        data_list,
+    )
+
+    return
+
+
+# Burst reading from Wide TCDM
+async def wide_tcdm_burst_read(dut, base_addr: int, num_beats: int) -> List[int]:
+    return await _tcdm_burst(
+        dut,
+        dut.tcdm_dma_req_addr_i,
+        dut.tcdm_dma_req_data_i,
+        dut.tcdm_dma_req_strb_i,
+        dut.tcdm_dma_req_write_i,
+        dut.tcdm_dma_req_q_valid_i,
+        dut.tcdm_dma_rsp_q_ready_o,
+        dut.tcdm_dma_rsp_p_valid_o,
+        dut.tcdm_dma_rsp_data_o,
+        base_addr,
+        num_beats,
+    )
+
+
+# Backdoor access to the TCDM memories
+# These read and write the tc_sram bank arrays inside
+# tcdm_subsys directly so they take zero simulated cycles.
+# Narrow word w of the flat memory lives in bank w % nr_banks
+# at row w // nr_banks. Banks are grouped into superbanks
+# of wide_width / narrow_width banks for the wide port.
+# The geometry is read from the DUT itself: the narrow width
+# and depth from the first bank array, the wide width from
+# the DMA port and the number of superbanks by probing them.
+class TcdmGeometry:
+    def __init__(
+        self, narrow_width: int, wide_width: int, nr_banks: int, depth: int
+    ) -> None:
+        self.narrow_width = narrow_width
+        self.wide_width = wide_width
+        self.nr_banks = nr_banks
+        self.depth = depth
+        self.bank_bytes = narrow_width // 8
+        self.banks_per_superbank = wide_width // narrow_width
+        self.size = nr_banks * depth * self.bank_bytes
+
+
+def _tcdm_bank_mem(tcdm, bank: int, banks_per_superbank: int):
+    superbank = tcdm.gen_tcdm_super_bank[bank // banks_per_superbank]
+    bank_mem = superbank.gen_tcdm_bank[bank % banks_per_superbank]
+    return bank_mem.i_data_mem.i_tc_sram.sram
+
+
+@functools.lru_cache(maxsize=None)
+def tcdm_geometry(dut) -> TcdmGeometry:
+    tcdm = dut.i_tcdm_subsys
+    sram = _tcdm_bank_mem(tcdm, 0, 1)
+    narrow_width = len(sram[0])
+    wide_width = len(dut.tcdm_dma_req_data_i)
+
+    nr_superbanks = 0
+    while True:
+        try:
+            tcdm.gen_tcdm_super_bank[nr_superbanks]
+        except (IndexError, AttributeError):
+            break
+        nr_superbanks += 1
+
+    return TcdmGeometry(
+        narrow_width,
+        wide_width,
+        nr_superbanks * (wide_width // narrow_width),
+        len(sram),
+    )
+
+
+def _tcdm_bank_mems(dut) -> List:
+    geometry = tcdm_geometry(dut)
+    return [
+        _tcdm_bank_mem(dut.i_tcdm_subsys, bank, geometry.banks_per_superbank)
+        for bank in range(geometry.nr_banks)
+    ]
+
+
+# Backdoor reading of a flat byte image from TCDM
+def tcdm_backdoor_read_bytes(dut, base_addr: int, num_bytes: int) -> np.ndarray:
+    geometry = tcdm_geometry(dut)
+    bank_bytes = geometry.bank_bytes
+    nr_banks = geometry.nr_banks
+    first_word = base_addr // bank_bytes
+    last_word = (base_addr + num_bytes + bank_bytes - 1) // bank_bytes
+
+    bank_mems = _tcdm_bank_mems(dut)
+    word_list = [
+        int(bank_mems[w % nr_banks][w // nr_banks].value)
+        for w in range(first_word, last_word)
+    ]
+
+    image = int_list_to_words(word_list, geometry.narrow_width).reshape(-1)
+    offset = base_addr - first_word * bank_bytes
+
+    return image[offset : offset + num_bytes]
+
+
+# Backdoor writing of a flat byte image into TCDM
+# Partially covered bank words are read-modify-written
+def tcdm_backdoor_write_bytes(dut, base_addr: int, image: np.ndarray) -> None:
+    geometry = tcdm_geometry(dut)
+    bank_bytes = geometry.bank_bytes
+    nr_banks = geometry.nr_banks
+    image = np.asarray(image, dtype=np.uint8).reshape(-1)
+    first_word = base_addr // bank_bytes
+    last_word = (base_addr + image.size + bank_bytes - 1) // bank_bytes
+
+    if last_word > nr_banks * geometry.depth:
+        raise Exception("Backdoor image does not fit in TCDM.")
+
+    offset = base_addr - first_word * bank_bytes
+    if offset or image.size % bank_bytes:
+        aligned = tcdm_backdoor_read_bytes(
+            dut, first_word * bank_bytes, (last_word - first_word) * bank_bytes
+        ).copy()
+        aligned[offset : offset + image.size] = image
+        image = aligned
+
+    word_list = words_to_int_list(image.reshape(-1, bank_bytes))
+
+    bank_mems = _tcdm_bank_mems(dut)
+    for i, word in enumerate(word_list):
+        w = first_word + i
+        bank_mems[w % nr_banks][w // nr_banks].setimmediatevalue(word)
+
+    return
+
+
+# Backdoor writing of data_width-bit words into TCDM
+def tcdm_backdoor_write(
+    dut, base_addr: int, data_list: List[int], data_width: int
+) -> None:
+    tcdm_backdoor_write_bytes(dut, base_addr, int_list_to_words(data_list, data_width))
+
+    return
+
+
+# Backdoor reading of data_width-bit words from TCDM
+def tcdm_backdoor_read(
+    dut, base_addr: int, num_words: int, data_width: int
+) -> List[int]:
+    image = tcdm_backdoor_read_bytes(dut, base_addr, num_words * (data_width // 8))
+
+    return words_to_int_list(image.reshape(num_words, -1))
+
+
+# Backdoor writing of narrow words at scattered addresses
+# Used when only a few words of the TCDM are touched,
+# e.g., by the constrained-random streamer stimulus
+def tcdm_backdoor_scatter(dut, addr_list: List[int], data_list: List[int]) -> None:
+    geometry = tcdm_geometry(dut)
+    bank_bytes = geometry.bank_bytes
+    nr_banks = geometry.nr_banks
+    bank_mems = _tcdm_bank_mems(dut)
+
+    for addr, data in zip(addr_list, data_list):
+        if addr % bank_bytes:
+            raise Exception(f"Backdoor address {addr} is not word aligned.")
+        w = addr // bank_bytes
+        bank_mems[w % nr_banks][w // nr_banks].setimmediatevalue(data)
+
+    return
+
+
+# Backdoor reading of narrow words at scattered addresses
+def tcdm_backdoor_gather(dut, addr_list: List[int]) -> List[int]:
+    geometry = tcdm_geometry(dut)
+    bank_bytes = geometry.bank_bytes
+    nr_banks = geometry.nr_banks
+    bank_mems = _tcdm_bank_mems(dut)
+
+    word_list = []
+    for addr in addr_list:
+        if addr % bank_bytes:
+            raise Exception(f"Backdoor address {addr} is not word aligned.")
+        w = addr // bank_bytes
+        word_list.append(int(bank_mems[w % nr_banks][w // nr_banks].value))
+
+    return word_list
+
+
+# Loading wide data into TCDM
+# Either through the DMA port (front-door)
+# or directly into the banks (backdoor)
+async def wide_tcdm_load(
+    dut, base_addr: int, data_list: List[int], backdoor: bool = False
+) -> None:
+    if backdoor:
+        tcdm_backdoor_write(dut, base_addr, data_list, len(dut.tcdm_dma_req_data_i))
+    else:
+        await wide_tcdm_burst_write(dut, base_addr, data_list)
+
+    return
+
+
+# Dumping wide data from TCDM
+# Either through the DMA port (front-door)
+# or directly from the banks (backdoor)
+async def wide_tcdm_dump(
+    dut, base_addr: int, num_beats: int, backdoor: bool = False
+) -> List[int]:
+    if backdoor:
+        return tcdm_backdoor_read(
+            dut, base_addr, num_beats, len(dut.tcdm_dma_req_data_i)
+        )
+
+    return await wide_tcdm_burst_read(dut, base_addr, num_beats)
+
+
+# Memory images of TCDM contents and golden data
+# An image is a raw little-endian binary with a small JSON
+# header next to it, e.g., data.bin and data.json:
+#   {"version": 1, "data_file": "data.bin", "base_addr": 0,
+#    "word_width": 512, "num_words": 128, "offset": 0}
+# data_file is relative to the header. offset is the byte
+# offset of the first word in data_file, so sections of any
+# binary, e.g., the .bin data of a compiled kernel, can be
+# replayed by only writing a header. The data is memory-mapped
+# and never converted to Python objects as a whole.
+MEM_IMAGE_VERSION = 1
+
+# Number of DMA beats handed to the burst driver at once
+MEM_IMAGE_CHUNK = 4096
+
+
+class MemImage:
+    def __init__(self, words: np.ndarray, base_addr: int, word_width: int) -> None:
+        self.words = words
+        self.base_addr = base_addr
+        self.word_width = word_width
+
+    @property
+    def num_words(self) -> int:
+        return self.words.shape[0]
+
+    @property
+    def num_bytes(self) -> int:
+        return self.words.size
+
+    def flat(self) -> np.ndarray:
+        return self.words.reshape(-1)
+
+    # Words of the image in another width, e.g., of the DMA port
+    def as_words(self, word_width: int) -> np.ndarray:
+        if self.num_bytes % (word_width // 8):
+            raise Exception(
+                f"Memory image of {self.num_bytes} bytes does not "
+                f"split into {word_width}-bit words."
+            )
+        return self.flat().reshape(-1, word_width // 8)
+
+    def to_int_list(self) -> List[int]:
+        return words_to_int_list(self.words)
+
+
+# Write a memory image from a word array or a list of integers
+def save_mem_image(
+    header_path: str, words, word_width: int, base_addr: int = 0
+) -> None:
+    if not isinstance(words, np.ndarray):
+        words = int_list_to_words(list(words), word_width)
+
+    data_path = os.path.splitext(header_path)[0] + ".bin"
+    header = {
+        "version": MEM_IMAGE_VERSION,
+        "data_file": os.path.basename(data_path),
+        "base_addr": base_addr,
+        "word_width": word_width,
+        "num_words": words.shape[0],
+        "offset": 0,
+    }
+
+    for file_path, content in [
+        (data_path, np.ascontiguousarray(words, dtype=np.uint8).tobytes()),
+        (header_path, (json.dumps(header, indent=2) + "\n").encode("utf-8")),
+    ]:
+        tmp_path = f"{file_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, file_path)
+
+    return
+
+
+# Memory-map a memory image given by its header
+def load_mem_image(header_path: str) -> MemImage:
+    with open(header_path, "r") as f:
+        header = json.load(f)
+
+    if header.get("version", MEM_IMAGE_VERSION) != MEM_IMAGE_VERSION:
+        raise Exception(f"Unsupported memory image version in {header_path}.")
+
+    data_path = os.path.join(os.path.dirname(header_path), header["data_file"])
+    word_bytes = header["word_width"] // 8
+    offset = header.get("offset", 0)
+    num_words = header.get("num_words")
+    if num_words is None:
+        num_words = (os.path.getsize(data_path) - offset) // word_bytes
+
+    words = np.memmap(
+        data_path,
+        dtype=np.uint8,
+        mode="r",
+        offset=offset,
+        shape=(num_words, word_bytes),
+    )
+
+    return MemImage(words, header.get("base_addr", 0), header["word_width"])
+
+
+# Load a memory image into TCDM
+# Either through the DMA port in chunks of MEM_IMAGE_CHUNK
+# beats (front-door) or directly into the banks (backdoor)
+async def mem_image_load(dut, image: MemImage, backdoor: bool = False) -> None:
+    if backdoor:
+        tcdm_backdoor_write_bytes(dut, image.base_addr, image.flat())
+        return
+
+    dma_width = len(dut.tcdm_dma_req_data_i)
+    dma_words = image.as_words(dma_width)
+    for start in range(0, dma_words.shape[0], MEM_IMAGE_CHUNK):
+        await wide_tcdm_burst_write(
+            dut,
+            image.base_addr + start * dma_width // 8,
+            words_to_int_list(dma_words[start : start + MEM_IMAGE_CHUNK]),
+        )
+
+    return
+
+
+# Dump the TCDM region of a memory image as a byte array
+async def mem_image_dump(dut, image: MemImage, backdoor: bool = False) -> np.ndarray:
+    if backdoor:
+        return tcdm_backdoor_read_bytes(dut, image.base_addr, image.num_bytes)
+
+    dma_width = len(dut.tcdm_dma_req_data_i)
+    num_beats = image.as_words(dma_width).shape[0]
+    dump = []
+    for start in range(0, num_beats, MEM_IMAGE_CHUNK):
+        data_list = await wide_tcdm_burst_read(
+            dut,
+            image.base_addr + start * dma_width // 8,
+            min(MEM_IMAGE_CHUNK, num_beats - start),
+        )
+        dump.append(int_list_to_words(data_list, dma_width).reshape(-1))
+
+    return np.concatenate(dump) if dump else np.zeros(0, dtype=np.uint8)
+
+
+# Compare data against a golden memory image
+# The data is a byte array, a word array or a list of integers
+# in the width of the image. Equal data is found with one array
+# comparison, only mismatching images are compared word by word.
+def comp_mem_image(image: MemImage, actual, name: str = "mem_image") -> CompareResult:
+    if not isinstance(actual, np.ndarray):
+        actual = int_list_to_words(list(actual), image.word_width)
+    actual = np.asarray(actual, dtype=np.uint8).reshape(-1)
+
+    word_bytes = image.word_width // 8
+    if actual.size == image.num_bytes and np.array_equal(actual, image.flat()):
+        return CompareResult(name, image.num_words, [], image.base_addr, word_bytes)
+
+    return comp_list(
+        image.to_int_list(),
+        words_to_int_list(
+            actual[: actual.size // word_bytes * word_bytes].reshape(-1, word_bytes)
+        ),
+        name,
+        image.base_addr,
+        word_bytes,
+    )
+
+
+# Check the TCDM region of a memory image against it
+async def mem_image_check(
+    dut, image: MemImage, backdoor: bool = False, name: str = "mem_image"
+) -> None:
+    result = comp_mem_image(image, await mem_image_dump(dut, image, backdoor), name)
+    assert result, result.summary()
+
+    return
+
+
+# Size of the TCDM in bytes
+def tcdm_size(dut) -> int:
+    return tcdm_geometry(dut).size
+
+
+# Fast test setup: the tests preload the TCDM through the backdoor
+# and program the CSRs without reading them back, so the DMA preload
+# beats, the preload readback and the CSR verification are skipped.
+# Only used with SNAX_FAST_SETUP=1.
+FAST_SETUP = os.getenv("SNAX_FAST_SETUP", "0") == "1"
+
+
 async def reset_dut(dut) -> None:
     dut.rst_ni.value = 0
     await clock_and_wait(dut)
     dut.rst_ni.value = 1
     await clock_and_wait(dut)
     return
+
+
+# Monitor of a valid/ready stream port
+# Every handshake pushes the beat into the queue.
+# The ports are sampled at the falling edge since the
+# drivers change their inputs right after the rising edge,
+# so the sampled values are the ones at the next rising edge.
+class StreamMonitor:
+    def __init__(self, dut, bits, valid, ready, name: str = "") -> None:
+        self.clk = dut.clk_i
+        self.bits = bits
+        self.valid = valid
+        self.ready = ready
+        self.name = name
+        self.queue: Queue = Queue()
+        self.num_beats = 0
+        self._task = None
+
+    def start(self) -> "StreamMonitor":
+        if self._task is None:
+            self._task = cocotb.start_soon(self._run())
+        return self
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.kill()
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await FallingEdge(self.clk)
+            await ReadOnly()
+            if self.valid.value == 1 and self.ready.value == 1:
+                self.queue.put_nowait(int(self.bits.value))
+                self.num_beats += 1
+
+
+# Scoreboard matching the beats of a monitor against a golden stream
+# The golden values are drawn one at a time from any iterable,
+# e.g., a generator, and checked as soon as a beat arrives.
+# Only mismatches are logged, call check() at the end of a test.
+class StreamScoreboard:
+    def __init__(self, monitor: StreamMonitor, golden: Iterable[int]) -> None:
+        self.monitor = monitor
+        self.golden = iter(golden)
+        self.num_checked = 0
+        self.num_errors = 0
+        self.done = Event()
+        self._task = None
+
+    def start(self) -> "StreamScoreboard":
+        self.monitor.start()
+        if self._task is None:
+            self._task = cocotb.start_soon(self._run())
+        return self
+
+    async def _run(self) -> None:
+        for golden_data in self.golden:
+            actual_data = await self.monitor.queue.get()
+            if golden_data != actual_data:
+                if self.num_errors == 0:
+                    dump_wave_windows(f"{self.monitor.name} mismatch")
+                self.num_errors += 1
+                cocotb.log.error(
+                    format_mismatch(
+                        self.monitor.name, self.num_checked, golden_data, actual_data
+                    )
+                )
+            self.num_checked += 1
+        self.done.set()
+
+    # Wait until every golden value has been matched
+    async def wait_done(self) -> None:
+        await self.done.wait()
+
+    def check(self) -> None:
+        num_extra = self.monitor.queue.qsize()
+        assert self.num_errors == 0, (
+            f"{self.monitor.name}: {self.num_errors} of "
+            f"{self.num_checked} beats mismatched"
+        )
+        assert (
+            self.done.is_set()
+        ), f"{self.monitor.name}: only {self.num_checked} beats received"
+        assert num_extra == 0, f"{self.monitor.name}: {num_extra} unexpected beats"
+
+
+# Start a monitor and a scoreboard on one stream port
+def start_stream_check(
+    dut, bits, valid, ready, golden: Iterable[int], name: str = ""
+) -> StreamScoreboard:
+    monitor = StreamMonitor(dut, bits, valid, ready, name)
+    return StreamScoreboard(monitor, golden).start()
+
+
+# Monitor of the grants and stalls on the narrow TCDM ports
+# It takes the port arrays (e.g., tcdm_req_addr) and samples every port
+# once per cycle. A request with q_valid counts as a grant for its
+# port and bank when q_ready is high and as a stall otherwise.
+# The counters are comparable with snax_model.TcdmBankModel.summary().
+# The bank geometry defaults to the streamer configuration.
+class TcdmConflictMonitor:
+    def __init__(
+        self,
+        dut,
+        req_addr,
+        req_q_valid,
+        rsp_q_ready,
+        num_ports: int,
+        narrow_width: Optional[int] = None,
+        nr_banks: Optional[int] = None,
+    ) -> None:
+        if narrow_width is None or nr_banks is None:
+            cfg = load_streamer_cfg()
+            narrow_width = narrow_width or cfg["tcdmDataWidth"]
+            nr_banks = nr_banks or cfg["numBanks"]
+
+        self.clk = dut.clk_i
+        self.ports = [
+            (req_addr[port], req_q_valid[port], rsp_q_ready[port])
+            for port in range(num_ports)
+        ]
+        self.num_ports = num_ports
+        self.narrow_bytes = narrow_width // 8
+        self.nr_banks = nr_banks
+        self.port_grants = np.zeros(num_ports, dtype=np.int64)
+        self.port_stalls = np.zeros(num_ports, dtype=np.int64)
+        self.bank_grants = np.zeros(nr_banks, dtype=np.int64)
+        self.bank_stalls = np.zeros(nr_banks, dtype=np.int64)
+        self.active_cycles = 0
+        self.conflict_cycles = 0
+        self._task = None
+
+    def start(self) -> "TcdmConflictMonitor":
+        if self._task is None:
+            self._task = cocotb.start_soon(self._run())
+        return self
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.kill()
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await FallingEdge(self.clk)
+            await ReadOnly()
+            is_active = False
+            is_conflict = False
+            for port, (req_addr, req_q_valid, rsp_q_ready) in enumerate(self.ports):
+                if req_q_valid.value != 1:
+                    continue
+                is_active = True
+                bank = (int(req_addr.value) // self.narrow_bytes) % self.nr_banks
+                if rsp_q_ready.value == 1:
+                    self.port_grants[port] += 1
+                    self.bank_grants[bank] += 1
+                else:
+                    self.port_stalls[port] += 1
+                    self.bank_stalls[bank] += 1
+                    is_conflict = True
+            self.active_cycles += int(is_active)
+            self.conflict_cycles += int(is_conflict)
+
+    # Totals with the same keys as the bank model summary
+    def summary(self) -> Dict[str, float]:
+        requests = int(self.port_grants.sum())
+        return {
+            "requests": requests,
+            "cycles": self.active_cycles,
+            "stalls": int(self.port_stalls.sum()),
+            "conflict_steps": self.conflict_cycles,
+            "bandwidth": (
+                requests / (self.active_cycles * self.num_ports)
+                if self.active_cycles
+                else 0.0
+            ),
+        }
+
+
+# Name, bits, valid and ready of the streamer reader and
+# writer FIFO ports found in the scope. The testbench tops add
+# a direction suffix to the port names, the wrappers do not.
+def streamer_fifo_ports(scope, cfg: Optional[Dict] = None) -> List[Tuple]:
+    if cfg is None:
+        cfg = load_streamer_cfg()
+
+    fifos = [
+        ("stream2acc", "o", "i", len(cfg["fifoReaderParams"]["fifoWidth"])),
+        ("acc2stream", "i", "o", len(cfg["fifoWriterParams"]["fifoWidth"])),
+    ]
+    ports = []
+    for prefix, valid_dir, ready_dir, num_fifos in fifos:
+        for idx in range(num_fifos):
+            name = f"{prefix}_data_{idx}"
+            if hasattr(scope, f"{name}_valid_{valid_dir}"):
+                bits = getattr(scope, f"{name}_bits_{valid_dir}")
+                valid = getattr(scope, f"{name}_valid_{valid_dir}")
+                ready = getattr(scope, f"{name}_ready_{ready_dir}")
+            else:
+                bits = getattr(scope, f"{name}_bits")
+                valid = getattr(scope, f"{name}_valid")
+                ready = getattr(scope, f"{name}_ready")
+            ports.append((name, bits, valid, ready))
+    return ports
+
+
+# Counters of one valid/ready interface
+class _HandshakeProbe:
+    def __init__(self, name: str, valid, ready) -> None:
+        self.name = name
+        self.valid = valid
+        self.ready = ready
+        self.beats = 0
+        self.stalls = 0
+        self.first_beat = -1
+        self.last_beat = -1
+
+    def summary(self, num_cycles: int) -> Dict:
+        active_cycles = self.last_beat - self.first_beat + 1 if self.beats else 0
+        return {
+            "beats": self.beats,
+            "stall_cycles": self.stalls,
+            "utilization": self.beats / num_cycles if num_cycles else 0.0,
+            "first_beat_latency": self.first_beat,
+            "beats_per_cycle": self.beats / active_cycles if active_cycles else 0.0,
+        }
+
+
+# Throughput and latency instrumentation of valid/ready interfaces
+# A single coroutine samples all attached interfaces at the falling
+# edge like the stream monitors. Per interface it counts the beats,
+# the stall cycles (valid without ready), the cycles from start()
+# until the first beat, and the beats per cycle between the first
+# and the last beat. Utilization is beats over all recorded cycles.
+# While every valid is low it waits for one of them to rise instead
+# of sampling, so idle cycles cost no Python work, and the cycles
+# are counted from the simulation time.
+# Recording is off unless --perf (SNAX_PERF=1) is given, then
+# start() and write_json() do nothing.
+PERF_ENABLED = os.getenv("SNAX_PERF", "0") == "1"
+
+
+class PerfRecorder:
+    def __init__(
+        self,
+        dut,
+        name: str,
+        clk_period_ns: float = CLK_PERIOD_NS,
+        enabled: Optional[bool] = None,
+    ) -> None:
+        self.clk = dut.clk_i
+        self.name = name
+        self.clk_period_ns = clk_period_ns
+        self.enabled = PERF_ENABLED if enabled is None else enabled
+        self.probes: List[_HandshakeProbe] = []
+        self.num_cycles = 0
+        self._start_ns = 0.0
+        self._task = None
+
+    # Attach any valid/ready pair, e.g., the CSR or wide DMA port
+    def add(self, name: str, valid, ready) -> "PerfRecorder":
+        self.probes.append(_HandshakeProbe(name, valid, ready))
+        return self
+
+    # Attach every port of valid/ready port arrays, e.g., narrow TCDM ports
+    def add_ports(self, name: str, valid, ready, num_ports: int) -> "PerfRecorder":
+        for port in range(num_ports):
+            self.add(f"{name}_{port}", valid[port], ready[port])
+        return self
+
+    # Attach the streamer reader and writer FIFO ports
+    # that are found in the scope (e.g., the testbench top)
+    def add_streamer_fifos(self, scope, cfg: Optional[Dict] = None) -> "PerfRecorder":
+        for name, _, valid, ready in streamer_fifo_ports(scope, cfg):
+            self.add(name, valid, ready)
+        return self
+
+    def start(self) -> "PerfRecorder":
+        if self.enabled and self._task is None:
+            self._start_ns = get_sim_time("ns")
+            self._task = cocotb.start_soon(self._run())
+        return self
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.kill()
+            self._task = None
+            self.num_cycles = self._cycle()
+
+    # Cycles since start()
+    def _cycle(self) -> int:
+        return int((get_sim_time("ns") - self._start_ns) // self.clk_period_ns)
+
+    async def _run(self) -> None:
+        valids = [probe.valid for probe in self.probes]
+        while True:
+            await FallingEdge(self.clk)
+            await ReadOnly()
+            cycle = self._cycle()
+            is_active = False
+            for probe in self.probes:
+                if probe.valid.value != 1:
+                    continue
+                is_active = True
+                if probe.ready.value == 1:
+                    if probe.beats == 0:
+                        probe.first_beat = cycle
+                    probe.last_beat = cycle
+                    probe.beats += 1
+                else:
+                    probe.stalls += 1
+
+            if not is_active:
+                await First(*[RisingEdge(valid) for valid in valids])
+
+    def summary(self) -> Dict:
+        return {
+            "name": self.name,
+            "cycles": self.num_cycles,
+            "ports": {
+                probe.name: probe.summary(self.num_cycles) for probe in self.probes
+            },
+        }
+
+    # Stop and write the summary as <name>.perf.json
+    # into the simulation directory of the test
+    def write_json(self, out_dir: Optional[str] = None) -> Optional[str]:
+        if not self.enabled:
+            return None
+
+        self.stop()
+        out_file = os.path.join(out_dir or os.getcwd(), f"{self.name}.perf.json")
+        with open(out_file, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+        cocotb.log.info(f"Wrote performance summary to {out_file}")
+        return out_file
+
+
+# Windowed waveform capture driven from cocotb
+# Tracing the whole run is slow and produces huge dumps. With a
+# depth set, run_sim builds the Verilator models with tracing and
+# the main of verilator_trace_main.cpp, which only dumps while
+# cocotb has a trace file open. A WaveWindow traces into segment
+# files of depth cycles: every depth cycles it opens the next
+# segment and deletes the one before the last, so the last depth
+# to 2 * depth cycles are always on disk. A window is written as
+# <name>_<n>.window.vcd into the simulation directory when:
+# - a cycle range added with add_range() has been traced
+# - a trigger added with add_trigger() returns, e.g., the
+#   csr_write_trigger() of a CSR write, post_cycles later
+# - trigger() is called, which the bulk comparisons and the
+#   scoreboards do on their first mismatch
+# The window holds the last two segments, flushed at that moment.
+# Python only runs at the segment boundaries and at the triggers.
+# The depth comes from --wave-window (SNAX_WAVE_WINDOW). With the
+# default of 0, or without the trace control main, e.g., in other
+# simulators or with --waves, nothing is traced. At most max_dumps
+# windows are written per WaveWindow.
+WAVE_WINDOW_DEPTH = int(os.getenv("SNAX_WAVE_WINDOW", 0))
+
+# Windows that are tracing, dumped on mismatches
+# cocotb kills the tasks of a window at the end of its test,
+# also when the test fails before stop(), so windows without
+# a running task belong to an earlier test and are dropped
+_wave_windows: List["WaveWindow"] = []
+
+
+def _prune_wave_windows() -> None:
+    for wave_window in _wave_windows:
+        if not wave_window.is_tracing():
+            wave_window._remove_segments()
+    _wave_windows[:] = [w for w in _wave_windows if w.is_tracing()]
+
+
+# Trace control functions of verilator_trace_main.cpp,
+# None when the simulator was not built with them
+@functools.lru_cache(maxsize=None)
+def _trace_ctrl() -> Optional[ctypes.CDLL]:
+    lib = ctypes.CDLL(None)
+    if not hasattr(lib, "snax_trace_open"):
+        return None
+    lib.snax_trace_open.argtypes = [ctypes.c_char_p]
+    lib.snax_trace_open.restype = ctypes.c_int
+    return lib
+
+
+# Trigger of a CSR write to addr
+# Returns once the CSR port accepted the write, waiting
+# on the valid and ready edges instead of every cycle
+def csr_write_trigger(dut, addr: int) -> Callable[[], Awaitable[None]]:
+    valid = dut.io_csr_req_valid_i
+    ready = dut.io_csr_req_ready_o
+
+    async def wait_write() -> None:
+        while True:
+            await ReadOnly()
+            if valid.value != 1 or ready.value != 1:
+                await First(Edge(valid), Edge(ready))
+                continue
+            if (
+                dut.io_csr_req_bits_write_i.value == 1
+                and dut.io_csr_req_bits_addr_i.value == addr
+            ):
+                return
+            await FallingEdge(dut.clk_i)
+
+    return wait_write
+
+
+class WaveWindow:
+    def __init__(
+        self,
+        dut,
+        name: str,
+        depth: Optional[int] = None,
+        post_cycles: Optional[int] = None,
+        max_dumps: int = 4,
+        clk_period_ns: float = CLK_PERIOD_NS,
+    ) -> None:
+        self.clk = dut.clk_i
+        self.name = name
+        self.depth = WAVE_WINDOW_DEPTH if depth is None else depth
+        self.post_cycles = self.depth // 2 if post_cycles is None else post_cycles
+        self.max_dumps = max_dumps
+        self.clk_period_ns = clk_period_ns
+        self.triggers: List[Tuple[str, Callable[[], Awaitable[None]]]] = []
+        self.ranges: List[Tuple[int, int]] = []
+        self.segments: List[str] = []
+        self.num_segments = 0
+        self.dump_files: List[str] = []
+        self._pending: List[str] = []
+        self._tasks: List = []
+
+        if self.post_cycles >= max(self.depth, 1):
+            raise Exception("Wave window post_cycles must be less than its depth.")
+
+    @property
+    def enabled(self) -> bool:
+        return self.depth > 0
+
+    # Dump a window post_cycles after every return of wait_trigger()
+    def add_trigger(
+        self, reason: str, wait_trigger: Callable[[], Awaitable[None]]
+    ) -> "WaveWindow":
+        self.triggers.append((reason, wait_trigger))
+        return self
+
+    # Dump the traced cycles [start, stop) counted from start()
+    def add_range(self, start: int, stop: int) -> "WaveWindow":
+        if self.enabled and stop - start > self.depth:
+            raise Exception(
+                f"Wave window range of {stop - start} cycles "
+                f"exceeds the depth of {self.depth} cycles."
+            )
+        self.ranges.append((start, stop))
+        return self
+
+    def start(self) -> "WaveWindow":
+        if not self.enabled or self._tasks:
+            return self
+        if _trace_ctrl() is None:
+            cocotb.log.warning(
+                f"Wave window {self.name} needs a Verilator model with trace "
+                "control, run with --wave-window and without --waves"
+            )
+            return self
+
+        # The simulator has one trace, so one window traces at a time
+        _prune_wave_windows()
+        if _wave_windows:
+            raise Exception(
+                f"Wave window {self.name} cannot start while "
+                f"{_wave_windows[0].name} is tracing."
+            )
+
+        self._tasks = [cocotb.start_soon(self._run_segments())]
+        self._tasks += [
+            cocotb.start_soon(self._run_trigger(reason, wait_trigger))
+            for reason, wait_trigger in self.triggers
+        ]
+        self._tasks += [
+            cocotb.start_soon(self._run_range(start, stop))
+            for start, stop in self.ranges
+        ]
+        _wave_windows.append(self)
+        return self
+
+    # Stop tracing and dump the windows that wait for more cycles
+    def stop(self) -> None:
+        if not self._tasks:
+            return
+        for task in self._tasks:
+            task.kill()
+        self._tasks = []
+        if self in _wave_windows:
+            _wave_windows.remove(self)
+        for reason in self._pending:
+            self.dump(reason)
+        self._pending = []
+        _trace_ctrl().snax_trace_close()
+        self._remove_segments()
+
+    def is_tracing(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+
+    # Dump the traced cycles right away, e.g., on a failure
+    def trigger(self, reason: str) -> Optional[str]:
+        return self.dump(reason)
+
+    def _segment_file(self, idx: int) -> str:
+        return os.path.join(os.getcwd(), f"{self.name}.segment{idx}.vcd")
+
+    def _remove_segments(self) -> None:
+        for segment in self.segments:
+            if os.path.exists(segment):
+                os.remove(segment)
+        self.segments = []
+
+    async def _run_segments(self) -> None:
+        while True:
+            segment = self._segment_file(self.num_segments)
+            if not _trace_ctrl().snax_trace_open(segment.encode()):
+                raise Exception(f"Cannot open the trace file {segment}.")
+            self.segments.append(segment)
+            self.num_segments += 1
+            if len(self.segments) > 2:
+                os.remove(self.segments.pop(0))
+
+            await Timer(
+                Decimal(str(self.clk_period_ns)) * self.depth * 1000, units="ps"
+            )
+
+    async def _run_trigger(
+        self, reason: str, wait_trigger: Callable[[], Awaitable[None]]
+    ) -> None:
+        while len(self.dump_files) < self.max_dumps:
+            await wait_trigger()
+            self._pending.append(reason)
+            await Timer(
+                Decimal(str(self.clk_period_ns)) * self.post_cycles * 1000,
+                units="ps",
+            )
+            self._pending.remove(reason)
+            self.dump(reason)
+
+    async def _run_range(self, start: int, stop: int) -> None:
+        reason = f"cycles {start}-{stop}"
+        self._pending.append(reason)
+        await Timer(Decimal(str(self.clk_period_ns)) * stop * 1000, units="ps")
+        self._pending.remove(reason)
+        self.dump(reason)
+
+    # Write the last two segments as one VCD file
+    # The value changes of the later segment follow the
+    # definitions and values of the earlier one
+    def dump(self, reason: str) -> Optional[str]:
+        if len(self.dump_files) >= self.max_dumps or not self.segments:
+            return None
+
+        _trace_ctrl().snax_trace_flush()
+        out_file = os.path.join(
+            os.getcwd(), f"{self.name}_{len(self.dump_files)}.window.vcd"
+        )
+        with open(out_file, "w") as out:
+            out.write(f"$comment {reason} $end\n")
+            for idx, segment in enumerate(self.segments):
+                with open(segment, "r") as f:
+                    if idx > 0:
+                        for line in f:
+                            if line.startswith("$enddefinitions"):
+                                break
+                    shutil.copyfileobj(f, out)
+
+        self.dump_files.append(out_file)
+        cocotb.log.info(f"Wrote wave window ({reason}) to {out_file}")
+        return out_file
+
+
+# Dump the windows of all tracing WaveWindows
+def dump_wave_windows(reason: str) -> None:
+    _prune_wave_windows()
+    for wave_window in list(_wave_windows):
+        wave_window.trigger(reason)
+
+
+# Versioned baseline of the benchmark suite
+# Bump BENCH_VERSION whenever a benchmark workload or metric changes,
+# baselines of another version are then ignored until updated.
+BENCH_VERSION = 2
+BENCH_BASELINE_FILE = os.path.join(
+    REPO_PATH, "tests", "cocotb", "benchmark_baseline.json"
+)
+
+# The baseline is checked in the pytest process,
+# outside of the simulator where cocotb.log is set up
+_bench_log = logging.getLogger("snax_util.benchmark")
+
+
+# Benchmark metrics of one cocotb test
+# dut_cycles counts the clock cycles between start_cycles() and
+# stop_cycles(), the phase() blocks accumulate the host time spent
+# in Python-side setup, data generation and checking, and the
+# wall-clock per simulated kcycle covers the whole test.
+class BenchRecorder:
+    def __init__(self, name: str, clk_period_ns: float = CLK_PERIOD_NS) -> None:
+        self.name = name
+        self.clk_period_ns = clk_period_ns
+        self.metrics: Dict[str, float] = {}
+        self._wall_start = time.perf_counter()
+        self._sim_start = get_sim_time("ns")
+        self._cycle_start = 0.0
+
+    @contextlib.contextmanager
+    def phase(self, phase_name: str):
+        phase_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            key = f"{phase_name}_s"
+            elapsed = time.perf_counter() - phase_start
+            self.metrics[key] = self.metrics.get(key, 0.0) + elapsed
+
+    def start_cycles(self) -> None:
+        self._cycle_start = get_sim_time("ns")
+
+    def stop_cycles(self) -> None:
+        elapsed_ns = get_sim_time("ns") - self._cycle_start
+        self.metrics["dut_cycles"] = round(elapsed_ns / self.clk_period_ns)
+
+    # Write the metrics as <name>.bench.json
+    # into the simulation directory of the test
+    def write_json(self, out_dir: Optional[str] = None) -> str:
+        wall_s = time.perf_counter() - self._wall_start
+        sim_kcycles = (get_sim_time("ns") - self._sim_start) / self.clk_period_ns / 1000
+        if sim_kcycles > 0:
+            self.metrics["wall_s_per_kcycle"] = wall_s / sim_kcycles
+
+        out_file = os.path.join(out_dir or os.getcwd(), f"{self.name}.bench.json")
+        with open(out_file, "w") as f:
+            json.dump({"name": self.name, "metrics": self.metrics}, f, indent=2)
+        return out_file
+
+
+# Default baseline, dut_cycles must not grow at all while the
+# host times may vary by the "default" threshold between runs
+BENCH_THRESHOLDS = {"dut_cycles": 0.0, "default": 0.5}
+
+
+def _load_bench_baseline(baseline_file: str) -> Dict:
+    if not os.path.exists(baseline_file):
+        return {
+            "version": BENCH_VERSION,
+            "thresholds": dict(BENCH_THRESHOLDS),
+            "benchmarks": {},
+        }
+    with open(baseline_file, "r") as f:
+        return json.load(f)
+
+
+# Why the baseline cannot gate the benchmark, None if it can
+def missing_bench_baseline(
+    name: str, baseline_file: str = BENCH_BASELINE_FILE
+) -> Optional[str]:
+    baseline = _load_bench_baseline(baseline_file)
+    if baseline.get("version") != BENCH_VERSION:
+        return (
+            f"{name}: baseline is version {baseline.get('version')}, not "
+            f"{BENCH_VERSION}, store a new one with --update-baseline"
+        )
+    if name not in baseline["benchmarks"]:
+        return f"{name}: no baseline, store one with --update-baseline"
+    return None
+
+
+# Compare the metrics of a benchmark run with the baseline
+# All metrics are lower-is-better. Each metric is gated by its own
+# relative threshold in the baseline file, or else by the "default"
+# one, e.g., dut_cycles by 0% and the host times by 50%.
+# A benchmark without a baseline of this BENCH_VERSION fails,
+# check missing_bench_baseline() first to skip it instead.
+# With update set, the metrics are stored as the new baseline instead.
+# Returns the regressions as readable messages.
+def check_benchmark(
+    name: str, run_dir: str, baseline_file: str = BENCH_BASELINE_FILE, update=False
+) -> List[str]:
+    with open(os.path.join(run_dir, f"{name}.bench.json"), "r") as f:
+        metrics = json.load(f)["metrics"]
+
+    # Parallel runs may update the baseline at the same time
+    # A missing baseline file is created on update
+    os.makedirs(CACHE_PATH, exist_ok=True)
+    with open(os.path.join(CACHE_PATH, "benchmark_baseline.lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        baseline = _load_bench_baseline(baseline_file)
+
+        if update:
+            if baseline.get("version") != BENCH_VERSION:
+                baseline["version"] = BENCH_VERSION
+                baseline["benchmarks"] = {}
+            baseline["benchmarks"][name] = metrics
+            tmp_file = f"{baseline_file}.{os.getpid()}.tmp"
+            with open(tmp_file, "w") as f:
+                json.dump(baseline, f, indent=2, sort_keys=True)
+                f.write("\n")
+            os.replace(tmp_file, baseline_file)
+            return []
+
+    missing = missing_bench_baseline(name, baseline_file)
+    if missing:
+        return [missing]
+
+    thresholds = baseline["thresholds"]
+    base_metrics = baseline["benchmarks"][name]
+    regressions = []
+    for metric, value in metrics.items():
+        threshold = thresholds.get(metric, thresholds.get("default"))
+        if threshold is None:
+            if metric in base_metrics:
+                _bench_log.info(
+                    f"{name}.{metric}: {value:.6g} (baseline "
+                    f"{base_metrics[metric]:.6g}, not gated)"
+                )
+            continue
+        if metric not in base_metrics:
+            regressions.append(f"{name}.{metric}: missing from the baseline")
+            continue
+        limit = base_metrics[metric] * (1 + threshold)
+        if value > limit:
+            regressions.append(
+                f"{name}.{metric}: {value:.6g} exceeds baseline "
+                f"{base_metrics[metric]:.6g} by more than {threshold:.0%}"
+            )
+
+    return regressions
@@ -17,34 +17,20 @@
 import cocotb
 from cocotb.triggers import RisingEdge, with_timeout
 from cocotb.clock import Clock
-from cocotb_test.simulator import run
 import snax_util
-import os
-import subprocess
+import snax_model
 
 # Configurable design time parameters
 TCDM_REQ_PORTS = 12
 
-# DON'T TOUCH ME PLEASE
-# CSR parameters from the default
+# CSR register map generated from the default
 # Configuration found under util/cfg/streamer_cfg.hjson
-# Also some pre-computed that are fixed
-CSR_LOOP_COUNT_0 = 0
-CSR_TEMPORAL_STRIDE_0 = 1
-CSR_TEMPORAL_STRIDE_1 = 2
-CSR_TEMPORAL_STRIDE_2 = 3
-CSR_SPATIAL_STRIDE_0 = 4
-CSR_SPATIAL_STRIDE_1 = 5
-CSR_SPATIAL_STRIDE_2 = 6
-CSR_BASE_PTR_0 = 7
-CSR_BASE_PTR_1 = 8
-CSR_BASE_PTR_2 = 9
-CSR_START_STREAMER = 10
+CSR_MAP = snax_util.gen_streamer_csr_map()
 
 # Value configurations you can set
 # For exploration and testing
 # These values go into the respective
-# CSR register addresses above
+# CSR registers of the map above
 LOOP_COUNT_0 = 20
 TEMPORAL_STRIDE_0 = 8
 TEMPORAL_STRIDE_1 = 16
@@ -57,32 +43,9 @@ BASE_PTR_1 = 64
 BASE_PTR_2 = 128
 
 
-# Some functions for generating golden model
-# This is only useful here in this test
-# Basically it uses the default configuration
-# For the gen_basic_stream_gold_list,
-# Note that TCDM ports 0-3, and 4-7 are for readers
-# (specifically port_a and port_b)
-# While the TCDM ports 8-11 are for writing
-# (specifically port_c)
-def gen_basic_stream_gold_list():
-    golden_list = []
-
-    for i in range(LOOP_COUNT_0):
-        port_a_list = []
-        port_b_list = []
-        port_c_list = []
-        for j in range(int(TCDM_REQ_PORTS / 3)):
-            port_a = BASE_PTR_0 + j * SPATIAL_STRIDE_0 + i * TEMPORAL_STRIDE_0
-            port_a_list.append(port_a)
-            port_b = BASE_PTR_1 + j * SPATIAL_STRIDE_1 + i * TEMPORAL_STRIDE_1
-            port_b_list.append(port_b)
-            port_c = BASE_PTR_2 + j * SPATIAL_STRIDE_2 + i * TEMPORAL_STRIDE_2
-            port_c_list.append(port_c)
-
-        golden_list.append(port_a_list + port_b_list + port_c_list)
-
-    return golden_list
+# Golden model of the streamer address generation
+# from the same configuration as the RTL
+AGU_MODEL = snax_model.StreamerAguModel()
 
 
 @cocotb.test()
@@ -120,100 +83,74 @@ async def basic_streamer_dut(dut):
 
     await with_timeout(RisingEdge(dut.clk_i), 100, "ns")
 
+    # Record the throughput of the CSR, TCDM and FIFO interfaces
+    perf = (
+        snax_util.PerfRecorder(dut, "basic_streamer")
+        .add("csr", dut.io_csr_req_valid_i, dut.io_csr_req_ready_o)
+        .add_ports(
+            "tcdm", dut.tcdm_req_q_valid_o, dut.tcdm_rsp_q_ready_i, TCDM_REQ_PORTS
+        )
+        .add_streamer_fifos(dut)
+        .start()
+    )
+
     cocotb.log.info("Setting up of CSR registers and verifying if setup is correct")
 
-    # At this point we'll do explicit declartion
-    # of the tests so that it's understandable
-    # for other users
-
-    # Set number of iterations
-    await snax_util.reg_write(dut, CSR_LOOP_COUNT_0, LOOP_COUNT_0)
-
-    # Set temporal strides
-    await snax_util.reg_write(dut, CSR_TEMPORAL_STRIDE_0, TEMPORAL_STRIDE_0)
-    await snax_util.reg_write(dut, CSR_TEMPORAL_STRIDE_1, TEMPORAL_STRIDE_1)
-    await snax_util.reg_write(dut, CSR_TEMPORAL_STRIDE_2, TEMPORAL_STRIDE_2)
-
-    # Set spatial strides
-    await snax_util.reg_write(dut, CSR_SPATIAL_STRIDE_0, SPATIAL_STRIDE_0)
-    await snax_util.reg_write(dut, CSR_SPATIAL_STRIDE_1, SPATIAL_STRIDE_1)
-    await snax_util.reg_write(dut, CSR_SPATIAL_STRIDE_2, SPATIAL_STRIDE_2)
-
-    # Set base pointers
-    await snax_util.reg_write(dut, CSR_BASE_PTR_0, BASE_PTR_0)
-    await snax_util.reg_write(dut, CSR_BASE_PTR_1, BASE_PTR_1)
-    await snax_util.reg_write(dut, CSR_BASE_PTR_2, BASE_PTR_2)
-
-    # Clear driver signals
-    # So that we don't have stuck valid
-    await snax_util.reg_clr(dut)
-
-    # Read and verify the contents
-    # of the previously set registers
-    reg_val = await snax_util.reg_read(dut, CSR_LOOP_COUNT_0)
-    snax_util.comp_and_assert(LOOP_COUNT_0, reg_val)
-    reg_val = await snax_util.reg_read(dut, CSR_TEMPORAL_STRIDE_0)
-    snax_util.comp_and_assert(TEMPORAL_STRIDE_0, reg_val)
-    reg_val = await snax_util.reg_read(dut, CSR_TEMPORAL_STRIDE_1)
-    snax_util.comp_and_assert(TEMPORAL_STRIDE_1, reg_val)
-    reg_val = await snax_util.reg_read(dut, CSR_TEMPORAL_STRIDE_2)
-    snax_util.comp_and_assert(TEMPORAL_STRIDE_2, reg_val)
-    reg_val = await snax_util.reg_read(dut, CSR_SPATIAL_STRIDE_0)
-    snax_util.comp_and_assert(SPATIAL_STRIDE_0, reg_val)
-    reg_val = await snax_util.reg_read(dut, CSR_SPATIAL_STRIDE_1)
-    snax_util.comp_and_assert(SPATIAL_STRIDE_1, reg_val)
-    reg_val = await snax_util.reg_read(dut, CSR_SPATIAL_STRIDE_2)
-    snax_util.comp_and_assert(SPATIAL_STRIDE_2, reg_val)
-    reg_val = await snax_util.reg_read(dut, CSR_BASE_PTR_0)
-    snax_util.comp_and_assert(BASE_PTR_0, reg_val)
-    reg_val = await snax_util.reg_read(dut, CSR_BASE_PTR_1)
-    snax_util.comp_and_assert(BASE_PTR_1, reg_val)
-    reg_val = await snax_util.reg_read(dut, CSR_BASE_PTR_2)
-    snax_util.comp_and_assert(BASE_PTR_2, reg_val)
-
-    # Clear driver signals
-    # So that we don't have stuck valid
-    await snax_util.reg_clr(dut)
+    csr_values = {
+        "LOOP_COUNT_0": LOOP_COUNT_0,
+        "TEMPORAL_STRIDE_0": TEMPORAL_STRIDE_0,
+        "TEMPORAL_STRIDE_1": TEMPORAL_STRIDE_1,
+        "TEMPORAL_STRIDE_2": TEMPORAL_STRIDE_2,
+        "SPATIAL_STRIDE_0": SPATIAL_STRIDE_0,
+        "SPATIAL_STRIDE_1": SPATIAL_STRIDE_1,
+        "SPATIAL_STRIDE_2": SPATIAL_STRIDE_2,
+        "BASE_PTR_0": BASE_PTR_0,
+        "BASE_PTR_1": BASE_PTR_1,
+        "BASE_PTR_2": BASE_PTR_2,
+    }
+
+    # Program all registers as one burst
+    # then read back and verify them as one burst
+    await snax_util.csr_program(dut, CSR_MAP, csr_values)
 
     cocotb.log.info("Run the streamer and check if addresses are correct")
 
     # Do a run of the streamer
     # We can write anything on this address
     # And it will automatically run the streamer
-    await snax_util.reg_write(dut, CSR_START_STREAMER, 1)
+    await snax_util.reg_write(dut, CSR_MAP["START_STREAMER"], 1)
 
     for i in range(TCDM_REQ_PORTS):
         dut.tcdm_rsp_q_ready_i[i].value = 1
         dut.tcdm_rsp_p_valid_i[i].value = 1
         dut.tcdm_rsp_data_i[i].value = 0
 
-    # First generate the golden answer list
-    golden_list = gen_basic_stream_gold_list()
-
-    # Cycle for each TCDM request ports
-    # Check the temporal loop
-    for i in range(LOOP_COUNT_0):
-        for j in range(TCDM_REQ_PORTS):
-            read_val = int(dut.tcdm_req_addr_o[j].value)
-            snax_util.comp_and_assert(golden_list[i][j], read_val)
+    # The golden addresses are generated lazily
+    # Check the temporal loop for each TCDM request port
+    for step, golden_addrs in enumerate(AGU_MODEL.iter_port_addresses(csr_values)):
+        read_vals = [int(dut.tcdm_req_addr_o[j].value) for j in range(TCDM_REQ_PORTS)]
+        snax_util.comp_and_assert_list(
+            golden_addrs, read_vals, f"tcdm_req_addr_step_{step}"
+        )
         await snax_util.clock_and_wait(dut)
 
+    perf.write_json()
+
 
 # Main test run
-def test_basic_streamer(simulator, waves):
-    repo_path = os.getcwd()
-    tests_path = repo_path + "/tests/cocotb/"
+def test_basic_streamer(simulator, waves, sim_run_dir):
+    gen_rtl_path = snax_util.GEN_RTL_PATH
+    gen_tb_path = snax_util.GEN_TB_PATH
 
     # Make sure to generate the StreamerTop.sv
     # If it does not exist
-    streamer_top_file = repo_path + "/tests/tb/tb_streamer_top.sv"
-    if not os.path.exists(streamer_top_file):
-        subprocess.run(["make", streamer_top_file])
+    streamer_top_file = gen_tb_path + "/tb_streamer_top.sv"
+    snax_util.make_target(streamer_top_file)
 
     verilog_sources = [
-        repo_path + "/rtl/StreamerTop.sv",
-        repo_path + "/rtl/streamer_wrapper.sv",
-        repo_path + "/tests/tb/tb_streamer_top.sv",
+        gen_rtl_path + "/StreamerTop.sv",
+        gen_rtl_path + "/streamer_wrapper.sv",
+        gen_tb_path + "/tb_streamer_top.sv",
     ]
     defines = []
     includes = []
@@ -222,8 +159,6 @@ def test_basic_streamer(simulator, waves):
 
     module = "test_basic_streamer"
 
-    sim_build = tests_path + "/sim_build/{}/".format(toplevel)
-
     if simulator == "verilator":
         compile_args = [
             "-Wno-LITENDIAN",
@@ -243,15 +178,15 @@ def test_basic_streamer(simulator, waves):
         compile_args = None
         timescale = "1ns/1ps"
 
-    run(
+    snax_util.run_sim(
         verilog_sources=verilog_sources,
         includes=includes,
         toplevel=toplevel,
         defines=defines,
         module=module,
         simulator=simulator,
-        sim_build=sim_build,
         compile_args=compile_args,
         waves=waves,
         timescale=timescale,
+        run_dir=sim_run_dir,
     )
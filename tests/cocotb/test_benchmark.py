@@ -0,0 +1,333 @@
+# ---------------------------------
+# Copyright 2024 KULeuven
+# Solderpad Hardware License, Version 0.51, see LICENSE for details.
+# SPDX-License-Identifier: SHL-0.51
+#
+# Description:
+# Performance regression benchmarks on the testbenches of
+# test_tcdm_subsys, test_stream_tcdm and test_stream_alu.
+# Each benchmark records the DUT cycles to completion, the
+# host wall-clock per simulated kcycle, and the Python time
+# spent in data generation, setup and checking. The metrics
+# are compared against tests/cocotb/benchmark_baseline.json.
+# The streaming benchmarks also record the utilization
+# of the streamer FIFO ports.
+#
+# The benchmarks only run with: pytest --benchmark
+# Store new baselines with: pytest --benchmark --update-baseline
+# ---------------------------------
+
+import cocotb
+from cocotb.triggers import with_timeout
+from cocotb.clock import Clock
+from typing import Dict
+import numpy as np
+import pytest
+import snax_model
+import snax_stim
+import snax_util
+import test_stream_alu
+import test_stream_tcdm
+import test_tcdm_subsys
+
+# Workload sizes of the benchmarks
+# Changing these invalidates the stored
+# baselines, so bump snax_util.BENCH_VERSION
+TCDM_BEATS = test_tcdm_subsys.NUM_NARROW_TESTS
+WIDE_TCDM_BEATS = test_tcdm_subsys.NUM_WIDE_TESTS
+STREAM_LOOP_COUNT = 200
+STREAM_SEED = 0
+NARROW_DATA_WIDTH = test_stream_tcdm.NARROW_DATA_WIDTH
+WIDE_DATA_WIDTH = test_stream_tcdm.WIDE_DATA_WIDTH
+
+# ALU operation of the ALU benchmark, 0 selects XOR
+ALU_CONFIG = 0
+
+
+# Streamer configuration of the streaming benchmarks
+# The port counts, spatial unrolling and element widths come from
+# the streamer configuration, like in the snax_stim generator.
+# Every temporal iteration reads the next row of the TCDM, each
+# reader its elements side by side in the order of the readers.
+# The writers write their own rows behind the reader rows.
+# The loop count shrinks to the rows that fit in the TCDM.
+def gen_stream_csr_values(cfg: Dict) -> Dict[str, int]:
+    agu_model = snax_model.StreamerAguModel(cfg)
+    num_reader = len(cfg["dataReaderParams"]["tcdmPortsNum"])
+    elem_bytes = [
+        width // 8
+        for width in list(cfg["dataReaderParams"]["elementWidth"])
+        + list(cfg["dataWriterParams"]["elementWidth"])
+    ]
+
+    # Reader and writer row layout
+    values = {}
+    row_bytes = [0, 0]
+    for mover in range(agu_model.num_data_mover):
+        is_writer = int(mover >= num_reader)
+        spatial_base = sum(agu_model.spatial_dim[:mover])
+        stride = elem_bytes[mover]
+        for k, bound in enumerate(agu_model.spatial_bounds[mover]):
+            values[f"SPATIAL_STRIDE_{spatial_base + k}"] = stride
+            stride *= bound
+
+        offset = -(-row_bytes[is_writer] // elem_bytes[mover]) * elem_bytes[mover]
+        values[f"BASE_PTR_{mover}"] = offset
+        row_bytes[is_writer] = offset + stride
+
+    tcdm_size = cfg["numBanks"] * cfg["tcdmDepth"] * cfg["tcdmDataWidth"] // 8
+    loop_count = min(
+        STREAM_LOOP_COUNT,
+        2 ** cfg["temporalAddrGenUnitParams"]["loopBoundWidth"] - 1,
+        tcdm_size // sum(row_bytes),
+    )
+    for d in range(agu_model.num_loop_dim):
+        values[f"LOOP_COUNT_{d}"] = loop_count if d == 0 else 1
+
+    for mover in range(agu_model.num_data_mover):
+        is_writer = int(mover >= num_reader)
+        for d in range(agu_model.num_loop_dim):
+            values[f"TEMPORAL_STRIDE_{mover * agu_model.num_loop_dim + d}"] = (
+                row_bytes[is_writer] if d == 0 else 0
+            )
+        if is_writer:
+            values[f"BASE_PTR_{mover}"] += loop_count * row_bytes[0]
+
+    return values
+
+
+STREAM_CSR_VALUES = gen_stream_csr_values(test_stream_tcdm.STREAMER_CFG)
+NUM_READER = len(test_stream_tcdm.READER_WIDTHS)
+NUM_WRITER = len(test_stream_tcdm.STREAMER_CFG["dataWriterParams"]["tcdmPortsNum"])
+
+
+# Clears the DMA port and resets the DUT
+async def bench_reset(dut) -> None:
+    clock = Clock(dut.clk_i, 10, units="ns")
+    cocotb.start_soon(clock.start())
+
+    dut.rst_ni.value = 0
+    dut.tcdm_dma_req_write_i.value = 0
+    dut.tcdm_dma_req_addr_i.value = 0
+    dut.tcdm_dma_req_data_i.value = 0
+    dut.tcdm_dma_req_strb_i.value = 0
+    dut.tcdm_dma_req_q_valid_i.value = 0
+
+    await snax_util.clock_and_wait(dut)
+    await snax_util.reset_dut(dut)
+
+
+@cocotb.test()
+async def bench_tcdm_subsys(dut):
+    bench = snax_util.BenchRecorder("tcdm_subsys")
+
+    with bench.phase("datagen"):
+        golden_list = snax_util.gen_rand_int_list(
+            TCDM_BEATS, 0, test_tcdm_subsys.MAX_VAL
+        )
+        wide_golden_list = snax_util.gen_rand_int_list(
+            WIDE_TCDM_BEATS, 0, test_tcdm_subsys.WIDE_MAX_VAL
+        )
+
+    with bench.phase("setup"):
+        for i in range(test_tcdm_subsys.NUM_INPUT):
+            dut.tcdm_req_write_i[i].value = 0
+            dut.tcdm_req_addr_i[i].value = 0
+            dut.tcdm_req_amo_i[i].value = 0
+            dut.tcdm_req_data_i[i].value = 0
+            dut.tcdm_req_user_core_id_i[i].value = 0
+            dut.tcdm_req_user_is_core_i[i].value = 0
+            dut.tcdm_req_strb_i[i].value = 0
+            dut.tcdm_req_q_valid_i[i].value = 0
+        await bench_reset(dut)
+
+    # Narrow and wide bursts that fill the whole memory
+    bench.start_cycles()
+    await snax_util.tcdm_burst_write(dut, 0, 0, golden_list)
+    check_list = await snax_util.tcdm_burst_read(dut, 0, 0, TCDM_BEATS)
+    await snax_util.wide_tcdm_burst_write(dut, 0, wide_golden_list)
+    wide_check_list = await snax_util.wide_tcdm_burst_read(dut, 0, WIDE_TCDM_BEATS)
+    bench.stop_cycles()
+
+    with bench.phase("check"):
+        snax_util.comp_and_assert_list(golden_list, check_list, "tcdm_port_0")
+        snax_util.comp_and_assert_list(wide_golden_list, wide_check_list, "tcdm_dma")
+
+    bench.write_json()
+
+
+@cocotb.test()
+async def bench_stream_tcdm(dut):
+    bench = snax_util.BenchRecorder("stream_tcdm")
+
+    # Random TCDM content under the fixed streamer configuration
+    with bench.phase("datagen"):
+        stim = snax_stim.StreamerStimGen().gen_data(
+            STREAM_CSR_VALUES, np.random.default_rng(STREAM_SEED)
+        )
+
+    with bench.phase("setup"):
+        dut.io_csr_rsp_ready_i.value = 1
+        for idx in range(NUM_WRITER):
+            getattr(dut, f"acc2stream_data_{idx}_bits_i").value = 0
+            getattr(dut, f"acc2stream_data_{idx}_valid_i").value = 0
+        for idx in range(NUM_READER):
+            getattr(dut, f"stream2acc_data_{idx}_ready_i").value = 1
+        await bench_reset(dut)
+
+        snax_util.tcdm_backdoor_scatter(dut, stim.mem_addrs, stim.mem_words)
+        await snax_util.csr_program(
+            dut, test_stream_tcdm.CSR_MAP, STREAM_CSR_VALUES, verify=False
+        )
+
+        reader_checks = [
+            snax_util.start_stream_check(
+                dut,
+                getattr(dut, f"stream2acc_data_{idx}_bits_o"),
+                getattr(dut, f"stream2acc_data_{idx}_valid_o"),
+                getattr(dut, f"stream2acc_data_{idx}_ready_i"),
+                data_list,
+                f"stream2acc_data_{idx}",
+            )
+            for idx, data_list in enumerate(stim.reader_data)
+        ]
+
+        # Utilization of the streamer FIFO ports
+        perf = snax_util.PerfRecorder(dut, "stream_tcdm").add_streamer_fifos(dut)
+
+    # From the start of the streamer until
+    # both readers delivered all their beats
+    bench.start_cycles()
+    perf.start()
+    await snax_util.reg_write(dut, test_stream_tcdm.CSR_MAP["START_STREAMER"], 1)
+    await snax_util.reg_clr(dut)
+    for reader_check in reader_checks:
+        await with_timeout(reader_check.wait_done(), 100 * STREAM_LOOP_COUNT, "ns")
+    bench.stop_cycles()
+    perf.stop()
+
+    with bench.phase("check"):
+        for reader_check in reader_checks:
+            reader_check.monitor.stop()
+            reader_check.check()
+
+    perf.write_json()
+    bench.write_json()
+
+
+@cocotb.test()
+async def bench_stream_alu(dut):
+    bench = snax_util.BenchRecorder("stream_alu")
+
+    # The ALU XORs the elements of the two reader streams
+    with bench.phase("datagen"):
+        narrow_golden_words = snax_util.gen_rand_words(
+            STREAM_LOOP_COUNT * (WIDE_DATA_WIDTH // NARROW_DATA_WIDTH),
+            0,
+            test_tcdm_subsys.MAX_VAL,
+            NARROW_DATA_WIDTH,
+        )
+        wide_golden_words = snax_util.pack_words(
+            narrow_golden_words, WIDE_DATA_WIDTH // NARROW_DATA_WIDTH
+        )
+        wide_golden_list = snax_util.words_to_int_list(wide_golden_words)
+        wide_golden_result = test_stream_alu.ALU_MODEL.run(
+            ALU_CONFIG,
+            wide_golden_words[:, : test_stream_alu.READER_BYTES],
+            wide_golden_words[:, test_stream_alu.READER_BYTES :],
+        )
+
+    with bench.phase("setup"):
+        dut.io_csr_rsp_ready_i.value = 1
+        await bench_reset(dut)
+
+        await snax_util.wide_tcdm_load(dut, 0, wide_golden_list, True)
+        await snax_util.csr_program(
+            dut,
+            test_stream_alu.CSR_MAP,
+            {"ALU_CONFIG": ALU_CONFIG, **STREAM_CSR_VALUES},
+            verify=False,
+        )
+
+        result_check = snax_util.start_stream_check(
+            dut,
+            dut.i_stream_alu_wrapper.acc2stream_data_0_bits,
+            dut.i_stream_alu_wrapper.acc2stream_data_0_valid,
+            dut.i_stream_alu_wrapper.acc2stream_data_0_ready,
+            wide_golden_result,
+            "acc2stream_data_0",
+        )
+
+        # Utilization of the streamer FIFO ports
+        perf = snax_util.PerfRecorder(dut, "stream_alu").add_streamer_fifos(
+            dut.i_stream_alu_wrapper
+        )
+
+    # From the start of the streamer until
+    # the ALU produced all its results
+    bench.start_cycles()
+    perf.start()
+    await snax_util.reg_write(dut, test_stream_alu.CSR_MAP["START_STREAMER"], 1)
+    await snax_util.reg_clr(dut)
+    await with_timeout(result_check.wait_done(), 100 * STREAM_LOOP_COUNT, "ns")
+    bench.stop_cycles()
+    perf.stop()
+
+    with bench.phase("check"):
+        result_check.monitor.stop()
+        result_check.check()
+
+    perf.write_json()
+    bench.write_json()
+
+
+# Runs one benchmark on the testbench of a test module
+# and compares its metrics with the stored baseline
+def run_benchmark(
+    request, simulator: str, run_dir: str, name: str, test_module, **kwargs
+) -> None:
+    baseline_file = request.config.getoption("--baseline-file")
+    update = request.config.getoption("--update-baseline")
+    if not update:
+        missing = snax_util.missing_bench_baseline(name, baseline_file)
+        if missing:
+            pytest.skip(missing)
+
+    snax_util.run_sim(
+        module="test_benchmark",
+        testcase=f"bench_{name}",
+        simulator=simulator,
+        run_dir=run_dir,
+        **test_module.gen_sim_args(simulator),
+        **kwargs,
+    )
+
+    regressions = snax_util.check_benchmark(
+        name,
+        run_dir,
+        baseline_file=baseline_file,
+        update=update,
+    )
+    assert not regressions, "Performance regressions:\n" + "\n".join(regressions)
+
+
+@pytest.mark.benchmark
+def test_bench_tcdm_subsys(request, simulator, sim_run_dir):
+    run_benchmark(
+        request,
+        simulator,
+        sim_run_dir,
+        "tcdm_subsys",
+        test_tcdm_subsys,
+        parameters=test_tcdm_subsys.TCDM_PARAMETERS,
+    )
+
+
+@pytest.mark.benchmark
+def test_bench_stream_tcdm(request, simulator, sim_run_dir):
+    run_benchmark(request, simulator, sim_run_dir, "stream_tcdm", test_stream_tcdm)
+
+
+@pytest.mark.benchmark
+def test_bench_stream_alu(request, simulator, sim_run_dir):
+    run_benchmark(request, simulator, sim_run_dir, "stream_alu", test_stream_alu)
@@ -13,16 +13,18 @@
 # 1. Load data through DMA
 # 2. Set the streamer CSRs
 # 3. Check the output of the streamer
+# 4. Session test that cycles through every ALU_CONFIG
+#    and several operand sets in one simulation
 # ---------------------------------
 
 import cocotb
-from cocotb.triggers import RisingEdge, Timer, with_timeout
+from cocotb.triggers import with_timeout
 from cocotb.clock import Clock
-from cocotb_test.simulator import run
 import snax_util
-import os
-import subprocess
-from decimal import Decimal
+import snax_model
+from typing import Dict
+import numpy as np
+import time
 
 from tests.cocotb.test_tcdm_subsys import MAX_VAL
 
@@ -30,11 +32,14 @@ from tests.cocotb.test_tcdm_subsys import MAX_VAL
 # Configurable testing parameters
 # In the default value below, the number
 # of tests fills the entire memory
-NARROW_DATA_WIDTH = 64
-WIDE_DATA_WIDTH = 512
-TCDM_DEPTH = 64
-NR_BANKS = 32
+STREAMER_CFG = snax_util.load_streamer_cfg()
+NARROW_DATA_WIDTH = STREAMER_CFG["tcdmDataWidth"]
+WIDE_DATA_WIDTH = STREAMER_CFG["tcdmDmaDataWidth"]
+TCDM_DEPTH = STREAMER_CFG["tcdmDepth"]
+NR_BANKS = STREAMER_CFG["numBanks"]
 SPATPAR = 4
+READER_PORTS = sum(STREAMER_CFG["dataReaderParams"]["tcdmPortsNum"])
+WRITER_PORTS = sum(STREAMER_CFG["dataWriterParams"]["tcdmPortsNum"])
 BANK_INCREMENT = int(NARROW_DATA_WIDTH / 8)
 WIDE_BANK_INCREMENT = int(WIDE_DATA_WIDTH / 8)
 WIDE_NARROW_RATIO = int(WIDE_DATA_WIDTH / NARROW_DATA_WIDTH)
@@ -44,35 +49,35 @@ MIN_VAL = 0
 MAX_NARROW_VAL = 2**NARROW_DATA_WIDTH
 MAX_WIDE_VAL = 2**WIDE_DATA_WIDTH
 
-# DON'T TOUCH ME PLEASE
-# CSR parameters from the default
-# Configuration found under util/cfg/streamer_cfg.hjson
-# Also some pre-computed that are fixed
+# True to preload and check the TCDM directly through
+# the memory banks (zero cycles) instead of through the
+# DMA ports, set with pytest --fast-setup
+BACKDOOR_ACCESS = snax_util.FAST_SETUP
 
-CSR_ALU_CONFIG = 0
-CSR_ALU_GPP_1 = 1
-CSR_ALU_GPP_2 = 2
-CSR_ALU_GPP_3 = 3
-CSR_ALU_GPP_4 = 4
-CSR_ALU_GPP_5 = 5
-CSR_ALU_GPP_6 = 6
-CSR_ALU_GPP_7 = 7
+# CSR register maps of the ALU accelerator
+# and the streamer from the default
+# Configuration found under util/cfg/streamer_cfg.hjson
+ALU_CSR_MAP = snax_util.CsrRegMap(
+    {"ALU_CONFIG": 0, **{f"ALU_GPP_{i}": i for i in range(1, 8)}}
+)
 
 # This STREAMER_OFFSET is the offset
 # For the address registers
 STREAMER_OFFSET = 8
 
-CSR_LOOP_COUNT_0 = 0 + STREAMER_OFFSET
-CSR_TEMPORAL_STRIDE_0 = 1 + STREAMER_OFFSET
-CSR_TEMPORAL_STRIDE_1 = 2 + STREAMER_OFFSET
-CSR_TEMPORAL_STRIDE_2 = 3 + STREAMER_OFFSET
-CSR_SPATIAL_STRIDE_0 = 4 + STREAMER_OFFSET
-CSR_SPATIAL_STRIDE_1 = 5 + STREAMER_OFFSET
-CSR_SPATIAL_STRIDE_2 = 6 + STREAMER_OFFSET
-CSR_BASE_PTR_0 = 7 + STREAMER_OFFSET
-CSR_BASE_PTR_1 = 8 + STREAMER_OFFSET
-CSR_BASE_PTR_2 = 9 + STREAMER_OFFSET
-CSR_START_STREAMER = 10 + STREAMER_OFFSET
+CSR_MAP = ALU_CSR_MAP.merge(snax_util.gen_streamer_csr_map(offset=STREAMER_OFFSET))
+
+# Golden model of the ALU accelerator
+# Each reader delivers SPATPAR elements per beat
+ALU_MODEL = snax_model.SimpleAluModel(NARROW_DATA_WIDTH, SPATPAR)
+READER_BYTES = SPATPAR * NARROW_DATA_WIDTH // 8
+
+# Session test: every ALU_CONFIG runs on each operand set
+# Set 0 only holds corner values that stress the truncation,
+# the other sets are random
+SESSION_LOOP_COUNT = 100
+SESSION_OPERAND_SETS = 3
+CORNER_VALS = [0, 1, 2**32 - 1, 2**63, 2**64 - 1]
 
 
 @cocotb.test()
@@ -80,13 +85,13 @@ async def stream_alu_dut(dut):
     # Value configurations you can set
     # For exploration and testing
     # These values go into the respective
-    # CSR register addresses above
+    # CSR registers of the map above
 
-    # ACLU_CONFIG has the following:
-    # 0 - addition
+    # ALU_CONFIG follows the simple_alu case statement:
+    # 0 - XOR
     # 1 - subtraction
     # 2 - multiplication
-    # 3 - XOR
+    # 3 - addition
     ALU_CONFIG = 1
     ALU_GPP_1 = 123
     ALU_GPP_2 = 456
@@ -136,6 +141,26 @@ async def stream_alu_dut(dut):
 
     await snax_util.clock_and_wait(dut)
 
+    # Record the throughput of the CSR, DMA and accelerator interfaces
+    perf = (
+        snax_util.PerfRecorder(dut, "stream_alu")
+        .add("csr", dut.io_csr_req_valid_i, dut.io_csr_req_ready_o)
+        .add("tcdm_dma", dut.tcdm_dma_req_q_valid_i, dut.tcdm_dma_rsp_q_ready_o)
+        .add_streamer_fifos(dut.i_stream_alu_wrapper)
+        .start()
+    )
+
+    # Keep the last traced cycles and dump
+    # them around every start of the streamer
+    wave_window = (
+        snax_util.WaveWindow(dut, "stream_alu")
+        .add_trigger(
+            "START_STREAMER write",
+            snax_util.csr_write_trigger(dut, CSR_MAP["START_STREAMER"]),
+        )
+        .start()
+    )
+
     # Preload data into the TCDM subsys
     # using the DMA ports
     cocotb.log.info("Preload data with DMA control")
@@ -143,188 +168,237 @@ async def stream_alu_dut(dut):
     # Generate data to be processed
     # Number of elements is dependent on:
     # LOOP_COUNT_0 x (WIDE_DATA_WIDTH / NARROW_DATA_WIDTH)
-    narrow_golden_list = snax_util.gen_rand_int_list(
-        int(LOOP_COUNT_0 * (WIDE_DATA_WIDTH / NARROW_DATA_WIDTH)), MIN_VAL, MAX_VAL
-    )
-    wide_golden_list = snax_util.gen_wide_list(
-        narrow_golden_list, NARROW_DATA_WIDTH, WIDE_DATA_WIDTH
+    narrow_golden_words = snax_util.gen_rand_words(
+        LOOP_COUNT_0 * WIDE_NARROW_RATIO, MIN_VAL, MAX_VAL, NARROW_DATA_WIDTH
     )
+    wide_golden_words = snax_util.pack_words(narrow_golden_words, WIDE_NARROW_RATIO)
+    wide_golden_list = snax_util.words_to_int_list(wide_golden_words)
 
     # Precompute golden results
-    narrow_golden_result = []
-
-    for i in range(LOOP_COUNT_0):
-        for j in range(SPATPAR):
-            # Output changes per ALU_CONFIG
-            if ALU_CONFIG == 1:
-                temp_res = (
-                    narrow_golden_list[i * SPATPAR * 2 + j]
-                    - narrow_golden_list[(2 * i + 1) * SPATPAR + j]
-                )
-            elif ALU_CONFIG == 2:
-                temp_res = (
-                    narrow_golden_list[i * SPATPAR * 2 + j]
-                    * narrow_golden_list[(2 * i + 1) * SPATPAR + j]
-                )
-            elif ALU_CONFIG == 3:
-                temp_res = (
-                    narrow_golden_list[i * SPATPAR * 2 + j]
-                    ^ narrow_golden_list[(2 * i + 1) * SPATPAR + j]
-                )
-            else:
-                temp_res = (
-                    narrow_golden_list[i * SPATPAR * 2 + j]
-                    + narrow_golden_list[(2 * i + 1) * SPATPAR + j]
-                )
-
-            temp_res = temp_res & (MAX_NARROW_VAL - 1)
-            narrow_golden_result.append(temp_res)
-
-    wide_golden_result = snax_util.gen_wide_list(
-        narrow_golden_result, NARROW_DATA_WIDTH, (NARROW_DATA_WIDTH * SPATPAR)
+    # The first reader fetches the lower half of every
+    # wide word as operand a, the second the upper half as b
+    wide_golden_result = ALU_MODEL.run(
+        ALU_CONFIG,
+        wide_golden_words[:, :READER_BYTES],
+        wide_golden_words[:, READER_BYTES:],
     )
 
+    # Values of the CSR registers of the map above
+    csr_values = {
+        "ALU_CONFIG": ALU_CONFIG,
+        "ALU_GPP_1": ALU_GPP_1,
+        "ALU_GPP_2": ALU_GPP_2,
+        "ALU_GPP_3": ALU_GPP_3,
+        "ALU_GPP_4": ALU_GPP_4,
+        "ALU_GPP_5": ALU_GPP_5,
+        "ALU_GPP_6": ALU_GPP_6,
+        "ALU_GPP_7": ALU_GPP_7,
+        "LOOP_COUNT_0": LOOP_COUNT_0,
+        "TEMPORAL_STRIDE_0": TEMPORAL_STRIDE_0,
+        "TEMPORAL_STRIDE_1": TEMPORAL_STRIDE_1,
+        "TEMPORAL_STRIDE_2": TEMPORAL_STRIDE_2,
+        "SPATIAL_STRIDE_0": SPATIAL_STRIDE_0,
+        "SPATIAL_STRIDE_1": SPATIAL_STRIDE_1,
+        "SPATIAL_STRIDE_2": SPATIAL_STRIDE_2,
+        "BASE_PTR_0": BASE_PTR_0,
+        "BASE_PTR_1": BASE_PTR_1,
+        "BASE_PTR_2": BASE_PTR_2,
+    }
+
     # Preload TCDM DMA subsys using DMA ports
+    # or directly into the memory banks
     wide_len = len(wide_golden_list)
-    for i in range(wide_len):
-        await snax_util.wide_tcdm_write(
-            dut, i * WIDE_BANK_INCREMENT, wide_golden_list[i]
-        )
-
-    await snax_util.wide_tcdm_clr(dut)
+    await snax_util.wide_tcdm_load(dut, 0, wide_golden_list, BACKDOOR_ACCESS)
 
     # Sanity check contents loaded into DMA
-    for i in range(wide_len):
-        tcdm_wide_val = await snax_util.wide_tcdm_read(dut, i * WIDE_BANK_INCREMENT)
-        snax_util.comp_and_assert(wide_golden_list[i], tcdm_wide_val)
-
-    await snax_util.wide_tcdm_clr(dut)
+    # A backdoor load is not read back, that
+    # would only return what the backdoor wrote
+    if not BACKDOOR_ACCESS:
+        tcdm_wide_list = await snax_util.wide_tcdm_dump(dut, 0, wide_len)
+        snax_util.comp_and_assert_list(
+            wide_golden_list,
+            tcdm_wide_list,
+            "tcdm_preload",
+            0,
+            WIDE_BANK_INCREMENT,
+        )
 
     cocotb.log.info("Setting up of CSR registers and verifying if setup is correct")
 
-    # Setting of ALU accelerator registers
-    # Only CSR_ALU_CONFIG affects the accelerator
-    # The other registers are for read/write checks only
-    await snax_util.reg_write(dut, CSR_ALU_CONFIG, ALU_CONFIG)
-    await snax_util.reg_write(dut, CSR_ALU_GPP_1, ALU_GPP_1)
-    await snax_util.reg_write(dut, CSR_ALU_GPP_2, ALU_GPP_2)
-    await snax_util.reg_write(dut, CSR_ALU_GPP_3, ALU_GPP_3)
-    await snax_util.reg_write(dut, CSR_ALU_GPP_4, ALU_GPP_4)
-    await snax_util.reg_write(dut, CSR_ALU_GPP_5, ALU_GPP_5)
-    await snax_util.reg_write(dut, CSR_ALU_GPP_6, ALU_GPP_6)
-    await snax_util.reg_write(dut, CSR_ALU_GPP_7, ALU_GPP_7)
-
-    # At this point we'll do explicit declartion
-    # of the tests so that it's understandable
-    # for other users
-
-    # Set number of iterations
-    await snax_util.reg_write(dut, CSR_LOOP_COUNT_0, LOOP_COUNT_0)
-
-    # Set temporal strides
-    await snax_util.reg_write(dut, CSR_TEMPORAL_STRIDE_0, TEMPORAL_STRIDE_0)
-    await snax_util.reg_write(dut, CSR_TEMPORAL_STRIDE_1, TEMPORAL_STRIDE_1)
-    await snax_util.reg_write(dut, CSR_TEMPORAL_STRIDE_2, TEMPORAL_STRIDE_2)
-
-    # Set spatial strides
-    await snax_util.reg_write(dut, CSR_SPATIAL_STRIDE_0, SPATIAL_STRIDE_0)
-    await snax_util.reg_write(dut, CSR_SPATIAL_STRIDE_1, SPATIAL_STRIDE_1)
-    await snax_util.reg_write(dut, CSR_SPATIAL_STRIDE_2, SPATIAL_STRIDE_2)
-
-    # Set base pointers
-    await snax_util.reg_write(dut, CSR_BASE_PTR_0, BASE_PTR_0)
-    await snax_util.reg_write(dut, CSR_BASE_PTR_1, BASE_PTR_1)
-    await snax_util.reg_write(dut, CSR_BASE_PTR_2, BASE_PTR_2)
-
-    # Clear driver signals
-    # So that we don't have stuck valid
-    await snax_util.reg_clr(dut)
-
-    # Read and verify the contents
-    # of the previously set registers
-
-    # Check ALU registers first
-    reg_val = await snax_util.reg_read(dut, CSR_ALU_CONFIG)
-    snax_util.comp_and_assert(ALU_CONFIG, reg_val)
-    reg_val = await snax_util.reg_read(dut, CSR_ALU_GPP_1)
-    snax_util.comp_and_assert(ALU_GPP_1, reg_val)
-    reg_val = await snax_util.reg_read(dut, CSR_ALU_GPP_2)
-    snax_util.comp_and_assert(ALU_GPP_2, reg_val)
-    reg_val = await snax_util.reg_read(dut, CSR_ALU_GPP_3)
-    snax_util.comp_and_assert(ALU_GPP_3, reg_val)
-    reg_val = await snax_util.reg_read(dut, CSR_ALU_GPP_4)
-    snax_util.comp_and_assert(ALU_GPP_4, reg_val)
-    reg_val = await snax_util.reg_read(dut, CSR_ALU_GPP_5)
-    snax_util.comp_and_assert(ALU_GPP_5, reg_val)
-    reg_val = await snax_util.reg_read(dut, CSR_ALU_GPP_6)
-    snax_util.comp_and_assert(ALU_GPP_6, reg_val)
-    reg_val = await snax_util.reg_read(dut, CSR_ALU_GPP_7)
-    snax_util.comp_and_assert(ALU_GPP_7, reg_val)
-
-    # Check Streamer registers
-    reg_val = await snax_util.reg_read(dut, CSR_LOOP_COUNT_0)
-    snax_util.comp_and_assert(LOOP_COUNT_0, reg_val)
-    reg_val = await snax_util.reg_read(dut, CSR_TEMPORAL_STRIDE_0)
-    snax_util.comp_and_assert(TEMPORAL_STRIDE_0, reg_val)
-    reg_val = await snax_util.reg_read(dut, CSR_TEMPORAL_STRIDE_1)
-    snax_util.comp_and_assert(TEMPORAL_STRIDE_1, reg_val)
-    reg_val = await snax_util.reg_read(dut, CSR_TEMPORAL_STRIDE_2)
-    snax_util.comp_and_assert(TEMPORAL_STRIDE_2, reg_val)
-    reg_val = await snax_util.reg_read(dut, CSR_SPATIAL_STRIDE_0)
-    snax_util.comp_and_assert(SPATIAL_STRIDE_0, reg_val)
-    reg_val = await snax_util.reg_read(dut, CSR_SPATIAL_STRIDE_1)
-    snax_util.comp_and_assert(SPATIAL_STRIDE_1, reg_val)
-    reg_val = await snax_util.reg_read(dut, CSR_SPATIAL_STRIDE_2)
-    snax_util.comp_and_assert(SPATIAL_STRIDE_2, reg_val)
-    reg_val = await snax_util.reg_read(dut, CSR_BASE_PTR_0)
-    snax_util.comp_and_assert(BASE_PTR_0, reg_val)
-    reg_val = await snax_util.reg_read(dut, CSR_BASE_PTR_1)
-    snax_util.comp_and_assert(BASE_PTR_1, reg_val)
-    reg_val = await snax_util.reg_read(dut, CSR_BASE_PTR_2)
-    snax_util.comp_and_assert(BASE_PTR_2, reg_val)
-    await snax_util.reg_clr(dut)
+    # Setting of ALU accelerator and streamer registers
+    # Only ALU_CONFIG affects the accelerator
+    # The GPP registers are for read/write checks only
+    # All registers are programmed as one burst then read
+    # back and verified as one burst, unless --fast-setup
+    await snax_util.csr_program(
+        dut, CSR_MAP, csr_values, verify=not snax_util.FAST_SETUP
+    )
 
     # In this test we simply continuously
     # stream the data in the stream to accelerator ports
     # and check if the data is consistent with the preloaded data
     cocotb.log.info("Run the streamer and check if data are correct")
 
-    # Write anything to CSR_STAR_STREAMER CSR
+    # The monitor checks the accelerator results
+    # while the streamer runs
+    result_check = snax_util.start_stream_check(
+        dut,
+        dut.i_stream_alu_wrapper.acc2stream_data_0_bits,
+        dut.i_stream_alu_wrapper.acc2stream_data_0_valid,
+        dut.i_stream_alu_wrapper.acc2stream_data_0_ready,
+        wide_golden_result,
+        "acc2stream_data_0",
+    )
+
+    # Write anything to START_STREAMER CSR
     # adderss to activate the streamer
-    await snax_util.reg_write(dut, CSR_START_STREAMER, 1)
+    await snax_util.reg_write(dut, CSR_MAP["START_STREAMER"], 1)
     await snax_util.reg_clr(dut)
 
-    # Wait for the rising edge of the valid
-    # From here we can continuously stream for ever clock cycle
-    await with_timeout(
-        RisingEdge(dut.i_stream_alu_wrapper.acc2stream_data_0_valid), 100, "ns"
-    )
-    # Necessary for cocotb evaluation step
-    await Timer(Decimal(1), units="ps")
+    await with_timeout(result_check.wait_done(), 100 * LOOP_COUNT_0, "ns")
+    result_check.monitor.stop()
+    result_check.check()
 
-    for i in range(LOOP_COUNT_0):
-        # Extract the data
-        write_stream_0 = int(dut.i_stream_alu_wrapper.acc2stream_data_0_bits.value)
+    perf.write_json()
+    wave_window.stop()
 
-        # Streamed data should be consistent
-        snax_util.comp_and_assert(wide_golden_result[i], write_stream_0)
-        await snax_util.clock_and_wait(dut)
 
+# Operand set of the session test as wide words
+def gen_operand_words(operand_set: int, num_beats: int) -> np.ndarray:
+    rng = np.random.default_rng(operand_set)
+    shape = (num_beats * WIDE_NARROW_RATIO,)
+    if operand_set == 0:
+        narrow = rng.choice(np.array(CORNER_VALS, dtype=np.uint64), shape)
+    else:
+        narrow = rng.integers(0, 2**64 - 1, shape, dtype=np.uint64, endpoint=True)
+    return narrow.astype("<u8").view(np.uint8).reshape(num_beats, -1)
 
-# Main test run
-def test_stream_alu(simulator, waves):
-    repo_path = os.getcwd()
-    tests_path = repo_path + "/tests/cocotb/"
+
+@cocotb.test()
+async def stream_alu_session_dut(dut):
+    # The readers fetch consecutive wide words
+    # and the writer stores the results after them
+    stream_csr_values = {
+        "LOOP_COUNT_0": SESSION_LOOP_COUNT,
+        "TEMPORAL_STRIDE_0": 64,
+        "TEMPORAL_STRIDE_1": 64,
+        "TEMPORAL_STRIDE_2": 64,
+        "SPATIAL_STRIDE_0": 8,
+        "SPATIAL_STRIDE_1": 8,
+        "SPATIAL_STRIDE_2": 8,
+        "BASE_PTR_0": 0,
+        "BASE_PTR_1": 32,
+        "BASE_PTR_2": SESSION_LOOP_COUNT * WIDE_BANK_INCREMENT,
+    }
+    result_base = stream_csr_values["BASE_PTR_2"]
+
+    # Start clock
+    clock = Clock(dut.clk_i, 10, units="ns")
+    cocotb.start_soon(clock.start())
+
+    dut.rst_ni.value = 0
+    dut.io_csr_rsp_ready_i.value = 1
+    dut.tcdm_dma_req_write_i.value = 0
+    dut.tcdm_dma_req_addr_i.value = 0
+    dut.tcdm_dma_req_data_i.value = 0
+    dut.tcdm_dma_req_strb_i.value = 0
+    dut.tcdm_dma_req_q_valid_i.value = 0
+
+    await snax_util.clock_and_wait(dut)
+    await snax_util.reset_dut(dut)
+
+    # Every phase reprograms the CSRs in place,
+    # the model is only reset once above
+    num_beats = 0
+    start_time = time.perf_counter()
+
+    for operand_set in range(SESSION_OPERAND_SETS):
+        wide_words = gen_operand_words(operand_set, SESSION_LOOP_COUNT)
+        await snax_util.wide_tcdm_load(
+            dut, 0, snax_util.words_to_int_list(wide_words), BACKDOOR_ACCESS
+        )
+
+        for alu_config in range(4):
+            phase = f"{ALU_MODEL.op_of(alu_config)}_set{operand_set}"
+            cocotb.log.info(f"Session phase {phase}")
+
+            golden_result = ALU_MODEL.run(
+                alu_config,
+                wide_words[:, :READER_BYTES],
+                wide_words[:, READER_BYTES:],
+            )
+
+            await snax_util.csr_program(
+                dut, CSR_MAP, {"ALU_CONFIG": alu_config, **stream_csr_values}
+            )
+
+            result_check = snax_util.start_stream_check(
+                dut,
+                dut.i_stream_alu_wrapper.acc2stream_data_0_bits,
+                dut.i_stream_alu_wrapper.acc2stream_data_0_valid,
+                dut.i_stream_alu_wrapper.acc2stream_data_0_ready,
+                golden_result,
+                f"acc2stream_data_0_{phase}",
+            )
+
+            # The phase is done once the writer
+            # stored every element of the results
+            result_writes = cocotb.start_soon(
+                snax_util.wait_tcdm_writes(
+                    dut,
+                    dut.tcdm_req_q_valid,
+                    dut.tcdm_rsp_q_ready,
+                    dut.tcdm_req_write,
+                    list(range(READER_PORTS, READER_PORTS + WRITER_PORTS)),
+                    SESSION_LOOP_COUNT * WRITER_PORTS,
+                )
+            )
+
+            await snax_util.reg_write(dut, CSR_MAP["START_STREAMER"], 1)
+            await snax_util.reg_clr(dut)
+
+            await with_timeout(result_check.wait_done(), 100 * SESSION_LOOP_COUNT, "ns")
+            await with_timeout(result_writes.join(), 1000, "ns")
+
+            result_check.monitor.stop()
+            result_check.check()
+
+            # The writer stores each result in the lower
+            # half of one wide word after the operands
+            result_words = snax_util.tcdm_backdoor_read_bytes(
+                dut, result_base, SESSION_LOOP_COUNT * WIDE_BANK_INCREMENT
+            ).reshape(SESSION_LOOP_COUNT, -1)[:, :READER_BYTES]
+            snax_util.comp_and_assert_list(
+                golden_result,
+                snax_util.words_to_int_list(result_words),
+                f"tcdm_result_{phase}",
+                result_base,
+                WIDE_BANK_INCREMENT,
+            )
+
+            num_beats += SESSION_LOOP_COUNT
+
+    elapsed = time.perf_counter() - start_time
+    cocotb.log.info(
+        f"Session checked {num_beats} result beats in {elapsed:.2f} s "
+        f"({num_beats / elapsed:.0f} beats/s)"
+    )
+
+
+# Simulation sources and arguments of the testbench
+def gen_sim_args(simulator: str) -> Dict:
+    repo_path = snax_util.REPO_PATH
+    gen_rtl_path = snax_util.GEN_RTL_PATH
+    gen_tb_path = snax_util.GEN_TB_PATH
 
     # Make sure to generate the StreamerTop.sv
     # If it does not exist
-    stream_alu_tb_file = repo_path + "/tests/tb/tb_stream_alu.sv"
-    if not os.path.exists(stream_alu_tb_file):
-        subprocess.run(["make", stream_alu_tb_file])
+    stream_alu_tb_file = gen_tb_path + "/tb_stream_alu.sv"
+    snax_util.make_target(stream_alu_tb_file)
 
     streamer_verilog_sources = [
-        repo_path + "/rtl/StreamerTop.sv",
-        repo_path + "/rtl/streamer_wrapper.sv",
+        gen_rtl_path + "/StreamerTop.sv",
+        gen_rtl_path + "/streamer_wrapper.sv",
     ]
 
     # Extract TCDM components
@@ -335,7 +409,7 @@ def test_stream_alu(simulator, waves):
         repo_path + "/rtl/simple-alu/simple_alu.sv",
         repo_path + "/rtl/simple-alu/simple_alu_csr.sv",
         repo_path + "/rtl/simple-alu/simple_alu_wrapper.sv",
-        repo_path + "/rtl/stream_alu_wrapper.sv",
+        gen_rtl_path + "/stream_alu_wrapper.sv",
     ]
 
     rtl_util_sources = [
@@ -359,10 +433,6 @@ def test_stream_alu(simulator, waves):
 
     toplevel = "tb_stream_alu"
 
-    module = "test_stream_alu"
-
-    sim_build = tests_path + "/sim_build/{}/".format(toplevel)
-
     if simulator == "verilator":
         compile_args = [
             "-Wno-LITENDIAN",
@@ -376,23 +446,28 @@ def test_stream_alu(simulator, waves):
             "-Wno-TIMESCALEMOD",
             "-Wno-fatal",
             "--no-timing",
-            "--trace",
-            "--trace-structs",
         ]
         timescale = None
     else:
         compile_args = None
         timescale = "1ns/1ps"
 
-    run(
-        verilog_sources=verilog_sources,
-        includes=includes,
-        toplevel=toplevel,
-        defines=defines,
-        module=module,
+    return {
+        "verilog_sources": verilog_sources,
+        "includes": includes,
+        "defines": defines,
+        "toplevel": toplevel,
+        "compile_args": compile_args,
+        "timescale": timescale,
+    }
+
+
+# Main test run
+def test_stream_alu(simulator, waves, sim_run_dir):
+    snax_util.run_sim(
+        module="test_stream_alu",
         simulator=simulator,
-        sim_build=sim_build,
-        compile_args=compile_args,
         waves=waves,
-        timescale=timescale,
+        run_dir=sim_run_dir,
+        **gen_sim_args(simulator),
     )
@@ -12,23 +12,34 @@
 # 1. First test read and write to CSR registers
 # 2. Check if the output addresses of TCDM
 #    are correct and valid
+# 3. Run hundreds of constrained-random
+#    configurations back-to-back without a reset
 # ---------------------------------
 
 import cocotb
 from cocotb.triggers import RisingEdge, Timer, with_timeout
 from cocotb.clock import Clock
-from cocotb_test.simulator import run
+from cocotb.result import SimTimeoutError
 import snax_util
-import os
-import subprocess
+import numpy as np
+from typing import Dict, Iterable, List
+import snax_model
+import snax_stim
 from decimal import Decimal
+import os
 
-# Configurable design time parameters
-TCDM_REQ_PORTS = 12
-NARROW_DATA_WIDTH = 64
-WIDE_DATA_WIDTH = 512
-TCDM_DEPTH = 64
-NR_BANKS = 32
+# Design time parameters of the streamer configuration
+# found in ./util/cfg/streamer_cfg.hjson or SNAX_STREAMER_CFG
+STREAMER_CFG = snax_util.load_streamer_cfg()
+TCDM_REQ_PORTS = sum(STREAMER_CFG["dataReaderParams"]["tcdmPortsNum"]) + sum(
+    STREAMER_CFG["dataWriterParams"]["tcdmPortsNum"]
+)
+READER_WIDTHS = list(STREAMER_CFG["fifoReaderParams"]["fifoWidth"])
+WRITER_WIDTH = STREAMER_CFG["fifoWriterParams"]["fifoWidth"][0]
+NARROW_DATA_WIDTH = STREAMER_CFG["tcdmDataWidth"]
+WIDE_DATA_WIDTH = STREAMER_CFG["tcdmDmaDataWidth"]
+TCDM_DEPTH = STREAMER_CFG["tcdmDepth"]
+NR_BANKS = STREAMER_CFG["numBanks"]
 NUM_INPUT = 2
 
 # Configurable testing parameters
@@ -43,21 +54,32 @@ MIN_VAL = 0
 MAX_NARROW_VAL = 2**NARROW_DATA_WIDTH
 MAX_WIDE_VAL = 2**WIDE_DATA_WIDTH
 
-# DON'T TOUCH ME PLEASE
-# CSR parameters from the default
+# True to preload and check the TCDM directly through
+# the memory banks (zero cycles) instead of through the
+# DMA ports, set with pytest --fast-setup
+BACKDOOR_ACCESS = snax_util.FAST_SETUP
+
+# CSR register map generated from the default
 # Configuration found under util/cfg/streamer_cfg.hjson
-# Also some pre-computed that are fixed
-CSR_LOOP_COUNT_0 = 0
-CSR_TEMPORAL_STRIDE_0 = 1
-CSR_TEMPORAL_STRIDE_1 = 2
-CSR_TEMPORAL_STRIDE_2 = 3
-CSR_SPATIAL_STRIDE_0 = 4
-CSR_SPATIAL_STRIDE_1 = 5
-CSR_SPATIAL_STRIDE_2 = 6
-CSR_BASE_PTR_0 = 7
-CSR_BASE_PTR_1 = 8
-CSR_BASE_PTR_2 = 9
-CSR_START_STREAMER = 10
+CSR_MAP = snax_util.gen_streamer_csr_map()
+
+# Golden models of the streamer address generation
+# and of the TCDM bank conflicts
+AGU_MODEL = snax_model.StreamerAguModel()
+BANK_MODEL = snax_model.TcdmBankModel()
+
+# Number and seed of the constrained-random configurations
+# that run back-to-back in one simulation without a reset
+NUM_RANDOM_CFGS = int(os.getenv("SNAX_RANDOM_CFGS", 200))
+RANDOM_SEED = int(os.getenv("SNAX_RANDOM_SEED", 0))
+
+
+# Beats of reader idx, which reads its slice of each wide word
+# The readers split the wide words in the order of their widths
+def reader_beats(wide_list: List[int], idx: int) -> Iterable[int]:
+    shift = sum(READER_WIDTHS[:idx])
+    mask = 2 ** READER_WIDTHS[idx] - 1
+    return ((val >> shift) & mask for val in wide_list)
 
 
 @cocotb.test()
@@ -65,7 +87,7 @@ async def stream_tcdm_dut(dut):
     # Value configurations you can set
     # For exploration and testing
     # These values go into the respective
-    # CSR register addresses above
+    # CSR registers of the map above
     LOOP_COUNT_0 = 20
     TEMPORAL_STRIDE_0 = 64
     TEMPORAL_STRIDE_1 = 64
@@ -112,6 +134,32 @@ async def stream_tcdm_dut(dut):
 
     await snax_util.clock_and_wait(dut)
 
+    # Record the throughput of all the interfaces
+    perf = (
+        snax_util.PerfRecorder(dut, "stream_tcdm")
+        .add("csr", dut.io_csr_req_valid_i, dut.io_csr_req_ready_o)
+        .add("tcdm_dma", dut.tcdm_dma_req_q_valid_i, dut.tcdm_dma_rsp_q_ready_o)
+        .add_ports(
+            "tcdm",
+            dut.mon_tcdm_req_q_valid_o,
+            dut.mon_tcdm_rsp_q_ready_i,
+            TCDM_REQ_PORTS,
+        )
+        .add_streamer_fifos(dut)
+        .start()
+    )
+
+    # Keep the last traced cycles and dump
+    # them around every start of the streamer
+    wave_window = (
+        snax_util.WaveWindow(dut, "stream_tcdm")
+        .add_trigger(
+            "START_STREAMER write",
+            snax_util.csr_write_trigger(dut, CSR_MAP["START_STREAMER"]),
+        )
+        .start()
+    )
+
     # Preload data into the TCDM subsys
     # using the DMA ports
     cocotb.log.info("Preload data with DMA control")
@@ -130,108 +178,77 @@ async def stream_tcdm_dut(dut):
         int(LOOP_COUNT_0 * (WIDE_DATA_WIDTH / NARROW_DATA_WIDTH / 2)), MIN_VAL, 255
     )
     wide_writer_golden_list = snax_util.gen_wide_list(
-        narrow_writer_golden_list, NARROW_DATA_WIDTH, 256
+        narrow_writer_golden_list, NARROW_DATA_WIDTH, WRITER_WIDTH
     )
 
+    # Values of the CSR registers of the map above
+    csr_values = {
+        "LOOP_COUNT_0": LOOP_COUNT_0,
+        "TEMPORAL_STRIDE_0": TEMPORAL_STRIDE_0,
+        "TEMPORAL_STRIDE_1": TEMPORAL_STRIDE_1,
+        "TEMPORAL_STRIDE_2": TEMPORAL_STRIDE_2,
+        "SPATIAL_STRIDE_0": SPATIAL_STRIDE_0,
+        "SPATIAL_STRIDE_1": SPATIAL_STRIDE_1,
+        "SPATIAL_STRIDE_2": SPATIAL_STRIDE_2,
+        "BASE_PTR_0": BASE_PTR_0,
+        "BASE_PTR_1": BASE_PTR_1,
+        "BASE_PTR_2": BASE_PTR_2,
+    }
+
     # Preload TCDM DMA subsys using DMA ports
+    # or directly into the memory banks
     wide_len = len(wide_golden_list)
-    for i in range(wide_len):
-        await snax_util.wide_tcdm_write(
-            dut, i * WIDE_BANK_INCREMENT, wide_golden_list[i]
-        )
-
-    await snax_util.wide_tcdm_clr(dut)
+    await snax_util.wide_tcdm_load(dut, 0, wide_golden_list, BACKDOOR_ACCESS)
 
     # Sanity check contents loaded into DMA
-    for i in range(wide_len):
-        tcdm_wide_val = await snax_util.wide_tcdm_read(dut, i * WIDE_BANK_INCREMENT)
-        snax_util.comp_and_assert(wide_golden_list[i], tcdm_wide_val)
-
-    await snax_util.wide_tcdm_clr(dut)
+    # A backdoor load is not read back, that
+    # would only return what the backdoor wrote
+    if not BACKDOOR_ACCESS:
+        tcdm_wide_list = await snax_util.wide_tcdm_dump(dut, 0, wide_len)
+        snax_util.comp_and_assert_list(
+            wide_golden_list,
+            tcdm_wide_list,
+            "tcdm_preload",
+            0,
+            WIDE_BANK_INCREMENT,
+        )
 
     cocotb.log.info("Setting up of CSR registers and verifying if setup is correct")
 
-    # At this point we'll do explicit declartion
-    # of the tests so that it's understandable
-    # for other users
-
-    # Set number of iterations
-    await snax_util.reg_write(dut, CSR_LOOP_COUNT_0, LOOP_COUNT_0)
-
-    # Set temporal strides
-    await snax_util.reg_write(dut, CSR_TEMPORAL_STRIDE_0, TEMPORAL_STRIDE_0)
-    await snax_util.reg_write(dut, CSR_TEMPORAL_STRIDE_1, TEMPORAL_STRIDE_1)
-    await snax_util.reg_write(dut, CSR_TEMPORAL_STRIDE_2, TEMPORAL_STRIDE_2)
-
-    # Set spatial strides
-    await snax_util.reg_write(dut, CSR_SPATIAL_STRIDE_0, SPATIAL_STRIDE_0)
-    await snax_util.reg_write(dut, CSR_SPATIAL_STRIDE_1, SPATIAL_STRIDE_1)
-    await snax_util.reg_write(dut, CSR_SPATIAL_STRIDE_2, SPATIAL_STRIDE_2)
-
-    # Set base pointers
-    await snax_util.reg_write(dut, CSR_BASE_PTR_0, BASE_PTR_0)
-    await snax_util.reg_write(dut, CSR_BASE_PTR_1, BASE_PTR_1)
-    await snax_util.reg_write(dut, CSR_BASE_PTR_2, BASE_PTR_2)
-
-    # Clear driver signals
-    # So that we don't have stuck valid
-    await snax_util.reg_clr(dut)
-
-    # Read and verify the contents
-    # of the previously set registers
-    reg_val = await snax_util.reg_read(dut, CSR_LOOP_COUNT_0)
-    snax_util.comp_and_assert(LOOP_COUNT_0, reg_val)
-    reg_val = await snax_util.reg_read(dut, CSR_TEMPORAL_STRIDE_0)
-    snax_util.comp_and_assert(TEMPORAL_STRIDE_0, reg_val)
-    reg_val = await snax_util.reg_read(dut, CSR_TEMPORAL_STRIDE_1)
-    snax_util.comp_and_assert(TEMPORAL_STRIDE_1, reg_val)
-    reg_val = await snax_util.reg_read(dut, CSR_TEMPORAL_STRIDE_2)
-    snax_util.comp_and_assert(TEMPORAL_STRIDE_2, reg_val)
-    reg_val = await snax_util.reg_read(dut, CSR_SPATIAL_STRIDE_0)
-    snax_util.comp_and_assert(SPATIAL_STRIDE_0, reg_val)
-    reg_val = await snax_util.reg_read(dut, CSR_SPATIAL_STRIDE_1)
-    snax_util.comp_and_assert(SPATIAL_STRIDE_1, reg_val)
-    reg_val = await snax_util.reg_read(dut, CSR_SPATIAL_STRIDE_2)
-    snax_util.comp_and_assert(SPATIAL_STRIDE_2, reg_val)
-    reg_val = await snax_util.reg_read(dut, CSR_BASE_PTR_0)
-    snax_util.comp_and_assert(BASE_PTR_0, reg_val)
-    reg_val = await snax_util.reg_read(dut, CSR_BASE_PTR_1)
-    snax_util.comp_and_assert(BASE_PTR_1, reg_val)
-    reg_val = await snax_util.reg_read(dut, CSR_BASE_PTR_2)
-    snax_util.comp_and_assert(BASE_PTR_2, reg_val)
-    await snax_util.reg_clr(dut)
+    # Program all registers as one burst then read back
+    # and verify them as one burst, unless --fast-setup
+    await snax_util.csr_program(
+        dut, CSR_MAP, csr_values, verify=not snax_util.FAST_SETUP
+    )
 
     # In this test we simply continuously
     # stream the data in the stream to accelerator ports
     # and check if the data is consistent with the preloaded data
     cocotb.log.info("Run the streamer and check if data are correct")
 
-    # Write anything to CSR_STAR_STREAMER CSR
+    # Each reader port carries its slice of the wide data
+    # The monitors check the slices while the streamer runs
+    reader_checks = [
+        snax_util.start_stream_check(
+            dut,
+            getattr(dut, f"stream2acc_data_{idx}_bits_o"),
+            getattr(dut, f"stream2acc_data_{idx}_valid_o"),
+            getattr(dut, f"stream2acc_data_{idx}_ready_i"),
+            reader_beats(wide_golden_list, idx),
+            f"stream2acc_data_{idx}",
+        )
+        for idx in range(len(READER_WIDTHS))
+    ]
+
+    # Write anything to START_STREAMER CSR
     # adderss to activate the streamer
-    await snax_util.reg_write(dut, CSR_START_STREAMER, 1)
+    await snax_util.reg_write(dut, CSR_MAP["START_STREAMER"], 1)
     await snax_util.reg_clr(dut)
 
-    # Wait for the rising edge of the valid
-    # From there we can continuously stream for ever clock cycle
-
-    # Necessary for cocotb evaluation step
-    await Timer(Decimal(1), units="ps")
-
-    for i in range(LOOP_COUNT_0):
-        # Check if signal_valid is high, wait if not
-        while dut.stream2acc_data_0_valid_o.value != 1:
-            await snax_util.clock_and_wait(dut)
-
-        # Extract the data
-        read_stream_0 = int(dut.stream2acc_data_0_bits_o.value)
-        read_stream_1 = int(dut.stream2acc_data_1_bits_o.value)
-
-        # Combine data into 512 bits wide
-        # Note that each reader port is 256 bits only
-        # Compare combined data to the wide golden list
-        combined_val = read_stream_0 + (read_stream_1 << 256)
-        snax_util.comp_and_assert(wide_golden_list[i], combined_val)
-        await snax_util.clock_and_wait(dut)
+    for reader_check in reader_checks:
+        await with_timeout(reader_check.wait_done(), 100 * LOOP_COUNT_0, "ns")
+        reader_check.monitor.stop()
+        reader_check.check()
 
     # In this test the writer is streamed continuosly
     # then we read through one of the reader ports
@@ -243,13 +260,10 @@ async def stream_tcdm_dut(dut):
         dut.acc2stream_data_0_bits_i.value = wide_writer_golden_list[i]
         dut.acc2stream_data_0_valid_i.value = 1
 
-        await Timer(Decimal(1), units="ps")
-
-        # Check if signal_ready is high, wait if not
-        while dut.acc2stream_data_0_ready_o.value != 1:
-            await snax_util.clock_and_wait(dut)
-
-        await snax_util.clock_and_wait(dut)
+        # Wait until the writer accepts the data
+        await snax_util.wait_handshake(
+            dut, dut.acc2stream_data_0_valid_i, dut.acc2stream_data_0_ready_o
+        )
 
     # Clear step to avoid overwriting
     dut.acc2stream_data_0_bits_i.value = 0
@@ -262,7 +276,7 @@ async def stream_tcdm_dut(dut):
     await snax_util.clock_and_wait(dut)
 
     # Start streamer again
-    await snax_util.reg_write(dut, CSR_START_STREAMER, 1)
+    await snax_util.reg_write(dut, CSR_MAP["START_STREAMER"], 1)
     await snax_util.reg_clr(dut)
 
     # Wait for the rising edge of the valid
@@ -271,53 +285,60 @@ async def stream_tcdm_dut(dut):
     # Necessary for cocotb evaluation step
     await Timer(Decimal(1), units="ps")
 
-    for i in range(LOOP_COUNT_0):
-        # Check if signal_valid is high, wait if not
-        await Timer(Decimal(1), units="ps")
-        while dut.stream2acc_data_0_valid_o.value != 1:
-            await snax_util.clock_and_wait(dut)
-
-        # Extract the data
-        read_stream_0 = int(dut.stream2acc_data_0_bits_o.value)
+    # Extract the data of every handshake
+    read_list = await snax_util.wait_handshakes(
+        dut,
+        dut.stream2acc_data_0_valid_o,
+        dut.stream2acc_data_0_ready_i,
+        LOOP_COUNT_0,
+        dut.stream2acc_data_0_bits_o,
+    )
 
-        # Streamed data should be consistent
-        snax_util.comp_and_assert(wide_writer_golden_list[i], read_stream_0)
-        await snax_util.clock_and_wait(dut)
+    # Streamed data should be consistent
+    snax_util.comp_and_assert_list(
+        wide_writer_golden_list, read_list, "stream2acc_data_0"
+    )
 
     # reset the streamer
-    for _ in range(10):
-        await snax_util.clock_and_wait(dut)
+    await snax_util.wait_cycles(dut, 10)
     dut.rst_ni.value = 0
     await snax_util.clock_and_wait(dut)
     await snax_util.clock_and_wait(dut)
     dut.rst_ni.value = 1
-    for _ in range(10):
-        await snax_util.clock_and_wait(dut)
+    await snax_util.wait_cycles(dut, 10)
 
     cocotb.log.info("Writer-reader test - with contention")
 
-    # Set number of iterations
-    await snax_util.reg_write(dut, CSR_LOOP_COUNT_0, LOOP_COUNT_0)
-
-    # Set spatial strides to 32 banks such that all of the read/writes will
-    # result in bank conflicts
-    await snax_util.reg_write(dut, CSR_SPATIAL_STRIDE_0, 256)
-    await snax_util.reg_write(dut, CSR_SPATIAL_STRIDE_1, 256)
-    await snax_util.reg_write(dut, CSR_SPATIAL_STRIDE_2, 256)
-
-    # Set temporal to just 1 bank
-    await snax_util.reg_write(dut, CSR_TEMPORAL_STRIDE_0, 8)
-    await snax_util.reg_write(dut, CSR_TEMPORAL_STRIDE_1, 8)
-    await snax_util.reg_write(dut, CSR_TEMPORAL_STRIDE_2, 8)
-
-    # Set base pointers
-    await snax_util.reg_write(dut, CSR_BASE_PTR_0, BASE_PTR_0)
-    await snax_util.reg_write(dut, CSR_BASE_PTR_1, BASE_PTR_1)
-    await snax_util.reg_write(dut, CSR_BASE_PTR_2, BASE_PTR_2)
-
-    # Write a 1 to CSR_START_STREAMER CSR
+    # Set spatial strides to all banks such that all of the read/writes will
+    # result in bank conflicts, and the temporal strides to just 1 bank
+    contention_csr_values = {
+        "LOOP_COUNT_0": LOOP_COUNT_0,
+        "TEMPORAL_STRIDE_0": 8,
+        "TEMPORAL_STRIDE_1": 8,
+        "TEMPORAL_STRIDE_2": 8,
+        "SPATIAL_STRIDE_0": NR_BANKS * BANK_INCREMENT,
+        "SPATIAL_STRIDE_1": NR_BANKS * BANK_INCREMENT,
+        "SPATIAL_STRIDE_2": NR_BANKS * BANK_INCREMENT,
+        "BASE_PTR_0": BASE_PTR_0,
+        "BASE_PTR_1": BASE_PTR_1,
+        "BASE_PTR_2": BASE_PTR_2,
+    }
+    await snax_util.csr_program(dut, CSR_MAP, contention_csr_values, verify=False)
+
+    # Count the grants and stalls of the streamer TCDM ports
+    conflict_monitor = snax_util.TcdmConflictMonitor(
+        dut,
+        dut.mon_tcdm_req_addr_o,
+        dut.mon_tcdm_req_q_valid_o,
+        dut.mon_tcdm_rsp_q_ready_i,
+        TCDM_REQ_PORTS,
+        NARROW_DATA_WIDTH,
+        NR_BANKS,
+    ).start()
+
+    # Write a 1 to START_STREAMER CSR
     # address to activate the streamer
-    await snax_util.reg_write(dut, CSR_START_STREAMER, 1)
+    await snax_util.reg_write(dut, CSR_MAP["START_STREAMER"], 1)
     await snax_util.reg_clr(dut)
 
     # allow the reader to run in background
@@ -330,12 +351,10 @@ async def stream_tcdm_dut(dut):
         dut.acc2stream_data_0_bits_i.value = wide_writer_golden_list[i]
         dut.acc2stream_data_0_valid_i.value = 1
 
-        # Check if signal_ready is high, wait if not
-        await Timer(Decimal(1), units="ps")
-        while dut.acc2stream_data_0_ready_o.value != 1:
-            await snax_util.clock_and_wait(dut)
-
-        await snax_util.clock_and_wait(dut)
+        # Wait until the writer accepts the data
+        await snax_util.wait_handshake(
+            dut, dut.acc2stream_data_0_valid_i, dut.acc2stream_data_0_ready_o
+        )
 
     # Clear step to avoid overwriting
     dut.acc2stream_data_0_bits_i.value = 0
@@ -345,16 +364,59 @@ async def stream_tcdm_dut(dut):
     ## process reading data from streamers to finish operation
 
     # wait for finish
-    await with_timeout(snax_util.reg_write(dut, CSR_START_STREAMER, 0), 100, "ns")
+    await with_timeout(
+        snax_util.reg_write(dut, CSR_MAP["START_STREAMER"], 0), 100, "ns"
+    )
     await snax_util.reg_clr(dut)
 
+    # Compare the measured bank conflicts with the model
+    # The model gives the requests and, per data mover, the banks its
+    # own ports conflict on. The data movers do not run in lockstep,
+    # so the stalls between them are only reported, not checked.
+    conflict_monitor.stop()
+    expected_conflicts = BANK_MODEL.summary(
+        list(AGU_MODEL.iter_port_addresses(contention_csr_values))
+    )
+    measured_conflicts = conflict_monitor.summary()
+    cocotb.log.info(f"Modelled TCDM conflicts in lockstep: {expected_conflicts}")
+    cocotb.log.info(f"Measured TCDM conflicts: {measured_conflicts}")
+
+    assert measured_conflicts["requests"] == expected_conflicts["requests"], (
+        f"TCDM requests: expected {expected_conflicts['requests']}, "
+        f"measured {measured_conflicts['requests']}"
+    )
+    assert measured_conflicts["conflict_steps"] > 0, "No TCDM conflicts measured"
+
+    # Every mover stalls on the banks it conflicts on by itself,
+    # and only the banks the movers access can stall at all
+    mover_addrs = [
+        AGU_MODEL.mover_addresses(contention_csr_values, mover)
+        for mover in range(AGU_MODEL.num_data_mover)
+    ]
+    mover_conflict_banks = set()
+    for addrs in mover_addrs:
+        loads = BANK_MODEL.bank_loads(addrs)
+        mover_conflict_banks |= set(np.nonzero((loads > 1).any(axis=0))[0].tolist())
+    accessed_banks = set(
+        np.unique(BANK_MODEL.bank_of(np.concatenate(mover_addrs, axis=None))).tolist()
+    )
+    stalled_banks = set(np.nonzero(conflict_monitor.bank_stalls)[0].tolist())
+    assert mover_conflict_banks <= stalled_banks, (
+        f"TCDM banks {sorted(mover_conflict_banks - stalled_banks)} "
+        f"did not stall on the conflicts of a data mover"
+    )
+    assert stalled_banks <= accessed_banks, (
+        f"TCDM banks {sorted(stalled_banks - accessed_banks)} "
+        f"stalled without being accessed"
+    )
+
     # Switch off 2nd reader since the
     # 1st reader will be the only one used
     dut.stream2acc_data_1_ready_i.value = 0
     await snax_util.clock_and_wait(dut)
 
     # Start streamer again
-    await snax_util.reg_write(dut, CSR_START_STREAMER, 1)
+    await snax_util.reg_write(dut, CSR_MAP["START_STREAMER"], 1)
     await snax_util.reg_clr(dut)
 
     # Wait for the rising edge of the valid
@@ -363,53 +425,53 @@ async def stream_tcdm_dut(dut):
     # Necessary for cocotb evaluation step
     await Timer(Decimal(1), units="ps")
 
-    for i in range(LOOP_COUNT_0):
-        # Check if signal_valid is high, wait if not
-        await Timer(Decimal(1), units="ps")
-        while dut.stream2acc_data_0_valid_o.value != 1:
-            await snax_util.clock_and_wait(dut)
-
-        # Extract the data
-        read_stream_0 = int(dut.stream2acc_data_0_bits_o.value)
+    # Extract the data of every handshake
+    read_list = await snax_util.wait_handshakes(
+        dut,
+        dut.stream2acc_data_0_valid_o,
+        dut.stream2acc_data_0_ready_i,
+        LOOP_COUNT_0,
+        dut.stream2acc_data_0_bits_o,
+    )
 
-        # Streamed data should be consistent
-        snax_util.comp_and_assert(wide_writer_golden_list[i], read_stream_0)
-        await snax_util.clock_and_wait(dut)
+    # Streamed data should be consistent
+    snax_util.comp_and_assert_list(
+        wide_writer_golden_list, read_list, "stream2acc_data_0"
+    )
 
     # reset the streamer
-    for _ in range(10):
-        await snax_util.clock_and_wait(dut)
+    await snax_util.wait_cycles(dut, 10)
     dut.rst_ni.value = 0
     await snax_util.clock_and_wait(dut)
     await snax_util.clock_and_wait(dut)
     dut.rst_ni.value = 1
-    for _ in range(10):
-        await snax_util.clock_and_wait(dut)
+    await snax_util.wait_cycles(dut, 10)
 
     cocotb.log.info("Writer-reader test - with data contention and read stalling")
 
-    # Set number of iterations
-    await snax_util.reg_write(dut, CSR_LOOP_COUNT_0, LOOP_COUNT_0)
-
-    # Set spatial strides to 32 banks such that all of the read/writes will
-    # result in bank conflicts
-    await snax_util.reg_write(dut, CSR_SPATIAL_STRIDE_0, 256)
-    await snax_util.reg_write(dut, CSR_SPATIAL_STRIDE_1, 256)
-    await snax_util.reg_write(dut, CSR_SPATIAL_STRIDE_2, 256)
-
-    # Set temporal to just 1 bank
-    await snax_util.reg_write(dut, CSR_TEMPORAL_STRIDE_0, 8)
-    await snax_util.reg_write(dut, CSR_TEMPORAL_STRIDE_1, 8)
-    await snax_util.reg_write(dut, CSR_TEMPORAL_STRIDE_2, 8)
-
-    # Set base pointers
-    await snax_util.reg_write(dut, CSR_BASE_PTR_0, BASE_PTR_0)
-    await snax_util.reg_write(dut, CSR_BASE_PTR_1, BASE_PTR_1)
-    await snax_util.reg_write(dut, CSR_BASE_PTR_2, BASE_PTR_2)
+    # Set spatial strides to all banks such that all of the read/writes will
+    # result in bank conflicts, and the temporal strides to just 1 bank
+    await snax_util.csr_program(
+        dut,
+        CSR_MAP,
+        {
+            "LOOP_COUNT_0": LOOP_COUNT_0,
+            "TEMPORAL_STRIDE_0": 8,
+            "TEMPORAL_STRIDE_1": 8,
+            "TEMPORAL_STRIDE_2": 8,
+            "SPATIAL_STRIDE_0": NR_BANKS * BANK_INCREMENT,
+            "SPATIAL_STRIDE_1": NR_BANKS * BANK_INCREMENT,
+            "SPATIAL_STRIDE_2": NR_BANKS * BANK_INCREMENT,
+            "BASE_PTR_0": BASE_PTR_0,
+            "BASE_PTR_1": BASE_PTR_1,
+            "BASE_PTR_2": BASE_PTR_2,
+        },
+        verify=False,
+    )
 
-    # Write a 1 to CSR_START_STREAMER CSR
+    # Write a 1 to START_STREAMER CSR
     # address to activate the streamer
-    await snax_util.reg_write(dut, CSR_START_STREAMER, 1)
+    await snax_util.reg_write(dut, CSR_MAP["START_STREAMER"], 1)
     await snax_util.reg_clr(dut)
 
     # allow the reader to run in background
@@ -422,12 +484,10 @@ async def stream_tcdm_dut(dut):
         dut.acc2stream_data_0_bits_i.value = wide_writer_golden_list[i]
         dut.acc2stream_data_0_valid_i.value = 1
 
-        # Check if signal_ready is high, wait if not
-        await Timer(Decimal(1), units="ps")
-        while dut.acc2stream_data_0_ready_o.value != 1:
-            await snax_util.clock_and_wait(dut)
-
-        await snax_util.clock_and_wait(dut)
+        # Wait until the writer accepts the data
+        await snax_util.wait_handshake(
+            dut, dut.acc2stream_data_0_valid_i, dut.acc2stream_data_0_ready_o
+        )
 
     # Clear step to avoid overwriting
     dut.acc2stream_data_0_bits_i.value = 0
@@ -437,19 +497,24 @@ async def stream_tcdm_dut(dut):
     ## process reading data from streamers to finish operation
 
     # wait for finish
-    await with_timeout(snax_util.reg_write(dut, CSR_START_STREAMER, 0), 100, "ns")
+    await with_timeout(
+        snax_util.reg_write(dut, CSR_MAP["START_STREAMER"], 0), 100, "ns"
+    )
     await snax_util.reg_clr(dut)
 
     # clear read buffers
-    for _ in range(5):
-        await snax_util.clock_and_wait(dut)
+    await snax_util.wait_until_idle(
+        dut,
+        [dut.stream2acc_data_0_valid_o, dut.stream2acc_data_1_valid_o],
+        100,
+    )
 
     dut.stream2acc_data_0_ready_i.value = 0
     dut.stream2acc_data_1_ready_i.value = 0
     await snax_util.clock_and_wait(dut)
 
     # Start streamer again
-    await snax_util.reg_write(dut, CSR_START_STREAMER, 1)
+    await snax_util.reg_write(dut, CSR_MAP["START_STREAMER"], 1)
     await snax_util.reg_clr(dut)
 
     # Wait for the rising edge of the valid
@@ -458,43 +523,178 @@ async def stream_tcdm_dut(dut):
     # Necessary for cocotb evaluation step
     await Timer(Decimal(1), units="ps")
 
+    read_list = []
     for i in range(LOOP_COUNT_0):
         # ## test the fifos: only get 1 element from the fifo
         # ## every 10 cycles
         dut.stream2acc_data_0_ready_i.value = 0
         dut.stream2acc_data_1_ready_i.value = 0
-        for j in range(10):
-            await snax_util.clock_and_wait(dut)
+        await snax_util.wait_cycles(dut, 10)
         dut.stream2acc_data_0_ready_i.value = 1
         dut.stream2acc_data_1_ready_i.value = 1
 
-        # Check if signal_valid is high, wait if not
-        await Timer(Decimal(1), units="ps")
-        while dut.stream2acc_data_0_valid_o.value != 1:
-            await snax_util.clock_and_wait(dut)
-
         # Extract the data
-        read_stream_0 = int(dut.stream2acc_data_0_bits_o.value)
+        read_stream_0 = await snax_util.wait_handshake(
+            dut,
+            dut.stream2acc_data_0_valid_o,
+            dut.stream2acc_data_0_ready_i,
+            dut.stream2acc_data_0_bits_o,
+        )
+        read_list.append(read_stream_0)
+
+    # Streamed data should be consistent
+    snax_util.comp_and_assert_list(
+        wide_writer_golden_list, read_list, "stream2acc_data_0"
+    )
 
-        # Streamed data should be consistent
-        snax_util.comp_and_assert(wide_writer_golden_list[i], read_stream_0)
-        await snax_util.clock_and_wait(dut)
+    perf.write_json()
+    wave_window.stop()
 
 
-# Main test run
-def test_stream_tcdm(simulator, waves):
-    repo_path = os.getcwd()
-    tests_path = repo_path + "/tests/cocotb/"
+# Feeds the beats of one writer of the streamer
+async def drive_writer(dut, idx: int, data_list: List[int]) -> None:
+    bits = getattr(dut, f"acc2stream_data_{idx}_bits_i")
+    valid = getattr(dut, f"acc2stream_data_{idx}_valid_i")
+    ready = getattr(dut, f"acc2stream_data_{idx}_ready_o")
+
+    for data in data_list:
+        bits.value = data
+        valid.value = 1
+        await snax_util.wait_handshake(dut, valid, ready)
+
+    bits.value = 0
+    valid.value = 0
+    return
+
+
+# Runs one random stimulus on a streamer that is already running
+# The touched TCDM words are preloaded through the backdoor,
+# the readers are checked while they stream and the words
+# of the writers are checked once the streamer is done.
+async def run_stream_stimulus(dut, stim: snax_stim.StreamerStimulus) -> None:
+    timeout_ns = 200 * stim.num_beats() + 1000
+
+    snax_util.tcdm_backdoor_scatter(dut, stim.mem_addrs, stim.mem_words)
+    await snax_util.csr_program(dut, CSR_MAP, stim.values)
+
+    reader_checks = [
+        snax_util.start_stream_check(
+            dut,
+            getattr(dut, f"stream2acc_data_{idx}_bits_o"),
+            getattr(dut, f"stream2acc_data_{idx}_valid_o"),
+            getattr(dut, f"stream2acc_data_{idx}_ready_i"),
+            data_list,
+            f"stream2acc_data_{idx}",
+        )
+        for idx, data_list in enumerate(stim.reader_data)
+    ]
+
+    # The run is done once the writers stored
+    # every element of the beats they were fed
+    num_reader = len(stim.reader_data)
+    writer_ports = AGU_MODEL.tcdm_ports[num_reader:]
+    first_writer_port = sum(AGU_MODEL.tcdm_ports[:num_reader])
+    writer_writes = cocotb.start_soon(
+        snax_util.wait_tcdm_writes(
+            dut,
+            dut.mon_tcdm_req_q_valid_o,
+            dut.mon_tcdm_rsp_q_ready_i,
+            dut.mon_tcdm_req_write_o,
+            list(range(first_writer_port, first_writer_port + sum(writer_ports))),
+            sum(
+                len(data_list) * num_ports
+                for data_list, num_ports in zip(stim.writer_data, writer_ports)
+            ),
+        )
+    )
+
+    await snax_util.reg_write(dut, CSR_MAP["START_STREAMER"], 1)
+    await snax_util.reg_clr(dut)
+
+    writers = [
+        cocotb.start_soon(drive_writer(dut, idx, data_list))
+        for idx, data_list in enumerate(stim.writer_data)
+    ]
+
+    for reader_check in reader_checks:
+        await with_timeout(reader_check.wait_done(), timeout_ns, "ns")
+    for writer in writers:
+        await with_timeout(writer.join(), timeout_ns, "ns")
+    await with_timeout(writer_writes.join(), timeout_ns, "ns")
+
+    for reader_check in reader_checks:
+        reader_check.monitor.stop()
+        reader_check.check()
+
+    mem_words = snax_util.tcdm_backdoor_gather(dut, stim.mem_addrs)
+    snax_util.comp_and_assert_list(stim.golden_mem_words, mem_words, "tcdm")
+
+    return
+
+
+@cocotb.test()
+async def stream_tcdm_random_dut(dut):
+    # Start clock
+    clock = Clock(dut.clk_i, 10, units="ns")
+    cocotb.start_soon(clock.start())
+
+    dut.rst_ni.value = 0
+    dut.io_csr_rsp_ready_i.value = 1
+    dut.acc2stream_data_0_bits_i.value = 0
+    dut.acc2stream_data_0_valid_i.value = 0
+    dut.stream2acc_data_0_ready_i.value = 1
+    dut.stream2acc_data_1_ready_i.value = 1
+    dut.tcdm_dma_req_write_i.value = 0
+    dut.tcdm_dma_req_addr_i.value = 0
+    dut.tcdm_dma_req_data_i.value = 0
+    dut.tcdm_dma_req_strb_i.value = 0
+    dut.tcdm_dma_req_q_valid_i.value = 0
+
+    await snax_util.clock_and_wait(dut)
+    await snax_util.reset_dut(dut)
+
+    # All configurations run on the same model
+    # one after the other, only reset once above
+    stim_gen = snax_stim.StreamerStimGen(seed=RANDOM_SEED)
+
+    # Only dumped when a configuration fails
+    wave_window = snax_util.WaveWindow(dut, "stream_tcdm_random").start()
+    cocotb.log.info(
+        f"Run {NUM_RANDOM_CFGS} random configurations with seed {RANDOM_SEED}"
+    )
+
+    for index in range(NUM_RANDOM_CFGS):
+        stim = stim_gen.gen(index)
+        cocotb.log.debug(f"Random configuration {index}: {stim.values}")
+        try:
+            await run_stream_stimulus(dut, stim)
+        except (AssertionError, SimTimeoutError):
+            # Mismatches already dumped the window, timeouts
+            # and missing beats have to dump it here
+            if not wave_window.dump_files:
+                wave_window.trigger(f"random configuration {index} failed")
+            cocotb.log.error(
+                f"Random configuration {index} of seed {RANDOM_SEED} "
+                f"failed: {stim.values}"
+            )
+            raise
+
+    wave_window.stop()
+
+
+# Simulation sources and arguments of the testbench
+def gen_sim_args(simulator: str) -> Dict:
+    gen_rtl_path = snax_util.GEN_RTL_PATH
+    gen_tb_path = snax_util.GEN_TB_PATH
 
     # Make sure to generate the StreamerTop.sv
     # If it does not exist
-    stream_tcdm_tb_file = repo_path + "/tests/tb/tb_stream_tcdm_top.sv"
-    if not os.path.exists(stream_tcdm_tb_file):
-        subprocess.run(["make", stream_tcdm_tb_file])
+    stream_tcdm_tb_file = gen_tb_path + "/tb_stream_tcdm_top.sv"
+    snax_util.make_target(stream_tcdm_tb_file)
 
     streamer_verilog_sources = [
-        repo_path + "/rtl/StreamerTop.sv",
-        repo_path + "/rtl/streamer_wrapper.sv",
+        gen_rtl_path + "/StreamerTop.sv",
+        gen_rtl_path + "/streamer_wrapper.sv",
     ]
 
     # Extract TCDM components
@@ -513,10 +713,6 @@ def test_stream_tcdm(simulator, waves):
 
     toplevel = "tb_stream_tcdm_top"
 
-    module = "test_stream_tcdm"
-
-    sim_build = tests_path + "/sim_build/{}/".format(toplevel)
-
     if simulator == "verilator":
         compile_args = [
             "-Wno-LITENDIAN",
@@ -530,23 +726,28 @@ def test_stream_tcdm(simulator, waves):
             "-Wno-TIMESCALEMOD",
             "-Wno-fatal",
             "--no-timing",
-            "--trace",
-            "--trace-structs",
         ]
         timescale = None
     else:
         compile_args = None
         timescale = "1ns/1ps"
 
-    run(
-        verilog_sources=verilog_sources,
-        includes=includes,
-        toplevel=toplevel,
-        defines=defines,
-        module=module,
+    return {
+        "verilog_sources": verilog_sources,
+        "includes": includes,
+        "defines": defines,
+        "toplevel": toplevel,
+        "compile_args": compile_args,
+        "timescale": timescale,
+    }
+
+
+# Main test run
+def test_stream_tcdm(simulator, waves, sim_run_dir):
+    snax_util.run_sim(
+        module="test_stream_tcdm",
         simulator=simulator,
-        sim_build=sim_build,
-        compile_args=compile_args,
         waves=waves,
-        timescale=timescale,
+        run_dir=sim_run_dir,
+        **gen_sim_args(simulator),
     )
@@ -7,13 +7,16 @@
 # Description:
 # This tests the basic read and write funtcionality for each
 # input port and checks if we can read/write data into the TCDM
+# It also loads and checks memory images through the DMA port
+# and through the backdoor
 # ---------------------------------
 
 import cocotb
 from cocotb.clock import Clock
-from cocotb_test.simulator import run
 import pytest
 import snax_util
+from typing import Dict
+import json
 import math
 
 # Configurable design time parameters
@@ -94,6 +97,14 @@ async def tcdm_subsys_dut(dut):
 
     await snax_util.clock_and_wait(dut)
 
+    # Record the throughput of the narrow and wide ports
+    perf = (
+        snax_util.PerfRecorder(dut, "tcdm_subsys")
+        .add_ports("tcdm", dut.tcdm_req_q_valid_i, dut.tcdm_rsp_q_ready_o, NUM_INPUT)
+        .add("tcdm_dma", dut.tcdm_dma_req_q_valid_i, dut.tcdm_dma_rsp_q_ready_o)
+        .start()
+    )
+
     # Begin test
     cocotb.log.info(" ------------------------------------------ ")
     cocotb.log.info(" Testing for TCDM request and response ports")
@@ -101,26 +112,16 @@ async def tcdm_subsys_dut(dut):
     for i in range(NUM_INPUT):
         golden_list = snax_util.gen_rand_int_list(NUM_NARROW_TESTS, MIN_VAL, MAX_VAL)
 
-        # Cycle through values that change
-        # Per item or element
-        # Explicitly write the control signals
-        for j in range(NUM_NARROW_TESTS):
-            await snax_util.tcdm_write(dut, i, int(j * BANK_INCREMENT), golden_list[j])
-
-        # Clear default inputs for reading
-        await snax_util.tcdm_clr(dut, i)
+        # Burst the values through the port
+        # One element per cycle
+        await snax_util.tcdm_burst_write(dut, i, 0, golden_list)
 
-        # Cycle through reads
-        # And check immediately if result is correct
-        for j in range(NUM_NARROW_TESTS):
-            check_val = await snax_util.tcdm_read(dut, i, int(j * BANK_INCREMENT))
-            # Check for results
-            cocotb.log.info(f"Port {i} Actual output: {check_val}")
-            cocotb.log.info(f"Golden output: {golden_list[j]}")
-            assert check_val == golden_list[j]
-
-        # Clear default inputs for reading
-        await snax_util.tcdm_clr(dut, i)
+        # Burst the reads back
+        # And check if result is correct
+        check_list = await snax_util.tcdm_burst_read(dut, i, 0, NUM_NARROW_TESTS)
+        snax_util.comp_and_assert_list(
+            golden_list, check_list, f"tcdm_port_{i}", 0, BANK_INCREMENT
+        )
 
     cocotb.log.info(" ------------------------------------------ ")
     cocotb.log.info(" Wide TCDM tests for the DMA transfers")
@@ -132,50 +133,95 @@ async def tcdm_subsys_dut(dut):
     )
 
     # Write data to TCDM
-    for i in range(NUM_WIDE_TESTS):
-        await snax_util.wide_tcdm_write(
-            dut, i * WIDE_BANK_INCREMENT, wide_golden_list[i]
-        )
-        print(i * WIDE_BANK_INCREMENT)
-
-    # Write to clear
-    await snax_util.wide_tcdm_clr(dut)
+    await snax_util.wide_tcdm_burst_write(dut, 0, wide_golden_list)
 
     # Read data from TCDM
-    for i in range(NUM_WIDE_TESTS):
-        check_val = await snax_util.wide_tcdm_read(dut, int(i * WIDE_BANK_INCREMENT))
-        # Check for results
-        cocotb.log.info(f"Actual output: {check_val}")
-        cocotb.log.info(f"Golden output: {wide_golden_list[i]}")
-        assert check_val == wide_golden_list[i]
+    check_list = await snax_util.wide_tcdm_burst_read(dut, 0, NUM_WIDE_TESTS)
+    snax_util.comp_and_assert_list(
+        wide_golden_list, check_list, "tcdm_dma", 0, WIDE_BANK_INCREMENT
+    )
 
+    perf.write_json()
 
-# Main test run
-@pytest.mark.parametrize(
-    "parameters",
-    [
-        {
-            "NarrowDataWidth": str(NARROW_DATA_WIDTH),
-            "WideDataWidth": str(WIDE_DATA_WIDTH),
-            "TCDMDepth": str(TCDM_DEPTH),
-            "NrBanks": str(NR_BANKS),
-            "NumInp": str(NUM_INPUT),
-        }
-    ],
-)
-def test_tcdm_subsys(parameters, simulator):
-    tests_path = "./tests/cocotb/"
 
+@cocotb.test()
+async def tcdm_mem_image_dut(dut):
+    clock = Clock(dut.clk_i, 10, units="ns")
+    cocotb.start_soon(clock.start())
+
+    dut.rst_ni.value = 0
+    for i in range(NUM_INPUT):
+        dut.tcdm_req_q_valid_i[i].value = 0
+    dut.tcdm_dma_req_write_i.value = 0
+    dut.tcdm_dma_req_addr_i.value = 0
+    dut.tcdm_dma_req_data_i.value = 0
+    dut.tcdm_dma_req_strb_i.value = 0
+    dut.tcdm_dma_req_q_valid_i.value = 0
+
+    await snax_util.clock_and_wait(dut)
+    await snax_util.reset_dut(dut)
+
+    # The image fills the upper half of the memory
+    # and is memory-mapped back from the run directory
+    num_words = NUM_WIDE_TESTS // 2
+    base_addr = TCDM_SIZE // 2
+    golden_words = snax_util.gen_rand_words(
+        num_words, WIDE_MIN_VAL, WIDE_MAX_VAL, WIDE_DATA_WIDTH
+    )
+    snax_util.save_mem_image(
+        "tcdm_image.json", golden_words, WIDE_DATA_WIDTH, base_addr
+    )
+    image = snax_util.load_mem_image("tcdm_image.json")
+
+    cocotb.log.info("Memory image through the DMA port")
+    await snax_util.mem_image_load(dut, image)
+    await snax_util.mem_image_check(dut, image, backdoor=True, name="tcdm_image")
+
+    cocotb.log.info("Memory image through the backdoor")
+    snax_util.save_mem_image(
+        "tcdm_image_inv.json", 255 - golden_words, WIDE_DATA_WIDTH, base_addr
+    )
+    inv_image = snax_util.load_mem_image("tcdm_image_inv.json")
+    await snax_util.mem_image_load(dut, inv_image, backdoor=True)
+    await snax_util.mem_image_check(dut, inv_image, name="tcdm_image_inv")
+
+    # A header alone replays a section of an existing binary,
+    # here the narrow words of the second half of the image
+    cocotb.log.info("Narrow section of the memory image")
+    section_offset = inv_image.num_bytes // 2
+    with open("tcdm_section.json", "w") as f:
+        json.dump(
+            {
+                "version": snax_util.MEM_IMAGE_VERSION,
+                "data_file": "tcdm_image_inv.bin",
+                "base_addr": base_addr + section_offset,
+                "word_width": NARROW_DATA_WIDTH,
+                "offset": section_offset,
+            },
+            f,
+        )
+    section = snax_util.load_mem_image("tcdm_section.json")
+    await snax_util.mem_image_check(dut, section, backdoor=True, name="tcdm_section")
+
+
+# Design time parameters of the testbench
+TCDM_PARAMETERS = {
+    "NarrowDataWidth": str(NARROW_DATA_WIDTH),
+    "WideDataWidth": str(WIDE_DATA_WIDTH),
+    "TCDMDepth": str(TCDM_DEPTH),
+    "NrBanks": str(NR_BANKS),
+    "NumInp": str(NUM_INPUT),
+}
+
+
+# Simulation sources and arguments of the testbench
+def gen_sim_args(simulator: str) -> Dict:
     defines = []
 
     includes, verilog_sources = snax_util.extract_tcdm_list()
 
     toplevel = "tb_tcdm_subsys"
 
-    module = "test_tcdm_subsys"
-
-    sim_build = tests_path + "/sim_build/{}/".format(toplevel)
-
     if simulator == "verilator":
         compile_args = [
             "-Wno-LITENDIAN",
@@ -189,23 +235,30 @@ def test_tcdm_subsys(parameters, simulator):
             "-Wno-TIMESCALEMOD",
             "-Wno-fatal",
             "--no-timing",
-            "--trace",
-            "--trace-structs",
         ]
         timescale = None
     else:
         compile_args = None
         timescale = "1ns/1ps"
 
-    run(
-        verilog_sources=verilog_sources,
-        includes=includes,
-        toplevel=toplevel,
-        defines=defines,
-        module=module,
+    return {
+        "verilog_sources": verilog_sources,
+        "includes": includes,
+        "defines": defines,
+        "toplevel": toplevel,
+        "compile_args": compile_args,
+        "timescale": timescale,
+    }
+
+
+# Main test run
+@pytest.mark.parametrize("parameters", [TCDM_PARAMETERS])
+def test_tcdm_subsys(parameters, simulator, waves, sim_run_dir):
+    snax_util.run_sim(
+        module="test_tcdm_subsys",
         simulator=simulator,
-        sim_build=sim_build,
-        compile_args=compile_args,
-        timescale=timescale,
+        run_dir=sim_run_dir,
         parameters=parameters,
+        waves=waves,
+        **gen_sim_args(simulator),
     )
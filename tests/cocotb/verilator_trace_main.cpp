@@ -0,0 +1,170 @@
+// Copyright cocotb contributors
+// Licensed under the Revised BSD License, see LICENSE for details.
+// SPDX-License-Identifier: BSD-3-Clause
+//
+// Verilator main of cocotb 1.8 with trace control for windowed waveforms.
+// The model is built with --trace, but nothing is dumped until cocotb
+// opens a trace file through snax_trace_open(). The trace control
+// functions are exported with -rdynamic so snax_util.WaveWindow can
+// call them through ctypes from the simulator process.
+
+#include <memory>
+
+#include "Vtop.h"
+#include "verilated.h"
+#include "verilated_vpi.h"
+
+#if !VM_TRACE || VM_TRACE_FST
+#error "Windowed waveforms need a model built with --trace (VCD)"
+#endif
+
+#include <verilated_vcd_c.h>
+
+static vluint64_t main_time = 0;  // Current simulation time
+
+double sc_time_stamp() {  // Called by $time in Verilog
+    return main_time;     // converts to double, to match
+                          // what SystemC does
+}
+
+extern "C" {
+void vlog_startup_routines_bootstrap(void);
+}
+
+// A VCD trace can be closed and opened again on another file,
+// the signals and their identifiers stay the same
+static std::unique_ptr<VerilatedVcdC> tfp;
+
+// Close the open trace file, if any, and dump into filename from
+// the current time step on. Returns 1 when the file is open.
+extern "C" int snax_trace_open(const char* filename) {
+    if (tfp->isOpen()) {
+        tfp->close();
+    }
+    tfp->open(filename);
+    return tfp->isOpen() ? 1 : 0;
+}
+
+extern "C" void snax_trace_flush(void) {
+    if (tfp->isOpen()) {
+        tfp->flush();
+    }
+}
+
+extern "C" void snax_trace_close(void) {
+    if (tfp->isOpen()) {
+        tfp->close();
+    }
+}
+
+static inline bool settle_value_callbacks() {
+    bool cbs_called, again;
+
+    // Call Value Change callbacks
+    // These can modify signal values so we loop
+    // until there are no more changes
+    cbs_called = again = VerilatedVpi::callValueCbs();
+    while (again) {
+        again = VerilatedVpi::callValueCbs();
+    }
+
+    return cbs_called;
+}
+
+int main(int argc, char** argv) {
+    Verilated::commandArgs(argc, argv);
+#ifdef VERILATOR_SIM_DEBUG
+    Verilated::debug(99);
+#endif
+    std::unique_ptr<Vtop> top(new Vtop(""));
+    Verilated::fatalOnVpiError(false);  // otherwise it will fail on systemtf
+
+#ifdef VERILATOR_SIM_DEBUG
+    Verilated::internalsDump();
+#endif
+
+    // The trace is attached before cocotb starts,
+    // it is only opened by snax_trace_open()
+    Verilated::traceEverOn(true);
+    tfp.reset(new VerilatedVcdC);
+    top->trace(tfp.get(), 99);
+
+    vlog_startup_routines_bootstrap();
+    VerilatedVpi::callCbs(cbStartOfSimulation);
+
+    while (!Verilated::gotFinish()) {
+        // Call registered timed callbacks (e.g. clock timer)
+        // These are called at the beginning of the time step
+        // before the iterative regions (IEEE 1800-2012 4.4.1)
+        VerilatedVpi::callTimedCbs();
+
+        // Call Value Change callbacks triggered by Timer callbacks
+        // These can modify signal values
+        settle_value_callbacks();
+
+        // We must evaluate whole design until we process all 'events'
+        bool again = true;
+        while (again) {
+            // Evaluate design
+            top->eval_step();
+
+            // Call Value Change callbacks triggered by eval()
+            // These can modify signal values
+            again = settle_value_callbacks();
+
+            // Call registered ReadWrite callbacks
+            again |= VerilatedVpi::callCbs(cbReadWriteSynch);
+
+            // Call Value Change callbacks triggered by ReadWrite callbacks
+            // These can modify signal values
+            again |= settle_value_callbacks();
+        }
+        top->eval_end_step();
+
+        // Call ReadOnly callbacks
+        VerilatedVpi::callCbs(cbReadOnlySynch);
+
+        if (tfp->isOpen()) {
+            tfp->dump(main_time);
+        }
+
+        // cocotb controls the clock inputs using cbAfterDelay so
+        // skip ahead to the next registered callback
+        const vluint64_t NO_TOP_EVENTS_PENDING = static_cast<vluint64_t>(~0ULL);
+        vluint64_t next_time_cocotb = VerilatedVpi::cbNextDeadline();
+        vluint64_t next_time_timing =
+            top->eventsPending() ? top->nextTimeSlot() : NO_TOP_EVENTS_PENDING;
+        vluint64_t next_time = std::min(next_time_cocotb, next_time_timing);
+
+        // If there are no more cbAfterDelay callbacks,
+        // the next deadline is max value, so end the simulation now
+        if (next_time == NO_TOP_EVENTS_PENDING) {
+            break;
+        } else {
+            main_time = next_time;
+        }
+
+        // Call registered NextSimTime
+        // It should be called in simulation cycle before everything else
+        // but not on first cycle
+        VerilatedVpi::callCbs(cbNextSimTime);
+
+        // Call Value Change callbacks triggered by NextTimeStep callbacks
+        // These can modify signal values
+        settle_value_callbacks();
+    }
+
+    VerilatedVpi::callCbs(cbEndOfSimulation);
+
+    top->final();
+
+    snax_trace_close();
+
+// VM_COVERAGE is a define which is set if Verilator is
+// instructed to collect coverage (when compiling the simulation)
+#if VM_COVERAGE
+    VerilatedCov::write("coverage.dat");
+#endif
+
+    return 0;
+}
@@ -0,0 +1,150 @@
+from typing import Optional
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+
+# Generated StreamerTop.sv files are kept here
+# with one directory per streamer configuration
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+CACHE_DIR = os.path.join(REPO_PATH, ".snax_cache", "streamer_top")
+
+# Location of the rendered parameter file in the snax-streamer checkout
+SCALA_PARAM_PATH = "src/main/scala/streamer/StreamParamGen.scala"
+
+
+# Revision of the snax-streamer checkout
+# Local changes besides the rendered parameter file
+# are part of the revision so they never hit stale entries
+def get_streamer_rev(streamer_path: str) -> Optional[str]:
+    try:
+        rev = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=streamer_path,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        diff = subprocess.run(
+            ["git", "diff", "HEAD", "--", ".", f":!{SCALA_PARAM_PATH}"],
+            cwd=streamer_path,
+            capture_output=True,
+            check=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    if diff:
+        rev += "-" + hashlib.sha256(diff).hexdigest()[:16]
+    return rev
+
+
+# Cache key of a StreamerTop.sv
+# The rendered parameter file holds the whole streamer configuration
+def get_cache_key(scala_path: str, streamer_path: str) -> Optional[str]:
+    rev = get_streamer_rev(streamer_path)
+    if rev is None:
+        return None
+
+    sha = hashlib.sha256(rev.encode("utf-8"))
+    with open(scala_path, "rb") as f:
+        sha.update(f.read())
+    return sha.hexdigest()
+
+
+# Copy the cached StreamerTop.sv to the output
+# The output is only written when its content changed
+# Returns False when the configuration is not cached
+def restore(cache_dir: str, key: str, out_path: str) -> bool:
+    cached_file = os.path.join(cache_dir, key, os.path.basename(out_path))
+    if not os.path.exists(cached_file):
+        return False
+
+    if os.path.exists(out_path):
+        with open(cached_file, "rb") as cachedf, open(out_path, "rb") as outf:
+            if cachedf.read() == outf.read():
+                return True
+
+    shutil.copyfile(cached_file, out_path + ".tmp")
+    os.replace(out_path + ".tmp", out_path)
+    return True
+
+
+# Store a freshly generated StreamerTop.sv
+# The entry directory is renamed into place so concurrent
+# runs never see a partially written entry
+def store(cache_dir: str, key: str, out_path: str, rev: str) -> None:
+    entry_dir = os.path.join(cache_dir, key)
+    if os.path.exists(entry_dir):
+        return
+
+    tmp_dir = f"{entry_dir}.{os.getpid()}.tmp"
+    os.makedirs(tmp_dir)
+    shutil.copyfile(out_path, os.path.join(tmp_dir, os.path.basename(out_path)))
+    with open(os.path.join(tmp_dir, "info.json"), "w") as f:
+        json.dump({"streamer_rev": rev}, f, indent=2)
+
+    try:
+        os.rename(tmp_dir, entry_dir)
+    except OSError:
+        shutil.rmtree(tmp_dir)
+    return
+
+
+# Main function run and parsing
+def main():
+    # Parse all arguments
+    parser = argparse.ArgumentParser(
+        description="Cache of the StreamerTop.sv generated by snax-streamer. \
+            Entries are keyed on the rendered StreamParamGen.scala \
+            and the revision of snax-streamer."
+    )
+    parser.add_argument(
+        "action",
+        choices=["restore", "store"],
+        help="Restores the output from the cache or stores it in the cache",
+    )
+    parser.add_argument(
+        "--streamer_path",
+        type=str,
+        default="./",
+        help="Points to the snax-streamer checkout",
+    )
+    parser.add_argument(
+        "--out_path",
+        type=str,
+        default="./StreamerTop.sv",
+        help="Points to the generated StreamerTop.sv",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        default=CACHE_DIR,
+        help="Points to the cache directory",
+    )
+
+    # Get the list of parsing
+    args = parser.parse_args()
+
+    scala_path = os.path.join(args.streamer_path, SCALA_PARAM_PATH)
+    key = get_cache_key(scala_path, args.streamer_path)
+
+    # A restore that fails exits with an error
+    # so the caller falls back to generating the file
+    if key is None:
+        print("Cache disabled: snax-streamer revision is unknown")
+        if args.action == "restore":
+            raise SystemExit(1)
+    elif args.action == "restore":
+        if not restore(args.cache_dir, key, args.out_path):
+            print(f"Cache miss: {args.out_path}")
+            raise SystemExit(1)
+        print(f"Restores output from cache: {args.out_path}")
+    else:
+        store(args.cache_dir, key, args.out_path, get_streamer_rev(args.streamer_path))
+
+
+if __name__ == "__main__":
+    main()
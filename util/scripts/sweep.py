@@ -0,0 +1,330 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import xml.etree.ElementTree as ET
+import argparse
+import csv
+import glob
+import hashlib
+import hjson
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+
+# Every sweep point gets its own directory with its rendered
+# configuration, generated files and simulation results
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+CFG_FILE = os.path.join(REPO_PATH, "util", "cfg", "streamer_cfg.hjson")
+OUT_DIR = os.path.join(REPO_PATH, "tests", "cocotb", "sim_build", "sweep")
+TESTS = ["tests/cocotb/test_benchmark.py::test_bench_stream_tcdm"]
+
+# Parameters the benchmarks follow, with their indices
+# The stream_tcdm benchmark derives its port counts and spatial
+# unrolling from the configuration, the functional tests and the
+# stream_alu benchmark only run on the default data movers
+SWEEP_PARAMS = [
+    "fifoReaderParams.fifoDepth",
+    "fifoWriterParams.fifoDepth",
+    "dataReaderParams.tcdmPortsNum",
+    "dataReaderParams.spatialBounds",
+    "dataWriterParams.tcdmPortsNum",
+    "dataWriterParams.spatialBounds",
+    "numBanks",
+    "tcdmDepth",
+]
+
+
+# Extract json file
+def get_config(cfg_path: str) -> Dict:
+    with open(cfg_path, "r") as jsonf:
+        return hjson.loads(jsonf.read())
+
+
+# Read the parameter grid of a sweep specification
+# The specification maps parameter paths to the swept values:
+#   {grid: {fifoReaderParams.fifoDepth: [[2, 2], [4, 4]]}}
+def get_grid(spec_path: str) -> Dict[str, List]:
+    with open(spec_path, "r") as specf:
+        return dict(hjson.loads(specf.read())["grid"])
+
+
+# All combinations of the grid values
+def gen_grid_points(grid: Dict[str, List]) -> List[Dict]:
+    names = list(grid)
+    return [
+        dict(zip(names, values))
+        for values in itertools.product(*[grid[name] for name in names])
+    ]
+
+
+# Set a parameter given by its dotted path,
+# e.g., numBanks or fifoReaderParams.fifoDepth.0
+def set_param(cfg: Dict, path: str, value) -> None:
+    keys = [int(key) if key.isdigit() else key for key in path.split(".")]
+    node = cfg
+    for key in keys[:-1]:
+        node = node[key]
+
+    if isinstance(node, dict) and keys[-1] not in node:
+        raise Exception(f"Unknown streamer parameter {path}")
+    node[keys[-1]] = value
+    return
+
+
+# Check that the tests follow a swept parameter
+def is_sweep_param(path: str) -> bool:
+    return any(path == param or path.startswith(param + ".") for param in SWEEP_PARAMS)
+
+
+# Parameters that follow the port counts of the data movers,
+# unless they are swept themselves: the spatial unrolling over
+# all ports of a mover and the FIFO width of its elements
+def derive_params(cfg: Dict, point: Dict) -> None:
+    for mover_params, fifo_params in [
+        ("dataReaderParams", "fifoReaderParams"),
+        ("dataWriterParams", "fifoWriterParams"),
+    ]:
+        if not any(path.startswith(f"{mover_params}.tcdmPortsNum") for path in point):
+            continue
+
+        ports = cfg[mover_params]["tcdmPortsNum"]
+        if not any(path.startswith(f"{mover_params}.spatialBounds") for path in point):
+            cfg[mover_params]["spatialBounds"] = [[num_ports] for num_ports in ports]
+            cfg[mover_params]["spatialDim"] = [1] * len(ports)
+        if not any(path.startswith(f"{fifo_params}.fifoWidth") for path in point):
+            cfg[fifo_params]["fifoWidth"] = [
+                num_ports * width
+                for num_ports, width in zip(ports, cfg[mover_params]["elementWidth"])
+            ]
+    return
+
+
+# Configuration of a sweep point and its key
+# Points with the same configuration share the key
+def gen_point_cfg(base_cfg: Dict, point: Dict) -> Tuple[str, Dict]:
+    cfg = json.loads(json.dumps(base_cfg))
+    for path, value in point.items():
+        set_param(cfg, path, value)
+    derive_params(cfg, point)
+
+    cfg_str = json.dumps(cfg, sort_keys=True)
+    return hashlib.sha256(cfg_str.encode("utf-8")).hexdigest()[:12], cfg
+
+
+# Results of the cocotb tests of a point
+# Pass/fail comes from the merged results.xml, the metrics from
+# the benchmark and performance summaries of each run.
+# A point passes when its tests ran and none of them failed.
+def get_point_results(sim_out_path: str) -> Dict:
+    results = {"status": "fail", "passed": 0, "failed": 0}
+
+    results_file = os.path.join(sim_out_path, "results.xml")
+    if os.path.isfile(results_file):
+        for testcase in ET.parse(results_file).getroot().iter("testcase"):
+            if testcase.find("skipped") is not None:
+                continue
+            failed = testcase.find("failure") is not None
+            failed |= testcase.find("error") is not None
+            results["failed" if failed else "passed"] += 1
+    if results["passed"] > 0 and results["failed"] == 0:
+        results["status"] = "pass"
+
+    run_files = sorted(glob.glob(os.path.join(sim_out_path, "runs", "*", "*.json")))
+    for run_file in run_files:
+        with open(run_file, "r") as f:
+            summary = json.load(f)
+
+        if run_file.endswith(".bench.json"):
+            for metric in ["dut_cycles", "wall_s_per_kcycle"]:
+                if metric in summary["metrics"]:
+                    results[f"{summary['name']}.{metric}"] = summary["metrics"][metric]
+        elif run_file.endswith(".perf.json"):
+            for port, port_summary in summary["ports"].items():
+                results[f"{summary['name']}.{port}.utilization"] = round(
+                    port_summary["utilization"], 4
+                )
+
+    return results
+
+
+# Render, generate, build and simulate one sweep point
+# Generation goes through the Makefile targets of the tests,
+# which are serialized across points since they share the
+# snax-streamer checkout. Builds are shared through the
+# content-keyed simulation build cache.
+# The benchmarks only record their metrics into a baseline
+# of the point, there is nothing to compare them with.
+def run_point(
+    point: Dict, key: str, cfg: Dict, out_dir: str, tests: List[str], simulator: str
+) -> Dict:
+    point_dir = os.path.join(out_dir, key)
+    os.makedirs(point_dir, exist_ok=True)
+
+    cfg_path = os.path.join(point_dir, "streamer_cfg.hjson")
+    with open(cfg_path, "w") as f:
+        hjson.dumpJSON(cfg, f, indent=2)
+
+    env = dict(os.environ)
+    env["SNAX_STREAMER_CFG"] = cfg_path
+    env["SNAX_GEN_PATH"] = point_dir
+    env["SNAX_SIM_OUT_PATH"] = os.path.join(point_dir, "sim")
+
+    cmd = [
+        sys.executable,
+        "-m",
+        "pytest",
+        *tests,
+        "-q",
+        "-p",
+        "no:cacheprovider",
+        "--benchmark",
+        "--update-baseline",
+        f"--baseline-file={os.path.join(point_dir, 'baseline.json')}",
+        "--perf",
+        f"--simulator={simulator}",
+    ]
+    with open(os.path.join(point_dir, "pytest.log"), "w") as log:
+        subprocess.run(
+            cmd, cwd=REPO_PATH, env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+
+    return {
+        "point": key,
+        **{path: json.dumps(value) for path, value in point.items()},
+        **get_point_results(env["SNAX_SIM_OUT_PATH"]),
+    }
+
+
+# Write the results of all points as one table
+def write_table(rows: List[Dict], out_path: str, sort_by: Optional[str]) -> None:
+    if sort_by is not None:
+        rows = sorted(rows, key=lambda row: row.get(sort_by, float("inf")))
+
+    columns = []
+    for row in rows:
+        columns += [column for column in row if column not in columns]
+
+    with open(out_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    table = [columns] + [
+        [str(row.get(column, "")) for column in columns] for row in rows
+    ]
+    widths = [max(len(line[i]) for line in table) for i in range(len(columns))]
+    for line in table:
+        print("  ".join(cell.ljust(width) for cell, width in zip(line, widths)))
+    print(f"Writes results: {out_path}")
+    return
+
+
+# Main function run and parsing
+def main():
+    # Parse all arguments
+    parser = argparse.ArgumentParser(
+        description="Design-space sweep over the streamer configuration. \
+            Each point is rendered, generated, built and simulated."
+    )
+    parser.add_argument(
+        "--cfg_path",
+        type=str,
+        default=CFG_FILE,
+        help="Points to the base configuration file",
+    )
+    parser.add_argument(
+        "--spec_path",
+        type=str,
+        default=None,
+        help="Points to the sweep specification with the parameter grid",
+    )
+    parser.add_argument(
+        "--param",
+        type=str,
+        nargs=2,
+        action="append",
+        default=[],
+        metavar=("PATH", "VALUES"),
+        help="Adds a parameter path and a JSON list of its values to the grid",
+    )
+    parser.add_argument(
+        "--samples",
+        type=int,
+        default=None,
+        help="Runs a random sample of this many grid points",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random sample")
+    parser.add_argument(
+        "--tests",
+        type=str,
+        nargs="+",
+        default=TESTS,
+        help="Pytest tests run for every point",
+    )
+    parser.add_argument(
+        "--simulator", type=str, default="verilator", help="Simulator used by cocotb"
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of points that run in parallel",
+    )
+    parser.add_argument(
+        "--sort_by",
+        type=str,
+        default=None,
+        help="Sorts the results table by this column",
+    )
+    parser.add_argument(
+        "--out_dir", type=str, default=OUT_DIR, help="Points to the output directory"
+    )
+
+    # Get the list of parsing
+    args = parser.parse_args()
+
+    grid = get_grid(args.spec_path) if args.spec_path is not None else {}
+    for path, values in args.param:
+        grid[path] = json.loads(values)
+    if not grid:
+        parser.error("no parameters to sweep, use --spec_path or --param")
+    unsupported = [path for path in grid if not is_sweep_param(path)]
+    if unsupported:
+        parser.error(
+            f"unsupported sweep parameters {', '.join(unsupported)}, "
+            f"the benchmarks only follow {', '.join(SWEEP_PARAMS)}"
+        )
+
+    points = gen_grid_points(grid)
+    if args.samples is not None and args.samples < len(points):
+        points = random.Random(args.seed).sample(points, args.samples)
+
+    # Points with the same configuration only run once
+    base_cfg = get_config(args.cfg_path)
+    point_cfgs = {}
+    for point in points:
+        key, cfg = gen_point_cfg(base_cfg, point)
+        point_cfgs.setdefault(key, (point, cfg))
+
+    # Keep the models of all points in the simulation build cache
+    os.environ.setdefault(
+        "SNAX_SIM_BUILD_CACHE_SIZE", str(max(8, len(point_cfgs) * len(args.tests)))
+    )
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = [
+            pool.submit(
+                run_point, point, key, cfg, args.out_dir, args.tests, args.simulator
+            )
+            for key, (point, cfg) in point_cfgs.items()
+        ]
+        rows = [future.result() for future in futures]
+
+    write_table(rows, os.path.join(args.out_dir, "results.csv"), args.sort_by)
+
+
+if __name__ == "__main__":
+    main()
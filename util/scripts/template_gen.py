@@ -1,10 +1,28 @@
 from mako.lookup import TemplateLookup
 from mako.template import Template
 from jsonref import JsonRef
+from typing import Dict, List, Optional, Tuple
 import hjson
+import hashlib
 import argparse
+import fcntl
+import json
 import os
 
+# Compiled templates are kept on disk between runs
+# so unchanged templates are not compiled again
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+MODULE_DIR = os.path.join(REPO_PATH, ".snax_cache", "mako")
+
+# Dependency manifest of the generated files
+# Each output records the hashes of its configuration and
+# template and its own hash. Keep in sync with snax_util.GEN_DEP_FILE
+DEP_FILE = os.path.join(REPO_PATH, ".snax_cache", "gen_deps.json")
+
+# Template lookups per template and module directory
+# so a batch compiles each template only once
+_TPL_LOOKUPS: Dict[Tuple[str, Optional[str]], TemplateLookup] = {}
+
 
 # Extract json file
 def get_config(cfg_path: str):
@@ -18,21 +36,156 @@ def get_config(cfg_path: str):
 
 
 # Read template
-def get_template(tpl_path: str) -> Template:
-    dir_name = os.path.dirname(tpl_path)
+# Templates of different directories get their own module
+# directory since Mako names the modules after the file name
+def get_template(tpl_path: str, module_dir: Optional[str] = None) -> Template:
+    dir_name = os.path.dirname(os.path.abspath(tpl_path))
     file_name = os.path.basename(tpl_path)
-    tpl_list = TemplateLookup(directories=[dir_name], output_encoding="utf-8")
-    tpl = tpl_list.get_template(file_name)
+
+    lookup_key = (dir_name, module_dir)
+    if lookup_key not in _TPL_LOOKUPS:
+        tpl_module_dir = None
+        if module_dir is not None:
+            dir_hash = hashlib.sha256(dir_name.encode("utf-8")).hexdigest()[:16]
+            tpl_module_dir = os.path.join(module_dir, dir_hash)
+        _TPL_LOOKUPS[lookup_key] = TemplateLookup(
+            directories=[dir_name],
+            output_encoding="utf-8",
+            module_directory=tpl_module_dir,
+        )
+
+    tpl = _TPL_LOOKUPS[lookup_key].get_template(file_name)
     return tpl
 
 
 # Generate file
-def gen_file(cfg, tpl, target_path: str) -> None:
+# The output is rendered in memory and only written when
+# its content changed, so the timestamp of an unchanged file
+# does not trigger the downstream rebuilds.
+# Returns True when the file is written
+def gen_file(cfg, tpl, target_path: str) -> bool:
+    content = str(tpl.render_unicode(cfg=cfg))
+
+    if os.path.exists(target_path):
+        with open(target_path, "r") as f:
+            if f.read() == content:
+                return False
+
     with open(target_path, "w") as f:
-        f.write(str(tpl.render_unicode(cfg=cfg)))
+        f.write(content)
+    return True
+
+
+# Hash of a file content
+def file_hash(file_path: str) -> str:
+    with open(file_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+# Read the dependency manifest
+# A missing or broken manifest is treated as empty
+def get_deps(dep_path: str) -> Dict:
+    try:
+        with open(dep_path, "r") as depf:
+            return json.load(depf)
+    except (OSError, ValueError):
+        return {}
+
+
+# Merge the entries into the dependency manifest
+# Parallel generators update the manifest one at a time
+def store_deps(dep_path: str, entries: Dict) -> None:
+    os.makedirs(os.path.dirname(dep_path), exist_ok=True)
+
+    with open(dep_path + ".lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            deps = get_deps(dep_path)
+            deps.update(entries)
+            tmp_path = f"{dep_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as depf:
+                json.dump(deps, depf, indent=2, sort_keys=True)
+            os.replace(tmp_path, dep_path)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
     return
 
 
+# Dependency entry of an output from its current files
+def gen_dep_entry(cfg_path: str, tpl_path: str, out_path: str) -> Dict:
+    return {
+        "inputs": {
+            os.path.abspath(cfg_path): file_hash(cfg_path),
+            os.path.abspath(tpl_path): file_hash(tpl_path),
+        },
+        "output": file_hash(out_path),
+    }
+
+
+# An output is up to date when neither its inputs
+# nor the output itself changed since it was generated
+def is_up_to_date(deps: Dict, cfg_path: str, tpl_path: str, out_path: str) -> bool:
+    entry = deps.get(os.path.abspath(out_path))
+    if entry is None or not os.path.exists(out_path):
+        return False
+
+    return entry == gen_dep_entry(cfg_path, tpl_path, out_path)
+
+
+# Read the (template, output) pairs of a manifest
+# The manifest is a list of {tpl_path: ..., out_path: ...}.
+# Environment variables in the paths are expanded and
+# relative paths are relative to the manifest file
+def get_manifest(manifest_path: str) -> List[Tuple[str, str]]:
+    with open(manifest_path, "r") as manifestf:
+        manifest = hjson.loads(manifestf.read())
+
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_path))
+    pairs = []
+    for entry in manifest:
+        tpl_path, out_path = [
+            os.path.join(manifest_dir, os.path.expandvars(entry[key]))
+            for key in ["tpl_path", "out_path"]
+        ]
+        pairs.append((tpl_path, out_path))
+
+    return pairs
+
+
+# Generate all (template, output) pairs from the same configuration
+# Pairs that are up to date according to the dependency manifest
+# are skipped, and the configuration is not even parsed when all are.
+# Returns the output files that were written
+def gen_batch(
+    cfg_path: str,
+    pairs: List[Tuple[str, str]],
+    module_dir: Optional[str] = MODULE_DIR,
+    dep_path: str = DEP_FILE,
+    force: bool = False,
+) -> List[str]:
+    deps = get_deps(dep_path)
+    stale_pairs = [
+        (tpl_path, out_path)
+        for tpl_path, out_path in pairs
+        if force or not is_up_to_date(deps, cfg_path, tpl_path, out_path)
+    ]
+    if not stale_pairs:
+        return []
+
+    cfg = get_config(cfg_path)
+    written = []
+    entries = {}
+    for tpl_path, out_path in stale_pairs:
+        tpl = get_template(tpl_path, module_dir)
+        if gen_file(cfg=cfg, tpl=tpl, target_path=out_path):
+            written.append(out_path)
+        entries[os.path.abspath(out_path)] = gen_dep_entry(cfg_path, tpl_path, out_path)
+
+    store_deps(dep_path, entries)
+    return written
+
+
 # Main function run and parsing
 def main():
     # Parse all arguments
@@ -52,14 +205,60 @@ def main():
     parser.add_argument(
         "--out_path", type=str, default="./", help="Points to the output directory"
     )
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        default=None,
+        help="Points to a manifest of template and output paths to generate",
+    )
+    parser.add_argument(
+        "--gen",
+        type=str,
+        nargs=2,
+        action="append",
+        default=[],
+        metavar=("TPL_PATH", "OUT_PATH"),
+        help="Adds a template and output path to generate, can be repeated",
+    )
+    parser.add_argument(
+        "--module_dir",
+        type=str,
+        default=MODULE_DIR,
+        help="Points to the directory caching the compiled templates",
+    )
+    parser.add_argument(
+        "--dep_path",
+        type=str,
+        default=DEP_FILE,
+        help="Points to the dependency manifest of the generated files",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Generates the files even when they are up to date",
+    )
 
     # Get the list of parsing
     args = parser.parse_args()
 
     # Grab config and template then generate the combination of two
-    cfg = get_config(args.cfg_path)
-    tpl = get_template(args.tpl_path)
-    gen_file(cfg=cfg, tpl=tpl, target_path=args.out_path)
+    # In batch mode all pairs are generated from the same configuration
+    pairs = [tuple(pair) for pair in args.gen]
+    if args.manifest is not None:
+        pairs += get_manifest(args.manifest)
+    if not pairs:
+        pairs = [(args.tpl_path, args.out_path)]
+
+    written = gen_batch(
+        cfg_path=args.cfg_path,
+        pairs=pairs,
+        module_dir=args.module_dir,
+        dep_path=args.dep_path,
+        force=args.force,
+    )
+    for _, out_path in pairs:
+        status = "Generates output" if out_path in written else "Up to date"
+        print(f"{status}: {out_path}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,49 @@
+<%
+  import math
+
+  num_loop_dim = cfg["temporalAddrGenUnitParams"]["loopDim"]
+  num_data_mover = (len(cfg["dataReaderParams"]["tcdmPortsNum"]) + len(cfg["dataWriterParams"]["tcdmPortsNum"]))
+  num_dmove_x_loop_dim = num_data_mover * num_loop_dim
+  num_spatial_dim = sum(cfg["dataReaderParams"]["spatialDim"]) + sum(cfg["dataWriterParams"]["spatialDim"])
+
+  csr_num = num_loop_dim + num_dmove_x_loop_dim + num_data_mover + num_spatial_dim + 1
+  csr_width = math.ceil(math.log2(csr_num))
+
+  reg_names = (
+    ["LOOP_COUNT_{}".format(i) for i in range(num_loop_dim)]
+    + ["TEMPORAL_STRIDE_{}".format(i) for i in range(num_dmove_x_loop_dim)]
+    + ["SPATIAL_STRIDE_{}".format(i) for i in range(num_spatial_dim)]
+    + ["BASE_PTR_{}".format(i) for i in range(num_data_mover)]
+    + ["START_STREAMER"]
+  )
+%>\
+# ---------------------------------
+# Streamer CSR address map
+# Generated from the streamer configuration
+# with util/templates/streamer_csr_map.py.tpl
+# Do not edit, changes are overwritten
+# ---------------------------------
+
+CSR_NUM = ${csr_num}
+CSR_WIDTH = ${csr_width}
+
+NUM_LOOP_DIM = ${num_loop_dim}
+NUM_DATA_MOVER = ${num_data_mover}
+NUM_SPATIAL_DIM = ${num_spatial_dim}
+
+% for addr, name in enumerate(reg_names):
+CSR_${name} = ${addr}
+% endfor
+
+# Register name to address without the CSR_ prefix
+CSR_REGS = {
+% for name in reg_names:
+    "${name}": CSR_${name},
+% endfor
+}
+
+# Grouped addresses for configurations with any dimension
+CSR_LOOP_COUNT = [${", ".join("CSR_" + name for name in reg_names if name.startswith("LOOP_COUNT_"))}]
+CSR_TEMPORAL_STRIDE = [${", ".join("CSR_" + name for name in reg_names if name.startswith("TEMPORAL_STRIDE_"))}]
+CSR_SPATIAL_STRIDE = [${", ".join("CSR_" + name for name in reg_names if name.startswith("SPATIAL_STRIDE_"))}]
+CSR_BASE_PTR = [${", ".join("CSR_" + name for name in reg_names if name.startswith("BASE_PTR_"))}]